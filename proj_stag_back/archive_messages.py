@@ -0,0 +1,18 @@
+# ============================================================
+# COMMANDE : ARCHIVAGE DES MESSAGES
+# ============================================================
+# Déplace les messages des conversations inactives ou anciennes vers "message_archives"
+# (blobs compressés), selon la politique ARCHIVE_* (voir message_archive.py).
+# Prévu pour une tâche planifiée (cron) quand la tâche de fond du serveur est
+# désactivée (MESSAGE_ARCHIVER_ENABLED = False).
+#
+# Utilisation : python archive_messages.py
+
+import asyncio
+
+from main import run_message_archiver
+
+if __name__ == "__main__":
+    report = asyncio.run(run_message_archiver())
+    print(f"Conversations : {report['conversations']} - messages : {report['messages']} - "
+          f"octets récupérés : {report['reclaimed_bytes']} - erreurs : {report['errors']}")
@@ -0,0 +1,323 @@
+# ============================================================
+# ASSISTANT DE CHAT : INTENTIONS ET RÉPONSES
+# ============================================================
+# Le message est d'abord classé par le routeur d'intentions compilé (intent_router.py),
+# puis seul le gestionnaire de cette intention interroge la base, et uniquement pour
+# les données dont il a besoin (agrégats plutôt que chargement de tables entières).
+#
+# Requêtes par intention :
+#   how_to_book, support, profile, vehicles, greeting, thanks, fallback : 0
+#   pricing, categories : 0 (agrégats en mémoire, catalog_stats.py)
+#   bookings, cancel, available : 1      favorites : 2
+
+from sqlalchemy import select, func, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import vehicles, Favorite, Booking, ACTIVE_BOOKING_STATUSES
+from intent_router import IntentRouter
+from catalog_stats import get_catalog_rollup
+
+# ========================================
+# RÉPONSES FIXES
+# ========================================
+HOW_TO_BOOK_REPLY = """📋 **Comment réserver un véhicule :**
+        
+1. **Parcourez** notre catalogue de véhicules dans l'onglet "Nos voitures"
+2. **Sélectionnez** le véhicule qui vous convient
+3. **Cliquez** sur le bouton "Réserver" (vert si disponible)
+4. **Remplissez** le formulaire avec :
+   - Vos informations personnelles
+   - Les dates de location
+   - L'heure et le lieu de prise
+   - Les options supplémentaires
+5. **Confirmez** la réservation
+
+💰 **Paiement :** Le paiement se fait à la prise du véhicule, ou en ligne selon l'option choisie.
+📞 **Besoin d'aide ?** Contactez-nous au 71 234 567"""
+
+FAVORITES_HELP_REPLY = """❤️ **Ajouter aux favoris :**
+            
+**Pour ajouter un véhicule aux favoris :**
+1. Naviguez dans notre catalogue de véhicules
+2. Lorsque vous trouvez un véhicule qui vous intéresse
+3. Cliquez sur l'icône ❤️ (cœur) en haut à droite de la photo du véhicule
+4. Le véhicule sera sauvegardé dans votre liste personnelle
+
+💡 **Utilité des favoris :**
+• Gardez une trace des véhicules qui vous plaisent
+• Comparez facilement plusieurs modèles
+• Accédez rapidement à vos préférés
+• Recevez des notifications si le prix baisse
+
+🎯 **Conseil :** Ajoutez plusieurs véhicules pour comparer et choisir plus facilement !"""
+
+SUPPORT_REPLY = """📞 **Contact et support :**
+        
+**Service client disponible :**
+• 📞 Téléphone : (+216) 71 234 567
+• 📧 Email : support@carrental-tn.com
+• 🌐 Site web : www.carrental-tn.com
+
+**Horaires d'ouverture :**
+• Lundi - Vendredi : 8h00 - 18h00
+• Samedi : 9h00 - 16h00
+• Dimanche : Fermé
+
+**Points de contact :**
+• **Réservations :** reservation@carrental-tn.com
+• **Support technique :** tech@carrental-tn.com
+• **Réclamations :** reclamation@carrental-tn.com
+
+**Agences physiques :**
+1. **Tunis Centre** : Avenue Habib Bourguiba
+2. **Aéroport Tunis-Carthage** : Hall des arrivées
+3. **Sousse** : Rue Habib Thameur
+4. **Sfax** : Avenue de la République
+
+💡 **Conseil :** Pour une réponse rapide, appelez-nous pendant les heures d'ouverture."""
+
+PROFILE_REPLY = """👤 **Modifier votre profil :**
+        
+**Pour modifier vos informations personnelles :**
+1. Allez dans l'onglet "Mon Profil" (icône 👤)
+2. Cliquez sur la section "Modifier mon compte"
+3. Vous pouvez modifier :
+   • Votre nom d'utilisateur
+   • Votre adresse email
+   • Votre mot de passe
+
+**Informations modifiables :**
+• **Nom d'utilisateur** : Votre identifiant d'affichage
+• **Email** : Adresse de connexion et de contact
+• **Mot de passe** : Sécurité de votre compte
+
+⚠️ **Important :**
+• Pour changer le mot de passe, vous devez connaître l'actuel
+• Après modification d'email, vous devrez utiliser le nouvel email pour vous reconnecter
+• Les modifications sont immédiates
+
+🔒 **Sécurité :**
+Vos données sont cryptées et protégées selon les normes RGPD.
+
+💡 **Besoin d'aide ?** Contactez le support si vous rencontrez des difficultés."""
+
+VEHICLES_REPLY = """🚗 **Notre gamme de véhicules :**
+
+Nous proposons une large sélection de véhicules adaptés à tous vos besoins :
+
+• **Économique** – Idéal pour petits budgets et déplacements urbains.
+• **Citadine** – Confortable et maniable en ville.
+• **Familiale** – Espace et confort pour les voyages en famille.
+• **SUV** – Polyvalent, parfait pour l'aventure et le tout-terrain.
+• **Compacte** – Un bon compromis entre taille et confort.
+
+🔍 **Comment explorer notre catalogue ?**
+Rendez-vous dans l'onglet **"Nos voitures"** pour voir tous les modèles disponibles. Vous pouvez filtrer par catégorie, prix, nombre de places, etc.
+
+💬 Souhaitez-vous plus d'informations sur une catégorie en particulier ou voir les véhicules actuellement disponibles ?"""
+
+# Usage conseillé de chaque catégorie (réponse "Types de véhicules")
+CATEGORY_USAGES = {
+    "Économique": "petits budgets, ville",
+    "Citadine": "ville, petits trajets",
+    "Familiale": "familles, grands espaces",
+    "Compacte": "confort urbain",
+    "SUV": "aventure, tout-terrain",
+}
+
+# ========================================
+# ROUTEUR D'INTENTIONS
+# ========================================
+# Les phrases exactes correspondent aux boutons de suggestion de l'application.
+# À score égal, l'intention déclarée la première l'emporte ; les intentions générales
+# (véhicules, salutations, remerciements) ont un poids réduit pour ne pas masquer
+# une demande précise ("bonjour, quels sont les tarifs ?" → tarifs).
+#
+# Portée (scope) de chaque réponse, utilisée comme clé du cache des réponses :
+#   "static"  : texte fixe
+#   "message" : dépend seulement du texte du message (réponse par défaut)
+#   "catalog" : dépend de l'état du catalogue
+#   "user"    : dépend des données de l'utilisateur (favoris, réservations, nom)
+assistant_router = IntentRouter()
+
+# ========================================
+# GESTIONNAIRES D'INTENTION
+# ========================================
+# Signature commune : (message, current_user, db) -> texte de la réponse.
+
+@assistant_router.intent(
+    "how_to_book",
+    exact=["Comment réserver ?"],
+    requires=[["comment"], ["réserver", "réservation", "louer"]],
+    scope="static"
+)
+async def reply_how_to_book(message: str, current_user, db: AsyncSession) -> str:
+    return HOW_TO_BOOK_REPLY
+
+@assistant_router.intent(
+    "pricing",
+    keywords=["tarifs", "tarif", "prix", "combien", "coût", "coûte"],
+    exact=["Quels sont les tarifs ?"],
+    scope="catalog"
+)
+async def reply_pricing(message: str, current_user, db: AsyncSession) -> str:
+    # Prix moyen et maximum par catégorie, lus dans les agrégats du catalogue
+    rollup = await get_catalog_rollup(db)
+    price_info = "💵 **Tarifs par catégorie (par jour) :**\n\n"
+    for totals in rollup.categories():
+        price_info += f"• **{totals['category']}** : {totals['avg_price']:.0f} - {totals['max_price']:.0f} TND\n"
+    price_info += "\n💡 **Informations supplémentaires :**\n"
+    price_info += "• Location de plusieurs jours : réduction de 10% à partir de 3 jours\n"
+    price_info += "• Options supplémentaires :\n"
+    price_info += "  - Chauffeur : +50 TND/jour\n"
+    price_info += "  - GPS : +5 TND/jour\n"
+    price_info += "  - Siège enfant : +3 TND/jour\n"
+    price_info += "\n🔍 Pour connaître le prix exact d'un véhicule, consultez sa fiche détaillée."
+    return price_info
+
+@assistant_router.intent("favorites", keywords=["favoris", "favori"], exact=["Ajouter aux favoris"], scope="user")
+async def reply_favorites(message: str, current_user, db: AsyncSession) -> str:
+    favorite_count = await db.scalar(
+        select(func.count()).select_from(Favorite).where(Favorite.user_id == current_user.id)
+    )
+    if not favorite_count:
+        return FAVORITES_HELP_REPLY
+    # Noms des 3 premiers favoris en une seule requête (jointure)
+    car_names = (await db.scalars(
+        select(vehicles.name)
+        .join(Favorite, Favorite.car_id == vehicles.id)
+        .where(Favorite.user_id == current_user.id)
+        .order_by(Favorite.id)
+        .limit(3)
+    )).all()
+    # Formate la liste des noms
+    cars_list = ", ".join(car_names)
+    if favorite_count > 3:
+        cars_list += f" et {favorite_count - 3} autres"
+    return f"""❤️ **Vos favoris :**
+            
+Vous avez actuellement **{favorite_count} véhicule(s)** dans vos favoris.
+Derniers ajouts : {cars_list}
+
+**Pour ajouter un véhicule aux favoris :**
+1. Allez dans "Nos voitures"
+2. Trouvez un véhicule qui vous plaît
+3. Cliquez sur l'icône ❤️ en haut à droite de l'image
+4. Le véhicule sera ajouté à votre liste
+
+📱 **Accès rapide :** Retrouvez tous vos favoris dans l'onglet "Mes Favoris" du menu principal."""
+
+@assistant_router.intent("categories", keywords=["catégories", "catégorie"], exact=["Types de véhicules"], scope="catalog")
+async def reply_categories(message: str, current_user, db: AsyncSession) -> str:
+    # Nombre de modèles par catégorie et premier modèle comme exemple, lus dans les agrégats
+    rollup = await get_catalog_rollup(db)
+    response = "🚗 **Nos catégories de véhicules :**\n\n"
+    for totals in rollup.categories():
+        cat, count, example = totals["category"], totals["count"], totals["example"]
+        response += f"• **{cat}** ({count} modèles)\n"
+        response += f"  *Exemple : {example}*\n"
+        response += f"  *Idéal pour : {CATEGORY_USAGES.get(cat, 'usage général')}*\n"
+    response += "\n🔍 **Comment choisir ?**\n"
+    response += "• Pour la ville : Économique ou Citadine\n"
+    response += "• Pour la famille : Familiale ou SUV\n"
+    response += "• Pour le confort : Compacte\n"
+    response += "• Pour les voyages : SUV\n"
+    return response
+
+@assistant_router.intent("support", keywords=["support"], exact=["Contacter le support"], scope="static")
+async def reply_support(message: str, current_user, db: AsyncSession) -> str:
+    return SUPPORT_REPLY
+
+@assistant_router.intent("available", keywords=["disponibles", "disponible"], exact=["Véhicules disponibles"], scope="catalog")
+async def reply_available(message: str, current_user, db: AsyncSession) -> str:
+    # Nombre de voitures disponibles lu dans les agrégats du catalogue
+    available_cars = (await get_catalog_rollup(db)).stats()["available"]
+    # Quelques véhicules disponibles, seulement les colonnes affichées
+    available_cars_list = (await db.execute(
+        select(vehicles.name, vehicles.category, vehicles.price)
+        .where(vehicles.isAvailable == True)
+        .limit(5)
+    )).all()
+    response = f"✅ **Véhicules disponibles :**\n\n"
+    response += f"Nous avons actuellement **{available_cars} véhicules** disponibles à la location.\n\n"
+    if available_cars_list:
+        response += "**Quelques modèles disponibles :**\n"
+        for car in available_cars_list:
+            response += f"• **{car.name}** ({car.category}) - {float(car.price):.0f} TND/jour\n"
+        response += f"\n💡 **Conseil :** {available_cars} choix disponibles. Réservez vite pour garantir votre véhicule préféré !\n"
+    else:
+        response += "Aucun véhicule disponible pour le moment.\n"
+    response += "\n**Filtres disponibles :**\n"
+    response += "• Par prix (0 - 500 TND)\n"
+    response += "• Par catégorie (Économique, SUV...)\n"
+    response += "• Par disponibilité\n"
+    response += "• Par nombre de places\n"
+    response += "\n🔍 **Comment voir tous les véhicules ?**\n"
+    response += "Allez dans 'Nos voitures' et utilisez les filtres pour trouver le véhicule parfait !"
+    return response
+
+@assistant_router.intent(
+    "profile",
+    exact=["Modifier mon profil", "profil", "mon profil"],
+    requires=[["profil", "mon compte"], ["modifier", "changer"]],
+    scope="static"
+)
+async def reply_profile(message: str, current_user, db: AsyncSession) -> str:
+    return PROFILE_REPLY
+
+@assistant_router.intent("cancel", keywords=["annuler", "annulation", "supprimer"], scope="user")
+async def reply_cancel(message: str, current_user, db: AsyncSession) -> str:
+    has_bookings = await db.scalar(select(exists().where(Booking.user_id == current_user.id)))
+    if has_bookings:
+        return "Pour annuler une réservation, allez dans 'Mes Réservations', trouvez la réservation et contactez le support."
+    return "Vous n'avez aucune réservation à annuler."
+
+@assistant_router.intent("bookings", keywords=["réservation", "réservations", "réserver", "louer"], scope="user")
+async def reply_bookings(message: str, current_user, db: AsyncSession) -> str:
+    active_count = await db.scalar(
+        select(func.count()).select_from(Booking).where(
+            Booking.user_id == current_user.id,
+            Booking.status.in_(ACTIVE_BOOKING_STATUSES)
+        )
+    )
+    if active_count:
+        return f"Vous avez {active_count} réservation(s) active(s). Allez dans 'Mes Réservations' pour les gérer."
+    return "Pour réserver, allez dans 'Nos voitures', choisissez un véhicule et cliquez sur 'Réserver'."
+
+@assistant_router.intent("vehicles", keywords=["véhicule", "véhicules", "voiture", "voitures"], weight=0.5, scope="static")
+async def reply_vehicles(message: str, current_user, db: AsyncSession) -> str:
+    return VEHICLES_REPLY
+
+@assistant_router.intent("greeting", keywords=["bonjour", "salut", "hello", "hi", "coucou"], weight=0.5, scope="user")
+async def reply_greeting(message: str, current_user, db: AsyncSession) -> str:
+    return f"Bonjour {current_user.username} ! 👋 Je suis votre assistant CarRental. Comment puis-je vous aider aujourd'hui ?"
+
+@assistant_router.intent("thanks", keywords=["merci", "thanks", "thank you"], weight=0.5, scope="static")
+async def reply_thanks(message: str, current_user, db: AsyncSession) -> str:
+    return "Je vous en prie ! N'hésitez pas si vous avez d'autres questions. 😊"
+
+@assistant_router.fallback(scope="message")
+async def reply_fallback(message: str, current_user, db: AsyncSession) -> str:
+    default_responses = [
+        "Je comprends que vous dites : '{}'\n\nVoici ce que je peux vous aider :".format(message),
+        "• Réserver un véhicule 📅",
+        "• Consulter mes favoris ❤️",
+        "• Vérifier mes réservations 📋",
+        "• Connaître les tarifs 💰",
+        "• Contacter le support 📞",
+        "• Voir les véhicules disponibles 🚗",
+        "• Modifier mon profil 👤",
+        "\nPosez-moi une question plus précise ou utilisez les suggestions ci-dessous !"
+    ]
+    return "\n".join(default_responses)
+
+# ========================================
+# POINT D'ENTRÉE
+# ========================================
+async def generate_assistant_response(user_message: str, current_user, db: AsyncSession) -> str:
+    """
+    Génère la réponse de l'assistant : classe le message, puis appelle le gestionnaire
+    de l'intention, qui ne charge que les données nécessaires à sa réponse.
+    """
+    intent = assistant_router.route(user_message)
+    return await intent.handler(user_message, current_user, db)
@@ -0,0 +1,177 @@
+# ============================================================
+# MOTEUR DE DISPONIBILITÉ PAR PÉRIODE
+# ============================================================
+# Index en mémoire des réservations actives ("En attente" / "Confirmée"), par voiture.
+# Pour chaque voiture, les périodes réservées sont gardées triées par date de début,
+# avec le maximum cumulé des dates de fin : savoir si une voiture est libre sur
+# [début, fin] revient à une recherche dichotomique, soit O(log n) par voiture.
+# Les dates sont inclusives : une réservation du 5 au 8 occupe la voiture les 5, 6, 7 et 8.
+
+import bisect
+import hashlib
+import threading
+import time
+from datetime import date
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+class CarSchedule:
+    """
+    Périodes réservées d'une voiture, triées par date de début.
+    prefix_max_end[i] est la plus grande date de fin parmi les périodes 0..i,
+    ce qui permet de détecter un chevauchement même si des périodes se recouvrent.
+    """
+
+    def __init__(self):
+        self.starts = []          # dates de début triées (clé de la recherche dichotomique)
+        self.intervals = []       # (début, fin, booking_id), même ordre que starts
+        self.prefix_max_end = []  # maximum cumulé des dates de fin
+
+    def _recompute_from(self, index: int) -> None:
+        running = self.prefix_max_end[index - 1] if index > 0 else None
+        for i in range(index, len(self.intervals)):
+            end = self.intervals[i][1]
+            running = end if running is None or end > running else running
+            self.prefix_max_end[i] = running
+
+    def add(self, start: date, end: date, booking_id: int) -> None:
+        index = bisect.bisect_right(self.starts, start)
+        self.starts.insert(index, start)
+        self.intervals.insert(index, (start, end, booking_id))
+        self.prefix_max_end.insert(index, end)
+        self._recompute_from(index)
+
+    def remove(self, start: date, booking_id: int) -> None:
+        index = bisect.bisect_left(self.starts, start)
+        while index < len(self.intervals) and self.starts[index] == start:
+            if self.intervals[index][2] == booking_id:
+                del self.starts[index]
+                del self.intervals[index]
+                del self.prefix_max_end[index]
+                if index < len(self.intervals):
+                    self._recompute_from(index)
+                return
+            index += 1
+
+    def overlaps(self, start: date, end: date) -> bool:
+        """
+        Vrai si une période réservée chevauche [start, end].
+        """
+        # Dernière période qui commence au plus tard le jour "end"
+        index = bisect.bisect_right(self.starts, end) - 1
+        return index >= 0 and self.prefix_max_end[index] >= start
+
+    def __len__(self) -> int:
+        return len(self.intervals)
+
+class AvailabilityIndex:
+    """
+    Index des réservations actives de toutes les voitures.
+
+    - rebuild(rows) le reconstruit entièrement à partir de la table "bookings".
+    - add() / remove() le mettent à jour à chaque changement de statut.
+    - ttl_seconds force une reconstruction périodique : avec plusieurs workers,
+      les écritures faites dans un autre processus ne sont pas vues autrement.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.RLock()
+        self._cars: Dict[int, CarSchedule] = {}
+        self._bookings: Dict[int, Tuple[int, date, date]] = {}  # booking_id → (car_id, début, fin)
+        self._built_at: Optional[float] = None
+        self._version = 0
+        self._fingerprint: Optional[Tuple[int, str]] = None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def needs_rebuild(self) -> bool:
+        """
+        Vrai si l'index n'a jamais été construit ou si son TTL est dépassé.
+        """
+        if self._built_at is None:
+            return True
+        return self._ttl_seconds is not None and time.monotonic() - self._built_at > self._ttl_seconds
+
+    def rebuild(self, rows: Iterable[Tuple[int, int, date, date]]) -> None:
+        """
+        Reconstruit l'index à partir de lignes (booking_id, car_id, pickup_date, return_date).
+        """
+        cars: Dict[int, CarSchedule] = {}
+        bookings: Dict[int, Tuple[int, date, date]] = {}
+        for booking_id, car_id, start, end in sorted(rows, key=lambda r: (r[1], r[2])):
+            cars.setdefault(car_id, CarSchedule()).add(start, end, booking_id)
+            bookings[booking_id] = (car_id, start, end)
+        with self._lock:
+            self._cars = cars
+            self._bookings = bookings
+            self._built_at = time.monotonic()
+            self._version += 1
+
+    def add(self, booking_id: int, car_id: int, start: date, end: date) -> None:
+        """
+        Ajoute (ou remplace) une réservation active.
+        """
+        with self._lock:
+            self._remove_locked(booking_id)
+            self._cars.setdefault(car_id, CarSchedule()).add(start, end, booking_id)
+            self._bookings[booking_id] = (car_id, start, end)
+            self._version += 1
+
+    def remove(self, booking_id: int) -> None:
+        """
+        Retire une réservation (annulée, terminée ou supprimée). Sans effet si elle est absente.
+        """
+        with self._lock:
+            if self._remove_locked(booking_id):
+                self._version += 1
+
+    def _remove_locked(self, booking_id: int) -> bool:
+        entry = self._bookings.pop(booking_id, None)
+        if entry is None:
+            return False
+        car_id, start, _ = entry
+        schedule = self._cars.get(car_id)
+        if schedule is not None:
+            schedule.remove(start, booking_id)
+            if not len(schedule):
+                del self._cars[car_id]
+        return True
+
+    def is_free(self, car_id: int, start: date, end: date) -> bool:
+        """
+        Vrai si la voiture n'a aucune réservation active qui chevauche [start, end].
+        """
+        with self._lock:
+            schedule = self._cars.get(car_id)
+            return schedule is None or not schedule.overlaps(start, end)
+
+    def busy_car_ids(self, start: date, end: date) -> Set[int]:
+        """
+        IDs des voitures ayant au moins une réservation active qui chevauche [start, end].
+        """
+        with self._lock:
+            return {car_id for car_id, schedule in self._cars.items() if schedule.overlaps(start, end)}
+
+    def fingerprint(self) -> str:
+        """
+        Empreinte du contenu de l'index (identique pour un même ensemble de réservations,
+        quel que soit le worker). Mise en cache jusqu'à la prochaine modification.
+        """
+        with self._lock:
+            if self._fingerprint is None or self._fingerprint[0] != self._version:
+                h = hashlib.sha256()
+                for booking_id in sorted(self._bookings):
+                    car_id, start, end = self._bookings[booking_id]
+                    h.update(f"{booking_id}:{car_id}:{start}:{end};".encode("ascii"))
+                self._fingerprint = (self._version, h.hexdigest()[:32])
+            return self._fingerprint[1]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self._version,
+                "cars": len(self._cars),
+                "active_bookings": len(self._bookings),
+            }
@@ -0,0 +1,167 @@
+# ============================================================
+# BENCHMARK : COUCHE BASE DE DONNÉES ASYNCHRONE / BLOQUANTE
+# ============================================================
+# Mesure les requêtes par seconde d'un worker sur les endpoints du catalogue, des
+# réservations et du chat, avec CLIENTS clients simultanés :
+#
+#   blocking  session synchrone (models.SessionLocal) appelée depuis les routes async,
+#             comme avant le passage à AsyncSession : chaque requête SQL bloque la
+#             boucle d'événements, les requêtes du worker sont traitées une par une
+#   async     AsyncSession (get_db, code actuel)
+#
+# Sur SQLite, BENCH_QUERY_LATENCY_MS (défaut ici : 2 ms) simule l'aller-retour réseau
+# vers MySQL ; sans latence, une base locale en mémoire cache ne montre pas d'attente.
+#
+# Utilisation : python benchmarks/bench_async_db.py [clients, défaut : 20] [requêtes par client, défaut : 30]
+
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import date
+
+os.environ.setdefault("BENCH_QUERY_LATENCY_MS", "2")
+
+from common import (main, reset_database, create_users, create_cars, auth_headers, api_client,
+                    latency_summary, timed, database_label)
+from models import Booking, Conversation, SessionLocal, AsyncSessionLocal
+
+ENDPOINTS = ("catalogue", "réservations", "chat")
+CHAT_MESSAGES = ("Bonjour", "Quels SUV avez-vous ?", "Comment annuler une réservation ?", "Merci")
+
+# ========================================
+# SESSION BLOQUANTE (COMPORTEMENT D'AVANT)
+# ========================================
+class BlockingSession:
+    """
+    Expose l'interface d'AsyncSession utilisée par les routes au-dessus d'une Session
+    synchrone : les méthodes sont "async" mais bloquent la boucle pendant la requête SQL.
+    """
+    def __init__(self):
+        self._session = SessionLocal(expire_on_commit=False)
+
+    def add(self, instance):
+        self._session.add(instance)
+
+    def add_all(self, instances):
+        self._session.add_all(instances)
+
+    async def execute(self, *args, **kwargs):
+        return self._session.execute(*args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return self._session.scalar(*args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return self._session.scalars(*args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return self._session.get(*args, **kwargs)
+
+    async def flush(self, *args, **kwargs):
+        self._session.flush(*args, **kwargs)
+
+    async def refresh(self, *args, **kwargs):
+        self._session.refresh(*args, **kwargs)
+
+    async def delete(self, instance):
+        self._session.delete(instance)
+
+    async def commit(self):
+        self._session.commit()
+
+    async def rollback(self):
+        self._session.rollback()
+
+    async def close(self):
+        self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._session.close()
+
+async def blocking_get_db():
+    async with BlockingSession() as db:
+        yield db
+
+@asynccontextmanager
+async def blocking_mode():
+    main.app.dependency_overrides[main.get_db] = blocking_get_db
+    main.AsyncSessionLocal = BlockingSession  # tâches de fond (enregistrement du chat)
+    try:
+        yield
+    finally:
+        main.app.dependency_overrides.pop(main.get_db, None)
+        main.AsyncSessionLocal = AsyncSessionLocal
+
+# ========================================
+# SCÉNARIO
+# ========================================
+async def create_fixtures(clients: int):
+    users = await create_users(clients, main.hash_password("motdepasse123"))
+    cars = await create_cars(60)
+    async with AsyncSessionLocal() as db:
+        conversations = [Conversation(user_id=user.id, title="Bench") for user in users]
+        db.add_all(conversations)
+        for i, user in enumerate(users):
+            for j in range(5):
+                car = cars[(i * 5 + j) % len(cars)]
+                db.add(Booking(user_id=user.id, car_id=car.id, full_name=user.username,
+                               pickup_date=date(2027, 1 + j, 1), return_date=date(2027, 1 + j, 5),
+                               total_price=float(car.price) * 4, status="Confirmée"))
+        await db.commit()
+    return users, conversations
+
+async def client_session(client, user, conversation, requests: int, results: dict) -> None:
+    headers = auth_headers(user)
+    for i in range(requests):
+        endpoint = ENDPOINTS[i % len(ENDPOINTS)]
+        if endpoint == "catalogue":
+            call = client.get("/vehicles", params={"category": "SUV", "limit": 20}, headers=headers)
+        elif endpoint == "réservations":
+            call = client.get("/my-bookings", headers=headers)
+        else:
+            call = client.post("/assistant/chat", headers=headers, json={
+                "conversation_id": conversation.id, "content": CHAT_MESSAGES[i % len(CHAT_MESSAGES)]})
+        response, latency = await timed(call)
+        results[endpoint].append((response.status_code, latency))
+
+async def run_mode(mode: str, clients: int, requests: int) -> None:
+    await reset_database()
+    users, conversations = await create_fixtures(clients)
+    results = {endpoint: [] for endpoint in ENDPOINTS}
+    async with api_client() as client:
+        if mode == "blocking":
+            async with blocking_mode():
+                started = time.perf_counter()
+                await asyncio.gather(*(client_session(client, user, conversation, requests, results)
+                                       for user, conversation in zip(users, conversations)))
+                await main.drain_chat_persist_tasks()
+                elapsed = time.perf_counter() - started
+        else:
+            started = time.perf_counter()
+            await asyncio.gather(*(client_session(client, user, conversation, requests, results)
+                                   for user, conversation in zip(users, conversations)))
+            await main.drain_chat_persist_tasks()
+            elapsed = time.perf_counter() - started
+    total = sum(len(rows) for rows in results.values())
+    print(f"\n[{mode}] {total} requêtes en {elapsed:.2f} s : {total / elapsed:.1f} req/s")
+    for endpoint, rows in results.items():
+        errors = sum(1 for status, _ in rows if status >= 400)
+        print(f"  {endpoint:13s} {len(rows) / elapsed:7.1f} req/s  {errors:3d} erreurs  "
+              f"{latency_summary([latency for _, latency in rows])}")
+
+async def run(clients: int = 20, requests: int = 30) -> None:
+    print(f"Base : {database_label()} - {clients} clients x {requests} requêtes")
+    try:
+        for mode in ("blocking", "async"):
+            await run_mode(mode, clients, requests)
+    finally:
+        await main.async_engine.dispose()
+
+if __name__ == "__main__":
+    arguments = [int(value) for value in sys.argv[1:3]]
+    asyncio.run(run(*arguments))
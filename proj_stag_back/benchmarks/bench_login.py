@@ -0,0 +1,87 @@
+# ============================================================
+# BENCHMARK : RAFALE DE CONNEXIONS (BCRYPT)
+# ============================================================
+# Envoie en même temps des /login, /register et /update-profile (changement de mot de
+# passe) et mesure, pour chaque type de requête, les latences p50 / p99, les refus 503,
+# ainsi que le retard de la boucle d'événements (une sonde qui dort 10 ms en boucle) :
+#
+#   pool    bcrypt dans le pool borné (run_bcrypt_async, code actuel)
+#   inline  bcrypt appelé directement dans la route (comportement d'avant le pool) :
+#           chaque hachage bloque la boucle d'événements ~250 ms
+#
+# Utilisation : python benchmarks/bench_login.py [taille de la rafale, défaut : 32]
+
+import asyncio
+import sys
+import time
+
+from common import (main, reset_database, create_users, auth_headers, api_client,
+                    latency_summary, timed, database_label)
+
+PASSWORD = "motdepasse123"
+PROBE_INTERVAL_S = 0.010
+
+async def inline_bcrypt(fn, *args):
+    return fn(*args)
+
+async def loop_lag_probe(stop: asyncio.Event, lags: list) -> None:
+    """
+    Mesure le retard de réveil d'une tâche qui dort PROBE_INTERVAL_S : ce que subit toute
+    autre requête servie par le worker pendant la rafale.
+    """
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(PROBE_INTERVAL_S)
+        lags.append(max(0.0, time.perf_counter() - started - PROBE_INTERVAL_S))
+
+async def run_burst(mode: str, burst: int, password_hash: str) -> None:
+    await reset_database()
+    logins = burst * 3 // 4
+    registers = updates = (burst - logins) // 2
+    users = await create_users(logins + updates, password_hash)
+    original = main.run_bcrypt_async
+    if mode == "inline":
+        main.run_bcrypt_async = inline_bcrypt
+    try:
+        async with api_client() as client:
+            requests = []
+            for user in users[:logins]:
+                requests.append(("login", client.post("/login", data={"username": user.email, "password": PASSWORD})))
+            for i in range(registers):
+                requests.append(("register", client.post("/register", json={
+                    "username": f"nouveau{i}", "email": f"nouveau{i}@bench.fr", "password": PASSWORD})))
+            for user in users[logins:]:
+                requests.append(("update-profile", client.put("/update-profile/", headers=auth_headers(user), json={
+                    "current_password": PASSWORD, "new_password": PASSWORD + "!"})))
+            stop = asyncio.Event()
+            lags = []
+            probe = asyncio.create_task(loop_lag_probe(stop, lags))
+            started = time.perf_counter()
+            results = await asyncio.gather(*(timed(request) for _, request in requests))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            await probe
+    finally:
+        main.run_bcrypt_async = original
+    print(f"\n[{mode}] {len(requests)} requêtes simultanées en {elapsed:.2f} s "
+          f"({len(requests) / elapsed:.1f} req/s)")
+    for kind in ("login", "register", "update-profile"):
+        rows = [(response, latency) for (k, _), (response, latency) in zip(requests, results) if k == kind]
+        ok = [latency for response, latency in rows if response.status_code < 400]
+        rejected = sum(1 for response, _ in rows if response.status_code == 503)
+        errors = len(rows) - len(ok) - rejected
+        print(f"  {kind:15s} {len(ok):3d} ok  {rejected:3d} x 503  {errors:3d} erreurs  {latency_summary(ok)}")
+    print(f"  {'boucle (sonde)':15s} {len(lags):3d} réveils                    {latency_summary(lags)}")
+
+async def run(burst: int) -> None:
+    password_hash = main.hash_password(PASSWORD)
+    print(f"Base : {database_label()} - pool bcrypt : {main.BCRYPT_POOL_SIZE} thread(s), "
+          f"file : {main.BCRYPT_QUEUE_LIMIT}")
+    try:
+        for mode in ("inline", "pool"):
+            await run_burst(mode, burst, password_hash)
+    finally:
+        await main.async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 32))
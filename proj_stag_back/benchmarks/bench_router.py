@@ -0,0 +1,128 @@
+# ============================================================
+# BENCHMARK : ROUTEUR D'INTENTIONS COMPILÉ / ANCIENNE CHAÎNE IF-ELIF
+# ============================================================
+# Classe N messages (tirés du corpus étiqueté de tests/test_intent_router.py, complétés
+# de mots de remplissage pour varier leur longueur) avec :
+#
+#   if-chain  l'ancienne chaîne de tests "in" / any(...) de generate_assistant_response,
+#             évaluée dans l'ordre sur le message en minuscules
+#   compilé   assistant_router.route() (normalisation unique + une expression régulière)
+#
+# et affiche les messages classés par seconde et la précision de chacun sur le corpus.
+# Une seconde mesure déclare INTENT_COUNTS intentions synthétiques (5 mots-clés chacune) :
+# le coût de la chaîne croît avec leur nombre, celui du routeur compilé reste stable.
+#
+# Utilisation : python benchmarks/bench_router.py [nombre de messages, défaut : 20000]
+
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "tests"))
+
+from assistant import assistant_router
+from intent_router import IntentRouter
+from test_intent_router import CORPUS
+
+FILLERS = ("s'il vous plaît", "pour demain", "à Tunis", "avec ma famille", "rapidement", "pour le week-end")
+INTENT_COUNTS = (12, 50, 200)
+KEYWORDS_PER_INTENT = 5
+
+def legacy_route(user_message: str) -> str:
+    """
+    Classement de l'ancienne chaîne if/elif (avant le routeur), sans les accès à la base.
+    """
+    m = user_message.lower()
+    if m == "comment réserver ?" or ("réserver" in m and "comment" in m):
+        return "how_to_book"
+    elif m == "quels sont les tarifs ?" or any(word in m for word in ['tarifs', 'tarif', 'prix', 'combien', 'coût']):
+        return "pricing"
+    elif any(word in m for word in ['favoris', 'favori']):
+        return "favorites"
+    elif m == "types de véhicules" or "catégories" in m:
+        return "categories"
+    elif m == "contacter le support" or "support" in m:
+        return "support"
+    elif m == "véhicules disponibles" or "disponibles" in m:
+        return "available"
+    elif (m == "modifier mon profil" or m == "profil" or m == "mon profil" or
+          (any(word in m for word in ['profil', 'mon compte']) and
+           any(word in m for word in ['modifier', 'changer']))):
+        return "profile"
+    elif any(word in m for word in ['véhicule', 'véhicules', 'voiture', 'voitures']):
+        return "vehicles"
+    elif any(word in m for word in ['bonjour', 'salut', 'hello', 'hi', 'coucou']):
+        return "greeting"
+    elif any(word in m for word in ['réservation', 'réserver', 'louer']):
+        return "bookings"
+    elif any(word in m for word in ['annuler', 'annulation', 'supprimer']):
+        return "cancel"
+    elif any(word in m for word in ['merci', 'thanks', 'thank you']):
+        return "thanks"
+    return "fallback"
+
+def compiled_route(message: str) -> str:
+    return assistant_router.route(message).name
+
+def build_messages(count: int) -> list:
+    generator = random.Random(42)
+    messages = []
+    for _ in range(count):
+        message, _ = generator.choice(CORPUS)
+        extra = generator.randint(0, 3)
+        messages.append(" ".join([message] + generator.sample(FILLERS, extra)))
+    return messages
+
+def measure(route, messages) -> float:
+    started = time.perf_counter()
+    for message in messages:
+        route(message)
+    return time.perf_counter() - started
+
+# ========================================
+# MONTÉE EN CHARGE : INTENTIONS SYNTHÉTIQUES
+# ========================================
+def synthetic_keywords(intents: int) -> list:
+    return [[f"mot{i}x{k}" for k in range(KEYWORDS_PER_INTENT)] for i in range(intents)]
+
+def synthetic_chain(keyword_groups: list):
+    def route(message: str) -> str:
+        m = message.lower()
+        for i, words in enumerate(keyword_groups):
+            if any(word in m for word in words):
+                return f"intent{i}"
+        return "fallback"
+    return route
+
+def synthetic_router(keyword_groups: list):
+    router = IntentRouter()
+    for i, words in enumerate(keyword_groups):
+        router.intent(f"intent{i}", keywords=words)(None)
+    router.fallback()(None)
+    router.route("")
+    return lambda message: router.route(message).name
+
+def run_scaling(messages: list) -> None:
+    print(f"\nIntentions synthétiques ({KEYWORDS_PER_INTENT} mots-clés chacune), messages sans mot-clé reconnu :")
+    for intents in INTENT_COUNTS:
+        keyword_groups = synthetic_keywords(intents)
+        results = []
+        for route in (synthetic_chain(keyword_groups), synthetic_router(keyword_groups)):
+            elapsed = min(measure(route, messages) for _ in range(3))
+            results.append(f"{elapsed / len(messages) * 1e6:6.2f} µs/message")
+        print(f"  {intents:4d} intentions  if-chain {results[0]}  compilé {results[1]}")
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    messages = build_messages(count)
+    compiled_route("")  # compilation de l'expression régulière hors mesure
+    print(f"{count} messages, {len(assistant_router.intents)} intentions, corpus de {len(CORPUS)} messages étiquetés")
+    for label, route in (("if-chain", legacy_route), ("compilé", compiled_route)):
+        elapsed = min(measure(route, messages) for _ in range(3))
+        correct = sum(1 for message, intent in CORPUS if route(message) == intent)
+        print(f"  {label:9s} {count / elapsed:10.0f} messages/s  {elapsed / count * 1e6:6.2f} µs/message  "
+              f"précision {correct}/{len(CORPUS)}")
+    run_scaling(messages)
@@ -0,0 +1,156 @@
+# ============================================================
+# BENCHMARK : UPLOADS D'IMAGES SIMULTANÉS
+# ============================================================
+# Lance l'API dans un worker uvicorn séparé, puis lui envoie UPLOADS images simultanées
+# de taille proche de IMAGE_MAX_BYTES sur /upload-image/. Mesure le débit, les latences,
+# la mémoire résidente du worker (pic échantillonné dans /proc pendant la rafale, au-delà
+# de sa mémoire au repos) et la latence d'une requête légère (GET /vehicles?limit=1)
+# envoyée en boucle pendant la rafale : ce que subissent les autres clients.
+#
+#   blocking   copie d'avant (shutil.copyfileobj sur la boucle, nom UUID, pas de limite)
+#   streaming  store_upload (image_store.py) : morceaux écrits dans un thread, SHA-256
+#
+# Trois rafales par mode : images toutes différentes, la même image (dédupliquée en
+# mode streaming), et images au-delà de la limite (refusées en 413).
+# Les images sont des octets aléatoires (le contenu n'est pas décodé à l'upload) ; la
+# production des variantes est désactivée pour ne mesurer que la réception.
+# Linux uniquement (lecture de /proc/<pid>/status).
+#
+# Utilisation : python benchmarks/bench_uploads.py [uploads simultanés, défaut : 16]
+
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from common import main, reset_database, create_users, auth_headers, latency_summary, timed
+from image_store import IMAGE_MAX_BYTES, StoredImage
+
+import httpx
+
+MIB = 1024 * 1024
+PROBE_INTERVAL_S = 0.010
+RSS_SAMPLE_INTERVAL_S = 0.005
+
+# ========================================
+# WORKER (PROCESSUS FILS)
+# ========================================
+async def blocking_store_upload(file, content_type: str, folder: str, max_bytes: int = IMAGE_MAX_BYTES) -> StoredImage:
+    """
+    Copie d'avant image_store.py : écriture bloquante sur la boucle, sans limite ni empreinte.
+    """
+    filename = f"{uuid.uuid4()}.jpg"
+    with open(os.path.join(folder, filename), "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+    return StoredImage("", filename, os.path.getsize(os.path.join(folder, filename)), False)
+
+def serve(mode: str, port: int, folder: str) -> None:
+    import uvicorn
+    main.UPLOAD_FOLDER = folder
+    main.schedule_image_variants = lambda image_url: None
+    if mode == "blocking":
+        main.store_upload = blocking_store_upload
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+# ========================================
+# MESURES (PROCESSUS PARENT)
+# ========================================
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def rss_mib(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+async def sample_rss(pid: int, stop: asyncio.Event, samples: list) -> None:
+    while not stop.is_set():
+        samples.append(rss_mib(pid))
+        await asyncio.sleep(RSS_SAMPLE_INTERVAL_S)
+
+async def probe_requests(client, stop: asyncio.Event, latencies: list) -> None:
+    while not stop.is_set():
+        _, latency = await timed(client.get("/vehicles", params={"limit": 1}))
+        latencies.append(latency)
+        await asyncio.sleep(PROBE_INTERVAL_S)
+
+async def run_burst(client, pid: int, headers: dict, label: str, payloads: list) -> None:
+    baseline = rss_mib(pid)
+    stop = asyncio.Event()
+    rss_samples, probe_latencies = [], []
+    monitors = [asyncio.create_task(sample_rss(pid, stop, rss_samples)),
+                asyncio.create_task(probe_requests(client, stop, probe_latencies))]
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        timed(client.post("/upload-image/", headers=headers, files={"file": ("photo.jpg", payload, "image/jpeg")}))
+        for payload in payloads
+    ))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await asyncio.gather(*monitors)
+    statuses = {}
+    for response, _ in results:
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    accepted = sum(len(payload) for payload, (response, _) in zip(payloads, results) if response.status_code == 200)
+    print(f"  {label:12s} {len(payloads) / elapsed:6.1f} uploads/s  {accepted / MIB / elapsed:7.1f} Mio/s  "
+          f"statuts {statuses}  RSS du worker : +{max(rss_samples) - baseline:6.1f} Mio (repos {baseline:.0f} Mio)")
+    print(f"  {'':12s} uploads       {latency_summary([latency for _, latency in results])}")
+    print(f"  {'':12s} autre requête {latency_summary(probe_latencies)}")
+
+async def wait_until_ready(client, process) -> None:
+    for _ in range(300):
+        if process.poll() is not None:
+            raise RuntimeError("Le worker uvicorn s'est arrêté au démarrage")
+        try:
+            await client.get("/vehicles", params={"limit": 1})
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Le worker uvicorn ne répond pas")
+
+async def run_mode(mode: str, uploads: int, headers: dict) -> None:
+    folder = tempfile.mkdtemp(prefix="gest_app_bench_uploads_")
+    port = free_port()
+    # Le worker utilise la même base (utilisateur du jeton)
+    env = dict(os.environ, BENCH_DATABASE_URL=os.environ["DATABASE_URL"])
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", mode, str(port), folder],
+                               env=env, stdout=subprocess.DEVNULL)
+    size = IMAGE_MAX_BYTES - 64 * 1024
+    unique = [os.urandom(size) for _ in range(uploads)]
+    oversized = [os.urandom(IMAGE_MAX_BYTES + MIB) for _ in range(uploads)]
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120,
+                                     limits=httpx.Limits(max_connections=uploads + 1)) as client:
+            await wait_until_ready(client, process)
+            print(f"\n[{mode}] {uploads} uploads simultanés de {size / MIB:.1f} Mio (limite : {IMAGE_MAX_BYTES / MIB:.0f} Mio)")
+            await run_burst(client, process.pid, headers, "différentes", unique)
+            await run_burst(client, process.pid, headers, "identiques", [unique[0]] * uploads)
+            await run_burst(client, process.pid, headers, "trop grandes", oversized)
+    finally:
+        process.terminate()
+        process.wait()
+    stored = sum(len(files) for root, _, files in os.walk(folder) if not root.endswith("tmp"))
+    print(f"  fichiers stockés : {stored}")
+    shutil.rmtree(folder, ignore_errors=True)
+
+async def run(uploads: int) -> None:
+    await reset_database()
+    admin = (await create_users(1, "x", prefix="admin"))[0]
+    await main.async_engine.dispose()
+    for mode in ("blocking", "streaming"):
+        await run_mode(mode, uploads, auth_headers(admin))
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--serve"]:
+        serve(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+    else:
+        asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 16))
@@ -0,0 +1,75 @@
+# ============================================================
+# BENCHMARK : ÉCRITURE DIFFÉRÉE DES MESSAGES DE CHAT
+# ============================================================
+# CLIENTS clients envoient chacun MESSAGES messages (POST /conversations/{id}/messages)
+# dans leur propre conversation, avec l'écriture différée désactivée (une transaction
+# par message) puis activée (lots regroupés, voir message_writer.py). Le temps mesuré
+# inclut l'écriture des derniers messages en file (stop()) : les messages/s affichés
+# sont des messages effectivement écrits.
+#
+# Utilisation : python benchmarks/bench_write_behind.py [clients, défaut : 50] [messages par client, défaut : 40]
+
+import asyncio
+import sys
+import time
+
+from sqlalchemy import select, func
+
+from common import (main, reset_database, create_users, auth_headers, api_client,
+                    latency_summary, timed, database_label)
+from models import Conversation, Message, AsyncSessionLocal
+from message_writer import MessageWriteBehind
+
+async def post_messages(client, user, conversation_id: int, count: int, latencies: list) -> None:
+    headers = auth_headers(user)
+    for i in range(count):
+        response, latency = await timed(client.post(
+            f"/conversations/{conversation_id}/messages", headers=headers,
+            json={"content": f"Message {i} du banc d'essai", "is_user": i % 2 == 0}))
+        response.raise_for_status()
+        latencies.append(latency)
+
+async def run_mode(write_behind: bool, clients: int, messages: int) -> None:
+    await reset_database()
+    users = await create_users(clients, "x")
+    async with AsyncSessionLocal() as db:
+        conversations = [Conversation(user_id=user.id, title="Bench") for user in users]
+        db.add_all(conversations)
+        await db.commit()
+    writer = MessageWriteBehind(AsyncSessionLocal, main.conversation_activity) if write_behind else None
+    main.message_writer = writer
+    latencies = []
+    try:
+        async with api_client() as client:
+            started = time.perf_counter()
+            if writer is not None:
+                writer.start()
+            await asyncio.gather(*(post_messages(client, user, conversation.id, messages, latencies)
+                                   for user, conversation in zip(users, conversations)))
+            if writer is not None:
+                await writer.stop()
+            elapsed = time.perf_counter() - started
+    finally:
+        main.message_writer = None
+    async with AsyncSessionLocal() as db:
+        written = await db.scalar(select(func.count()).select_from(Message))
+    label = "write-behind" if write_behind else "direct"
+    print(f"\n[{label}] {written}/{clients * messages} messages écrits en {elapsed:.2f} s : "
+          f"{written / elapsed:.0f} messages/s")
+    print(f"  POST /messages  {latency_summary(latencies)}")
+    if writer is not None:
+        stats = writer.stats()
+        print(f"  lots : {stats['batches']}  taille moyenne : {stats['avg_batch_rows']}  "
+              f"abandonnés : {stats['dropped']}")
+
+async def run(clients: int = 50, messages: int = 40) -> None:
+    print(f"Base : {database_label()} - {clients} clients x {messages} messages")
+    try:
+        for write_behind in (False, True):
+            await run_mode(write_behind, clients, messages)
+    finally:
+        await main.async_engine.dispose()
+
+if __name__ == "__main__":
+    arguments = [int(value) for value in sys.argv[1:3]]
+    asyncio.run(run(*arguments))
@@ -0,0 +1,124 @@
+# ============================================================
+# OUTILS COMMUNS DES BENCHMARKS
+# ============================================================
+# Les benchmarks appellent l'application ASGI directement (httpx, sans serveur ni réseau)
+# sur une base SQLite temporaire, recréée à chaque scénario. Pour mesurer sur MySQL,
+# fournir une base dédiée : BENCH_DATABASE_URL="mysql+aiomysql://..." (ses tables sont
+# supprimées et recréées).
+#
+# BENCH_QUERY_LATENCY_MS (défaut : 0) ajoute à chaque requête SQL sur SQLite un délai,
+# passé dans le thread qui exécute la requête, pour simuler l'aller-retour réseau d'un
+# serveur MySQL : avec le pilote asynchrone, seul le thread d'aiosqlite attend ; avec
+# une session bloquante, c'est la boucle d'événements qui attend.
+
+import os
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DB_DIR = tempfile.mkdtemp(prefix="gest_app_bench_")
+
+# Avant l'import de models : le moteur est créé à l'import
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite+aiosqlite:///{BENCH_DB_DIR}/bench.db")
+os.chdir(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+from sqlalchemy import event
+
+import main
+from models import Base, User, vehicles, async_engine, engine, AsyncSessionLocal, IS_SQLITE, env_int
+
+BENCH_QUERY_LATENCY_MS = env_int("BENCH_QUERY_LATENCY_MS", 0)
+
+# ========================================
+# BASE DE DONNÉES
+# ========================================
+async def reset_database() -> None:
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    for cache in (main.principal_cache, main.favorites_cache, main.user_data_versions,
+                  main.assistant_static_replies, main.assistant_message_replies,
+                  main.assistant_catalog_replies, main.assistant_user_replies, main.srcset_cache):
+        cache.clear()
+    main.catalog_snapshot.bump()
+    main.catalog_rollup.invalidate()
+    main.availability_index.rebuild([])
+
+def _sqlite_connection(connection_record):
+    driver_connection = connection_record.driver_connection
+    # aiosqlite : la connexion sqlite3 est tenue par le thread du pilote
+    return getattr(driver_connection, "_conn", driver_connection)
+
+def _add_latency(dbapi_connection, connection_record):
+    delay = BENCH_QUERY_LATENCY_MS / 1000
+    _sqlite_connection(connection_record).set_trace_callback(lambda statement: time.sleep(delay))
+
+if IS_SQLITE and BENCH_QUERY_LATENCY_MS > 0:
+    event.listen(async_engine.sync_engine, "connect", _add_latency)
+    event.listen(engine, "connect", _add_latency)
+
+def database_label() -> str:
+    label = async_engine.dialect.name
+    if IS_SQLITE and BENCH_QUERY_LATENCY_MS > 0:
+        label += f" (+{BENCH_QUERY_LATENCY_MS} ms par requête)"
+    return label
+
+# ========================================
+# DONNÉES
+# ========================================
+async def create_users(count: int, password_hash: str, prefix: str = "bench") -> list:
+    async with AsyncSessionLocal() as db:
+        users = [User(username=f"{prefix}{i}", email=f"{prefix}{i}@bench.fr", hashed_password=password_hash)
+                 for i in range(count)]
+        db.add_all(users)
+        await db.commit()
+        return users
+
+async def create_cars(count: int) -> list:
+    async with AsyncSessionLocal() as db:
+        cars = [
+            vehicles(name=f"Voiture {i}", category=("SUV", "Citadine", "Berline")[i % 3], price=40 + i % 60,
+                     image=f"https://cdn.bench/car{i}.jpg", transmission="Automatique", seats=5, engine="1.5",
+                     year=2018 + i % 7, fuel="Essence", rating=3 + (i % 20) / 10)
+            for i in range(count)
+        ]
+        db.add_all(cars)
+        await db.commit()
+        return cars
+
+def auth_headers(user: User) -> dict:
+    token = main.create_access_token({"sub": user.email, "role": user.role or "user", "uid": user.id})
+    return {"Authorization": f"Bearer {token}"}
+
+# ========================================
+# CLIENT ET MESURES
+# ========================================
+@asynccontextmanager
+async def api_client():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        yield client
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def latency_summary(latencies_s) -> str:
+    ms = [value * 1000 for value in latencies_s]
+    return (f"p50 {percentile(ms, 0.50):8.1f} ms  p99 {percentile(ms, 0.99):8.1f} ms  "
+            f"max {max(ms) if ms else 0:8.1f} ms")
+
+async def timed(coroutine):
+    """
+    Attend une requête et renvoie (réponse, durée en secondes).
+    """
+    started = time.perf_counter()
+    response = await coroutine
+    return response, time.perf_counter() - started
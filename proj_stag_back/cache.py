@@ -0,0 +1,193 @@
+# ============================================================
+# CACHES EN MÉMOIRE DU PROCESSUS
+# ============================================================
+# Structures de cache partagées par toutes les requêtes d'un même worker.
+# Les routes s'exécutent sur la boucle d'événements ; les verrous de threads
+# protègent aussi les accès faits depuis les pools d'exécution et les scripts.
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Any, NamedTuple, Optional, List
+
+# ============================================================
+# INSTANTANÉ VERSIONNÉ (CATALOGUE)
+# ============================================================
+
+class Snapshot(NamedTuple):
+    """
+    Contenu figé d'un instantané : numéro de version, éléments et empreinte du contenu.
+    """
+    version: int
+    items: List[Any]
+    digest: str
+
+class VersionedSnapshot:
+    """
+    Instantané en mémoire d'une donnée rarement modifiée, reconstruit à la demande.
+
+    - bump() incrémente la version et invalide l'instantané (à appeler après chaque commit d'écriture).
+    - get(...) renvoie l'instantané courant, en le reconstruisant via `builder` (coroutine) si nécessaire.
+    - ttl_seconds borne l'âge de l'instantané : avec plusieurs workers, une écriture
+      faite dans un autre processus n'invalide pas celui-ci, le TTL limite donc la durée
+      pendant laquelle il peut servir des données périmées.
+
+    L'empreinte (digest) est calculée sur le contenu : deux reconstructions donnant les
+    mêmes données ont la même empreinte, quel que soit le worker.
+    """
+
+    def __init__(self, builder: Callable[..., Awaitable[List[Any]]], ttl_seconds: Optional[float] = None):
+        self._builder = builder
+        self._ttl_seconds = ttl_seconds
+        self._build_lock = asyncio.Lock()
+        self._version = 0
+        self._snapshot: Optional[Snapshot] = None
+        self._built_at = 0.0
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def bump(self) -> int:
+        """
+        Incrémente la version et invalide l'instantané courant.
+        """
+        self._version += 1
+        self._snapshot = None
+        return self._version
+
+    def token(self) -> str:
+        """
+        Jeton de version sans reconstruction, pour les réponses qui ne sont pas servies par
+        l'instantané : version locale + période de TTL courante, pour que les écritures
+        faites dans un autre worker le changent au plus tard après ttl_seconds.
+        """
+        period = int(time.time() // self._ttl_seconds) if self._ttl_seconds else 0
+        return f"v{self._version}.{period}"
+
+    def _is_fresh(self) -> bool:
+        if self._snapshot is None:
+            return False
+        return self._ttl_seconds is None or time.monotonic() - self._built_at <= self._ttl_seconds
+
+    async def get(self, *args, **kwargs) -> Snapshot:
+        """
+        Renvoie l'instantané courant ; le reconstruit s'il est invalidé ou expiré.
+        Les arguments sont transmis au builder (par exemple la session de base de données).
+        """
+        if self._is_fresh():
+            return self._snapshot
+        # Une seule coroutine reconstruit l'instantané, les autres attendent son résultat
+        async with self._build_lock:
+            if self._is_fresh():
+                return self._snapshot
+            version = self._version
+            items = await self._builder(*args, **kwargs)
+            payload = json.dumps(items, sort_keys=True, default=str).encode("utf-8")
+            digest = hashlib.sha256(payload).hexdigest()[:32]
+            snapshot = Snapshot(version, items, digest)
+            # Si une écriture a eu lieu pendant la reconstruction, le résultat n'est pas mis en cache
+            if self._version == version:
+                self._snapshot = snapshot
+                self._built_at = time.monotonic()
+            return snapshot
+
+# ============================================================
+# CACHE LRU BORNÉ AVEC DURÉE DE VIE (TTL)
+# ============================================================
+
+class LRUCache:
+    """
+    Cache clé → valeur borné en taille (éviction LRU) et en durée de vie (TTL).
+
+    Les valeurs stockées doivent être immuables (frozenset, tuple...) : elles sont
+    renvoyées telles quelles à plusieurs requêtes concurrentes.
+    Les compteurs hits / misses / evictions permettent de dimensionner le cache.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: Optional[float] = None):
+        self._maxsize = maxsize
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()  # clé → (valeur, date d'expiration)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _expires_at(self) -> Optional[float]:
+        return time.monotonic() + self._ttl_seconds if self._ttl_seconds is not None else None
+
+    def get(self, key, default=None):
+        """
+        Renvoie la valeur associée à la clé, ou `default` si elle est absente ou expirée.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value) -> None:
+        """
+        Enregistre une valeur ; évince l'entrée la moins récemment utilisée si le cache est plein.
+        """
+        with self._lock:
+            self._data[key] = (value, self._expires_at())
+            self._data.move_to_end(key)
+            while len(self._data) > self._maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def update(self, key, func: Callable[[Any], Any]) -> None:
+        """
+        Remplace la valeur en cache par func(valeur) si la clé est présente.
+        Une clé absente n'est pas créée : elle sera rechargée depuis la source au prochain accès.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data[key] = (func(entry[0]), entry[1])
+
+    def update_all(self, func: Callable[[Any], Any]) -> None:
+        """
+        Applique func à toutes les valeurs en cache (mise à jour globale, opération rare).
+        """
+        with self._lock:
+            for key, (value, expires_at) in self._data.items():
+                self._data[key] = (func(value), expires_at)
+
+    def pop(self, key) -> None:
+        """
+        Supprime une clé du cache (invalidation).
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """
+        Renvoie les compteurs du cache pour le suivi (taille, hits, misses, taux de succès).
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self._maxsize,
+                "ttl_seconds": self._ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,174 @@
+# ============================================================
+# AGRÉGATS DU CATALOGUE PAR CATÉGORIE
+# ============================================================
+# Cumul en mémoire, par catégorie : nombre de voitures, somme / minimum / maximum des prix,
+# nombre de voitures disponibles et modèle d'exemple (la première voiture de la catégorie).
+# Les écritures (ajout, modification, suppression, changement de disponibilité) le
+# mettent à jour voiture par voiture ; lire les agrégats coûte O(nombre de catégories).
+# Utilisé par les réponses "tarifs" / "catégories" de l'assistant et par GET /vehicles/stats.
+
+import bisect
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import vehicles
+
+class CarFacts(NamedTuple):
+    """
+    Colonnes d'une voiture utiles aux agrégats.
+    """
+    category: str
+    price: float
+    is_available: bool
+    name: str
+
+class CategoryTotals:
+    """
+    Agrégats d'une catégorie. Les prix sont gardés triés (bisect) pour que le minimum
+    et le maximum restent exacts après une suppression.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.price_sum = 0.0
+        self.available = 0
+        self.prices: List[float] = []
+        self.car_ids: List[int] = []  # triés : car_ids[0] est la voiture d'exemple
+
+    def add(self, car_id: int, facts: CarFacts) -> None:
+        self.count += 1
+        self.price_sum += facts.price
+        self.available += 1 if facts.is_available else 0
+        bisect.insort(self.prices, facts.price)
+        bisect.insort(self.car_ids, car_id)
+
+    def remove(self, car_id: int, facts: CarFacts) -> None:
+        self.count -= 1
+        self.price_sum -= facts.price
+        self.available -= 1 if facts.is_available else 0
+        del self.prices[bisect.bisect_left(self.prices, facts.price)]
+        del self.car_ids[bisect.bisect_left(self.car_ids, car_id)]
+
+class CatalogRollup:
+    """
+    Agrégats du catalogue par catégorie.
+
+    - rebuild(rows) le reconstruit à partir de la table "cars".
+    - upsert() / remove() / set_available() le mettent à jour après chaque écriture.
+    - ttl_seconds force une reconstruction périodique : avec plusieurs workers,
+      les écritures faites dans un autre processus ne sont pas vues autrement.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self._ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._cars: Dict[int, CarFacts] = {}
+        self._categories: Dict[str, CategoryTotals] = {}
+        self._built_at: Optional[float] = None
+
+    def needs_rebuild(self) -> bool:
+        if self._built_at is None:
+            return True
+        return self._ttl_seconds is not None and time.monotonic() - self._built_at > self._ttl_seconds
+
+    def invalidate(self) -> None:
+        """
+        Force une reconstruction au prochain accès (après une mise à jour en masse).
+        """
+        self._built_at = None
+
+    def rebuild(self, rows) -> None:
+        """
+        Reconstruit les agrégats à partir de lignes (id, category, price, isAvailable, name).
+        """
+        cars: Dict[int, CarFacts] = {}
+        categories: Dict[str, CategoryTotals] = {}
+        for car_id, category, price, is_available, name in rows:
+            facts = CarFacts(category, float(price), bool(is_available), name)
+            cars[car_id] = facts
+            categories.setdefault(category, CategoryTotals()).add(car_id, facts)
+        with self._lock:
+            self._cars = cars
+            self._categories = categories
+            self._built_at = time.monotonic()
+
+    def _remove_locked(self, car_id: int) -> None:
+        facts = self._cars.pop(car_id, None)
+        if facts is None:
+            return
+        totals = self._categories[facts.category]
+        totals.remove(car_id, facts)
+        if not totals.count:
+            del self._categories[facts.category]
+
+    def upsert(self, car_id: int, category: str, price, is_available: bool, name: str) -> None:
+        """
+        Ajoute une voiture, ou remplace ses valeurs après une modification.
+        """
+        facts = CarFacts(category, float(price), bool(is_available), name)
+        with self._lock:
+            self._remove_locked(car_id)
+            self._cars[car_id] = facts
+            self._categories.setdefault(category, CategoryTotals()).add(car_id, facts)
+
+    def remove(self, car_id: int) -> None:
+        with self._lock:
+            self._remove_locked(car_id)
+
+    def set_available(self, car_id: int, is_available: bool) -> None:
+        with self._lock:
+            facts = self._cars.get(car_id)
+            if facts is None or facts.is_available == bool(is_available):
+                return
+            self._categories[facts.category].available += 1 if is_available else -1
+            self._cars[car_id] = facts._replace(is_available=bool(is_available))
+
+    def categories(self) -> List[dict]:
+        """
+        Agrégats par catégorie, dans l'ordre du catalogue (première voiture de chaque catégorie).
+        """
+        with self._lock:
+            result = []
+            ordered = sorted(self._categories.items(), key=lambda item: item[1].car_ids[0])
+            for category, totals in ordered:
+                result.append({
+                    "category": category,
+                    "count": totals.count,
+                    "available": totals.available,
+                    "min_price": totals.prices[0],
+                    "max_price": totals.prices[-1],
+                    "avg_price": round(totals.price_sum / totals.count, 2),
+                    "example": self._cars[totals.car_ids[0]].name,
+                })
+        return result
+
+    def stats(self) -> dict:
+        """
+        Totaux du catalogue et agrégats par catégorie (réponse de GET /vehicles/stats).
+        """
+        categories = self.categories()
+        return {
+            "total": sum(c["count"] for c in categories),
+            "available": sum(c["available"] for c in categories),
+            "categories": categories,
+        }
+
+# Agrégats du worker, reconstruits depuis "cars" au premier accès puis toutes les
+# CATALOG_ROLLUP_TTL_SECONDS secondes (écritures des autres workers)
+CATALOG_ROLLUP_TTL_SECONDS = 300
+catalog_rollup = CatalogRollup(ttl_seconds=CATALOG_ROLLUP_TTL_SECONDS)
+
+async def get_catalog_rollup(db: AsyncSession) -> CatalogRollup:
+    """
+    Renvoie les agrégats du catalogue, reconstruits si nécessaire.
+    """
+    if catalog_rollup.needs_rebuild():
+        rows = (await db.execute(
+            select(vehicles.id, vehicles.category, vehicles.price, vehicles.isAvailable, vehicles.name)
+        )).all()
+        catalog_rollup.rebuild(rows)
+    return catalog_rollup
@@ -0,0 +1,80 @@
+# ============================================================
+# EXÉCUTEURS BORNÉS POUR LE TRAVAIL CPU
+# ============================================================
+# Enveloppe un pool (threads ou processus) avec une limite de tâches en attente :
+# au-delà, la soumission échoue immédiatement au lieu d'allonger la file,
+# ce qui permet de répondre 503 rapidement quand le serveur est saturé.
+
+import asyncio
+import threading
+from concurrent.futures import Executor, Future
+
+class ExecutorSaturated(Exception):
+    """
+    Levée quand le pool a déjà atteint son nombre maximal de tâches en cours et en attente.
+    """
+
+class BoundedExecutor:
+    """
+    Pool d'exécution avec file d'attente bornée.
+
+    max_pending = nombre de tâches en cours + en attente acceptées au maximum.
+    submit() ne bloque jamais : il lève ExecutorSaturated si la limite est atteinte.
+    """
+
+    def __init__(self, executor: Executor, max_pending: int):
+        self._executor = executor
+        self._max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.in_flight = 0
+
+    def _release(self, _future: Future) -> None:
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def submit(self, fn, *args) -> Future:
+        """
+        Soumet une tâche ; lève ExecutorSaturated si la file est pleine.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise ExecutorSaturated()
+        with self._lock:
+            self.submitted += 1
+            self.in_flight += 1
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    def run(self, fn, *args):
+        """
+        Exécute une tâche dans le pool et attend son résultat (depuis un thread).
+        """
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn, *args):
+        """
+        Exécute une tâche dans le pool et attend son résultat sans bloquer la boucle d'événements.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_pending": self._max_pending,
+                "in_flight": self.in_flight,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,47 @@
+# ============================================================
+# COMMANDE : RATTRAPAGE DES VARIANTES D'IMAGES
+# ============================================================
+# Produit les miniatures et variantes WebP / AVIF (voir image_variants.py) de toutes les
+# images de static/images qui n'ont pas encore de manifeste : images uploadées avant la
+# mise en place du pipeline, ou reportées quand le pool du serveur était saturé.
+# Le travail est réparti sur un pool de processus (un par cœur).
+#
+# Utilisation : python generate_image_variants.py [--force]
+#   --force  reproduit aussi les variantes des images qui en ont déjà
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from image_variants import generate_variants, is_original, manifest_path, variants_supported
+
+UPLOAD_FOLDER = "static/images"
+
+def pending_images(folder: str, force: bool):
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = [d for d in dirs if d != "tmp"]  # uploads en cours (voir image_store.py)
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if is_original(path) and (force or not os.path.exists(manifest_path(path))):
+                yield path
+
+if __name__ == "__main__":
+    if not variants_supported():
+        print("❌ Le module 'Pillow' est requis : pip install Pillow")
+        sys.exit(1)
+    force = "--force" in sys.argv[1:]
+    images = list(pending_images(UPLOAD_FOLDER, force))
+    started = time.perf_counter()
+    done = errors = 0
+    with ProcessPoolExecutor(max_workers=os.cpu_count() or 2) as pool:
+        futures = {pool.submit(generate_variants, path): path for path in images}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                done += 1
+            except Exception as e:
+                errors += 1
+                print(f"❌ {futures[future]} : {e}")
+    print(f"Images traitées : {done} - erreurs : {errors} - "
+          f"durée : {round(time.perf_counter() - started, 2)} s")
@@ -0,0 +1,109 @@
+# ============================================================
+# STOCKAGE DES IMAGES PAR EMPREINTE (CONTENT-ADDRESSED)
+# ============================================================
+# Une image uploadée est copiée par morceaux de IMAGE_CHUNK_BYTES octets dans un fichier
+# temporaire (écritures dans un thread : la boucle d'événements n'est jamais bloquée),
+# en calculant son SHA-256 au fil de l'eau. La copie s'arrête dès que IMAGE_MAX_BYTES
+# est dépassé. Le fichier est ensuite rangé sous son empreinte :
+#
+#   static/images/ab/cd/abcdef…0123.jpg
+#
+# (deux niveaux de sous-dossiers tirés de l'empreinte : pas de dossier géant).
+# Une image déjà stockée n'est pas réécrite : le fichier temporaire est supprimé et
+# la même URL est renvoyée.
+#
+# Variable d'environnement :
+#   IMAGE_MAX_BYTES  taille maximale d'une image (défaut : 10 Mio)
+
+import asyncio
+import hashlib
+import os
+import uuid
+from typing import NamedTuple
+
+from models import env_int
+
+IMAGE_MAX_BYTES = env_int("IMAGE_MAX_BYTES", 10 * 1024 * 1024)
+IMAGE_CHUNK_BYTES = 256 * 1024
+
+# Extension enregistrée pour chaque type accepté (le nom de fichier du client n'est pas utilisé)
+IMAGE_EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+    "image/webp": "webp",
+}
+
+class ImageTooLarge(Exception):
+    """
+    Levée quand l'image dépasse la taille maximale autorisée.
+    """
+
+class EmptyImage(Exception):
+    """
+    Levée quand le fichier uploadé est vide.
+    """
+
+class StoredImage(NamedTuple):
+    """
+    Image rangée sous son empreinte.
+    """
+    sha256: str
+    filename: str       # chemin relatif au dossier d'images : "ab/cd/<sha256>.<ext>"
+    size: int
+    deduplicated: bool  # True : le fichier existait déjà, rien n'a été écrit
+
+def image_relative_path(sha256: str, extension: str) -> str:
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}.{extension}"
+
+def _publish(tmp_path: str, final_path: str) -> bool:
+    """
+    Range le fichier temporaire à sa place définitive ; renvoie False s'il y était déjà.
+    """
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+        return False
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    os.replace(tmp_path, final_path)  # atomique : deux uploads simultanés du même fichier écrivent le même contenu
+    return True
+
+def _discard(tmp_path: str) -> None:
+    try:
+        os.remove(tmp_path)
+    except FileNotFoundError:
+        pass
+
+async def store_upload(file, content_type: str, folder: str, max_bytes: int = IMAGE_MAX_BYTES) -> StoredImage:
+    """
+    Copie un UploadFile par morceaux dans `folder`, rangé sous son SHA-256.
+    Lève ImageTooLarge (et ne garde rien) si la taille dépasse max_bytes, EmptyImage si le fichier est vide.
+    """
+    extension = IMAGE_EXTENSIONS[content_type]
+    tmp_folder = os.path.join(folder, "tmp")
+    os.makedirs(tmp_folder, exist_ok=True)
+    tmp_path = os.path.join(tmp_folder, f"{uuid.uuid4()}.part")
+    digest = hashlib.sha256()
+    size = 0
+    buffer = await asyncio.to_thread(open, tmp_path, "wb")
+    try:
+        try:
+            while True:
+                chunk = await file.read(IMAGE_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise ImageTooLarge()
+                digest.update(chunk)
+                await asyncio.to_thread(buffer.write, chunk)
+        finally:
+            await asyncio.to_thread(buffer.close)
+        if not size:
+            raise EmptyImage()
+    except BaseException:
+        await asyncio.to_thread(_discard, tmp_path)
+        raise
+    sha256 = digest.hexdigest()
+    filename = image_relative_path(sha256, extension)
+    written = await asyncio.to_thread(_publish, tmp_path, os.path.join(folder, filename))
+    return StoredImage(sha256, filename, size, not written)
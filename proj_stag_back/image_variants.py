@@ -0,0 +1,173 @@
+# ============================================================
+# DÉRIVÉS DES IMAGES : MINIATURES ET VARIANTES WEBP / AVIF
+# ============================================================
+# Pour chaque image originale, des versions redimensionnées aux largeurs VARIANT_WIDTHS
+# (jamais agrandies) sont produites en WebP, en AVIF si Pillow sait l'encoder, et dans
+# un format de repli (JPEG, ou PNG si l'image a de la transparence). Elles sont rangées
+# à côté de l'original, avec un manifeste JSON qui les liste :
+#
+#   static/images/ab/cd/<sha256>.jpg                 original
+#   static/images/ab/cd/<sha256>.w320.webp           variante de 320 px de large
+#   static/images/ab/cd/<sha256>.variants.json       manifeste
+#
+# generate_variants() est exécutée dans un pool de processus (travail CPU) : ce module
+# n'importe que la bibliothèque standard et Pillow, pour rester léger à charger dans
+# les processus du pool. Pillow est une dépendance optionnelle : sans elle, aucune
+# variante n'est produite et les images originales restent servies seules.
+
+import asyncio
+import json
+import os
+import re
+from typing import Dict, Iterable, Optional, Tuple
+
+from cache import LRUCache
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # dépendance optionnelle
+    Image = None
+    ImageOps = None
+
+# Largeurs produites (px) : cartes du catalogue, listes, fiche détaillée, plein écran
+VARIANT_WIDTHS = (160, 320, 640, 1280)
+WEBP_QUALITY = 80
+AVIF_QUALITY = 60
+JPEG_QUALITY = 82
+
+ORIGINAL_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+MANIFEST_SUFFIX = ".variants.json"
+_VARIANT_NAME = re.compile(r"\.w\d+\.[a-z]+$")
+
+STATIC_IMAGES_PATH = "/static/images/"
+
+def variants_supported() -> bool:
+    return Image is not None
+
+def is_original(path: str) -> bool:
+    """
+    True pour une image uploadée (ni variante, ni manifeste).
+    """
+    name = os.path.basename(path).lower()
+    return name.endswith(ORIGINAL_EXTENSIONS) and not _VARIANT_NAME.search(name)
+
+def manifest_path(source_path: str) -> str:
+    return os.path.splitext(source_path)[0] + MANIFEST_SUFFIX
+
+def variant_path(source_path: str, width: int, fmt: str) -> str:
+    return f"{os.path.splitext(source_path)[0]}.w{width}.{fmt}"
+
+# ========================================
+# GÉNÉRATION (PROCESSUS DU POOL)
+# ========================================
+def _save(image, path: str, fmt: str) -> None:
+    tmp_path = path + ".part"
+    if fmt == "webp":
+        image.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=4)
+    elif fmt == "avif":
+        image.save(tmp_path, "AVIF", quality=AVIF_QUALITY)
+    elif fmt == "png":
+        image.save(tmp_path, "PNG", optimize=True)
+    else:
+        image.convert("RGB").save(tmp_path, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    os.replace(tmp_path, path)
+
+def generate_variants(source_path: str) -> dict:
+    """
+    Produit les variantes d'une image et écrit son manifeste ; renvoie le manifeste.
+    Exécutée dans un processus du pool (ou par la commande de rattrapage).
+    """
+    if Image is None:
+        raise RuntimeError("Le module 'Pillow' est requis pour produire les variantes d'images")
+    Image.init()
+    with Image.open(source_path) as opened:
+        image = ImageOps.exif_transpose(opened)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    formats = ["webp"] + (["avif"] if "AVIF" in Image.SAVE else []) + ["png" if has_alpha else "jpg"]
+    widths = [w for w in VARIANT_WIDTHS if w < image.width] or [image.width]
+    variants = {fmt: {} for fmt in formats}
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in formats:
+            path = variant_path(source_path, width, fmt)
+            _save(resized, path, fmt)
+            variants[fmt][str(width)] = os.path.basename(path)
+    manifest = {
+        "source": os.path.basename(source_path),
+        "width": image.width,
+        "height": image.height,
+        "variants": variants,
+    }
+    target = manifest_path(source_path)
+    with open(target + ".part", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(target + ".part", target)
+    return manifest
+
+# ========================================
+# LECTURE : CARTE "SRCSET" D'UNE IMAGE
+# ========================================
+# Carte format → srcset ("…w160.webp 160w, …w320.webp 320w"), lue depuis le manifeste.
+# Gardée SRCSET_CACHE_TTL_SECONDS secondes : les variantes produites par un autre worker
+# (ou par la commande de rattrapage) apparaissent au plus tard après ce délai.
+# Les manifestes sont lus dans un thread par load_srcsets(), appelée avant de construire
+# une réponse ; image_srcset() ne lit que le cache (aucun accès disque sur la boucle).
+SRCSET_CACHE_SIZE = 10000
+SRCSET_CACHE_TTL_SECONDS = 300
+srcset_cache = LRUCache(maxsize=SRCSET_CACHE_SIZE, ttl_seconds=SRCSET_CACHE_TTL_SECONDS)
+
+def local_image_path(image_url: Optional[str], folder: str) -> Optional[str]:
+    """
+    Chemin sur disque d'une image servie sous /static/images/, None pour une URL externe.
+    """
+    if not image_url or STATIC_IMAGES_PATH not in image_url:
+        return None
+    relative = image_url.split(STATIC_IMAGES_PATH, 1)[1].split("?", 1)[0]
+    root = os.path.abspath(folder)
+    path = os.path.abspath(os.path.join(root, relative))
+    if not path.startswith(root + os.sep):
+        return None
+    return path
+
+def _read_srcset(image_url: str, path: str) -> Tuple[Tuple[str, str], ...]:
+    try:
+        with open(manifest_path(path), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return ()
+    base_url = image_url.rsplit("/", 1)[0]
+    return tuple(
+        (fmt, ", ".join(f"{base_url}/{name} {width}w" for width, name in sorted(by_width.items(), key=lambda item: int(item[0]))))
+        for fmt, by_width in manifest.get("variants", {}).items()
+    )
+
+def _read_srcsets(paths: Dict[str, str]) -> Dict[str, Tuple[Tuple[str, str], ...]]:
+    return {image_url: _read_srcset(image_url, path) for image_url, path in paths.items()}
+
+async def load_srcsets(image_urls: Iterable[Optional[str]], folder: str) -> None:
+    """
+    Met en cache les cartes srcset qui n'y sont pas, en lisant leurs manifestes dans un
+    thread (une seule tâche pour toutes les images d'une réponse).
+    """
+    missing: Dict[str, str] = {}
+    for image_url in image_urls:
+        if image_url in missing:
+            continue
+        path = local_image_path(image_url, folder)
+        if path is not None and srcset_cache.get(image_url) is None:
+            missing[image_url] = path
+    if missing:
+        for image_url, srcset in (await asyncio.to_thread(_read_srcsets, missing)).items():
+            srcset_cache.set(image_url, srcset)
+
+def image_srcset(image_url: Optional[str]) -> Optional[dict]:
+    """
+    Carte format → srcset des variantes d'une image, None si elle n'en a pas (encore)
+    ou si elle n'a pas été chargée par load_srcsets().
+    """
+    if not image_url:
+        return None
+    srcset = srcset_cache.get(image_url)
+    return dict(srcset) if srcset else None
@@ -0,0 +1,112 @@
+# ============================================================
+# ROUTEUR D'INTENTIONS COMPILÉ
+# ============================================================
+# Chaque gestionnaire déclare ses mots-clés ; tous les mots-clés de toutes les intentions
+# sont compilés en une seule expression régulière. Un message est normalisé une fois
+# (minuscules, sans accents ni ponctuation), parcouru une fois, puis chaque intention
+# touchée reçoit un score : le coût ne dépend plus du nombre d'intentions déclarées.
+#
+# Les mots-clés sont reconnus comme mots entiers ("hi" ne correspond plus à "véhicule").
+
+import re
+import unicodedata
+from typing import Awaitable, Callable, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+_COMBINING_MARKS = re.compile(r"[\u0300-\u036f]")  # accents séparés de leur lettre par NFKD
+
+def normalize_text(text: str) -> str:
+    """
+    Minuscules, accents retirés, ponctuation remplacée par des espaces.
+    "Comment réserver ?" → "comment reserver"
+    """
+    text = text.lower()
+    if not text.isascii():
+        text = _COMBINING_MARKS.sub("", unicodedata.normalize("NFKD", text))
+    return _NON_WORD.sub(" ", text).strip()
+
+class Intent(NamedTuple):
+    """
+    Intention déclarée : son gestionnaire et les règles qui la reconnaissent.
+    """
+    name: str
+    handler: Callable[..., Awaitable[str]]
+    keywords: FrozenSet[str]
+    requires: Tuple[FrozenSet[str], ...]   # chaque groupe doit avoir au moins un mot reconnu
+    weight: float
+    order: int                             # départage les scores égaux (ordre de déclaration)
+    scope: Optional[str]                   # données dont dépend la réponse (clé de cache), None : aucune mise en cache
+
+class IntentRouter:
+    """
+    Registre d'intentions.
+
+    - intent(...) : décorateur qui enregistre un gestionnaire avec ses mots-clés,
+      ses phrases exactes (boutons de suggestion), ses groupes de mots obligatoires
+      et la portée de sa réponse (scope), utilisée comme clé de cache par l'appelant.
+    - fallback(...) : décorateur du gestionnaire utilisé quand rien n'est reconnu.
+    - route(message) : renvoie l'intention de meilleur score.
+    """
+
+    def __init__(self):
+        self._intents: List[Intent] = []
+        self._exact: Dict[str, Intent] = {}
+        self._fallback: Optional[Intent] = None
+        self._pattern: Optional[re.Pattern] = None
+        self._keyword_intents: Dict[str, List[Intent]] = {}
+
+    def intent(self, name: str, keywords=(), exact=(), requires=(), weight: float = 1.0, scope: Optional[str] = None):
+        def decorator(handler):
+            required_groups = tuple(frozenset(normalize_text(k) for k in group) for group in requires)
+            all_keywords = {normalize_text(k) for k in keywords}
+            for group in required_groups:
+                all_keywords |= group
+            intent = Intent(name, handler, frozenset(all_keywords), required_groups, weight, len(self._intents), scope)
+            self._intents.append(intent)
+            for phrase in exact:
+                self._exact[normalize_text(phrase)] = intent
+            self._pattern = None  # recompilé au prochain route()
+            return handler
+        return decorator
+
+    def fallback(self, name: str = "fallback", scope: Optional[str] = None):
+        def decorator(handler):
+            self._fallback = Intent(name, handler, frozenset(), (), 0.0, len(self._intents), scope)
+            return handler
+        return decorator
+
+    def _compile(self) -> None:
+        keyword_intents: Dict[str, List[Intent]] = {}
+        for intent in self._intents:
+            for keyword in intent.keywords:
+                keyword_intents.setdefault(keyword, []).append(intent)
+        # Les plus longs d'abord : "thank you" est préféré à "thank" à la même position
+        alternatives = sorted(keyword_intents, key=len, reverse=True)
+        self._pattern = re.compile(r"\b(?:" + "|".join(re.escape(k) for k in alternatives) + r")\b")
+        self._keyword_intents = keyword_intents
+
+    def route(self, message: str) -> Intent:
+        """
+        Renvoie l'intention du message (le fallback si aucune n'est reconnue).
+        """
+        if self._pattern is None:
+            self._compile()
+        text = normalize_text(message)
+        exact = self._exact.get(text)
+        if exact is not None:
+            return exact
+        matched = set(self._pattern.findall(text))
+        best: Optional[Intent] = None
+        best_key = None
+        for keyword in matched:
+            for intent in self._keyword_intents[keyword]:
+                if intent.requires and not all(group & matched for group in intent.requires):
+                    continue
+                key = (len(intent.keywords & matched) * intent.weight, -intent.order)
+                if best_key is None or key > best_key:
+                    best, best_key = intent, key
+        return best if best is not None else self._fallback
+
+    @property
+    def intents(self) -> List[Intent]:
+        return list(self._intents)
@@ -3,7 +3,7 @@
 # ========================================
 
 # Importation de FastAPI pour créer l'application web et gérer les requêtes HTTP
-from fastapi import FastAPI, HTTPException, Depends, status, Form, Request, UploadFile, File
+from fastapi import FastAPI, HTTPException, Depends, status, Form, Request, UploadFile, File, Query, Response, Header
 
 # Middleware pour gérer le CORS (Cross-Origin Resource Sharing) - permet à d'autres domaines d'accéder à l'API
 from fastapi.middleware.cors import CORSMiddleware
@@ -14,17 +14,52 @@ from fastapi.staticfiles import StaticFiles
 # Modèles Pydantic pour la validation des données reçues et envoyées
 from pydantic import BaseModel, EmailStr
 
-# Session de base de données SQLAlchemy
+# Session asynchrone de base de données SQLAlchemy
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Expressions SQL (requêtes, filtres et pagination par curseur)
+from sqlalchemy import select, delete, and_, or_, func, exists, update, event, inspect
+
+# Session synchrone (événements ORM : invalidation du cache des principaux)
 from sqlalchemy.orm import Session
 
 # Bibliothèque bcrypt pour le hachage et la vérification des mots de passe
 import bcrypt
 
 # Importation des modèles SQLAlchemy définis dans le fichier models.py
-from models import User, Admin, vehicles, Favorite, Booking, Conversation, Message, Base, engine, SessionLocal
+from models import User, Admin, vehicles, Favorite, Booking, Conversation, Message, BOOKING_STATUSES, ACTIVE_BOOKING_STATUSES, async_engine, AsyncSessionLocal, pool_stats, IS_SQLITE
+
+# Caches en mémoire partagés par les requêtes du worker
+from cache import VersionedSnapshot, LRUCache
+
+# Index en mémoire des périodes réservées par voiture
+from availability import AvailabilityIndex
+
+# Assistant de chat (classification des messages et réponses)
+from assistant import assistant_router
+
+# Agrégats du catalogue par catégorie (assistant et /vehicles/stats)
+from catalog_stats import catalog_rollup, get_catalog_rollup
+
+# Rétention et archivage compressé des messages
+from message_archive import ArchivePolicy, run_archiver, archive_totals, has_archives, rehydrate_conversation
+
+# Import de l'écriture différée (regroupée) des messages de chat
+from message_writer import CHAT_WRITE_BEHIND, MessageWriteBehind
+
+# Import du stockage des images par empreinte SHA-256
+from image_store import IMAGE_EXTENSIONS, IMAGE_MAX_BYTES, EmptyImage, ImageTooLarge, store_upload
+
+# Import des dérivés d'images (miniatures, WebP / AVIF) et de leur carte "srcset"
+from image_variants import generate_variants, image_srcset, load_srcsets, local_image_path, manifest_path, srcset_cache, variants_supported
+
+# Pool borné pour le travail CPU (bcrypt)
+from executors import BoundedExecutor, ExecutorSaturated
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
 
 # Types optionnels et listes pour les annotations de type
-from typing import Optional, List
+from typing import Optional, List, NamedTuple
 
 # Modules pour la gestion des dates et heures
 from datetime import datetime, timedelta, date
@@ -35,15 +70,32 @@ from jose import JWTError, jwt
 # Schéma OAuth2 pour l'authentification par token
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 
-# Réponse JSON personnalisée
-from fastapi.responses import JSONResponse
+# Réponse JSON personnalisée et réponse en flux (exports)
+from fastapi.responses import JSONResponse, StreamingResponse
 
 # Modules système pour la manipulation de fichiers et de chemins
 import os
-import shutil
 
-# Génération d'identifiants uniques pour les noms de fichiers uploadés
-import uuid
+# Encodage des curseurs de pagination
+import base64
+import json
+from decimal import Decimal
+
+# Calcul des ETag du catalogue
+import hashlib
+
+# Export des réservations en CSV / NDJSON compressé
+import csv
+import io
+import zlib
+
+# Tâche de fond (réconciliation de la disponibilité) et mesures de durée
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+# Numéros de version des données personnelles (cache de l'assistant)
+import itertools
 
 # ========================================
 # CONFIGURATION JWT
@@ -58,16 +110,75 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
 # ========================================
-# INITIALISATION DE LA BASE DE DONNÉES
+# CYCLE DE VIE DE L'APPLICATION
 # ========================================
-# Crée toutes les tables définies dans les modèles SQLAlchemy si elles n'existent pas déjà
-Base.metadata.create_all(bind=engine)
+# Active la réconciliation automatique de la disponibilité des voitures (au démarrage puis à chaque changement de jour)
+AVAILABILITY_RECONCILER_ENABLED = True
+
+async def availability_reconciler_loop():
+    """
+    Tâche de fond : recalcule "isAvailable" au démarrage puis juste après chaque minuit.
+    """
+    while True:
+        try:
+            await run_availability_reconciler()
+        except Exception as e:
+            print(f"❌ Erreur du réconciliateur de disponibilité: {e}")
+        now = datetime.now()
+        next_run = datetime.combine(now.date() + timedelta(days=1), datetime.min.time()) + timedelta(seconds=5)
+        await asyncio.sleep((next_run - now).total_seconds())
+
+# Active l'archivage automatique des messages (chaque jour à MESSAGE_ARCHIVER_HOUR heures)
+MESSAGE_ARCHIVER_ENABLED = True
+MESSAGE_ARCHIVER_HOUR = 3
+
+async def message_archiver_loop():
+    """
+    Tâche de fond : archive les messages des conversations éligibles une fois par jour.
+    """
+    while True:
+        now = datetime.now()
+        next_run = datetime.combine(now.date(), datetime.min.time()) + timedelta(hours=MESSAGE_ARCHIVER_HOUR)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        await asyncio.sleep((next_run - now).total_seconds())
+        try:
+            await run_message_archiver()
+        except Exception as e:
+            print(f"❌ Erreur de l'archivage des messages: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Démarre les tâches de fond au lancement du serveur et les arrête à sa fermeture.
+    """
+    background_tasks = []
+    if AVAILABILITY_RECONCILER_ENABLED:
+        background_tasks.append(asyncio.create_task(availability_reconciler_loop()))
+    if MESSAGE_ARCHIVER_ENABLED:
+        background_tasks.append(asyncio.create_task(message_archiver_loop()))
+    if message_writer is not None:
+        message_writer.start()
+    yield
+    bcrypt_pool.shutdown(wait=False)
+    image_pool.shutdown(wait=False)
+    for task in background_tasks:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    # Termine les enregistrements de messages en cours, puis ferme les connexions du pool
+    await drain_chat_persist_tasks()
+    if message_writer is not None:
+        await message_writer.stop()
+    await async_engine.dispose()
 
 # ========================================
 # INITIALISATION DE L'APPLICATION FASTAPI
 # ========================================
 # Crée une instance de l'application FastAPI avec un titre et une version
-app = FastAPI(title="API d'Authentification", version="1.0.0")
+app = FastAPI(title="API d'Authentification", version="1.0.0", lifespan=lifespan)
 
 # ========================================
 # CONFIGURATION DU DOSSIER D'IMAGES UPLOADÉES
@@ -96,15 +207,12 @@ app.add_middleware(
 # ========================================
 # FONCTIONS UTILITAIRES DE BASE DE DONNÉES
 # ========================================
-def get_db():
+async def get_db():
     """
-    Dépendance FastAPI pour obtenir une session de base de données.
+    Dépendance FastAPI pour obtenir une session asynchrone de base de données.
     """
-    db = SessionLocal()  # Crée une nouvelle session
-    try:
-        yield db  # Fournit la session à la route
-    finally:
-        db.close()  # Ferme la session après utilisation
+    async with AsyncSessionLocal() as db:  # Crée une nouvelle session
+        yield db  # Fournit la session à la route, fermée automatiquement après utilisation
 
 # ========================================
 # FONCTIONS UTILITAIRES DE SÉCURITÉ
@@ -122,6 +230,32 @@ def verify_password(password: str, hashed: str) -> bool:
     """
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+# Pool dédié aux calculs bcrypt (~250 ms de CPU chacun, le GIL est relâché pendant le calcul).
+# Il borne le nombre de hachages simultanés et la file d'attente : au-delà, la requête
+# est refusée immédiatement (503) au lieu d'occuper le pool de threads de FastAPI.
+BCRYPT_POOL_SIZE = os.cpu_count() or 2
+BCRYPT_QUEUE_LIMIT = 32
+bcrypt_pool = BoundedExecutor(
+    ThreadPoolExecutor(max_workers=BCRYPT_POOL_SIZE, thread_name_prefix="bcrypt"),
+    max_pending=BCRYPT_POOL_SIZE + BCRYPT_QUEUE_LIMIT
+)
+
+def bcrypt_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Serveur occupé, veuillez réessayer dans un instant",
+        headers={"Retry-After": "1"}
+    )
+
+async def run_bcrypt_async(fn, *args):
+    """
+    Exécute hash_password / verify_password dans le pool bcrypt sans bloquer la boucle d'événements.
+    """
+    try:
+        return await bcrypt_pool.run_async(fn, *args)
+    except ExecutorSaturated:
+        raise bcrypt_busy_exception()
+
 def user_response(user: User):
     """
     Transforme un objet User en dictionnaire sérialisable (sans le mot de passe).
@@ -134,6 +268,30 @@ def user_response(user: User):
         "created_at": user.created_at.isoformat() if user.created_at else None
     }
 
+class Principal(NamedTuple):
+    """
+    Instantané immuable de l'utilisateur authentifié, partagé entre requêtes via principal_cache.
+    Expose les mêmes attributs que User (sauf le mot de passe) : user_response() l'accepte aussi.
+    """
+    id: int
+    username: str
+    email: str
+    role: str
+    is_active: bool
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user.id, user.username, user.email, user.role, user.is_active, user.created_at)
+
+class TokenClaims(NamedTuple):
+    """
+    Identité lue uniquement dans le token JWT (sans base de données), pour les endpoints en lecture seule.
+    """
+    id: int
+    email: str
+    role: str
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     """
     Crée un token JWT avec une date d'expiration.
@@ -216,7 +374,8 @@ class MessageResponse(BaseModel):
 
 class ConversationResponse(BaseModel):
     """
-    Schéma de réponse pour une conversation (avec ses messages).
+    Schéma de réponse pour une conversation. Les messages ne sont pas inclus :
+    ils se lisent page par page via GET /conversations/{id}/messages.
     """
     id: int
     user_id: int
@@ -224,7 +383,9 @@ class ConversationResponse(BaseModel):
     created_at: datetime
     updated_at: datetime
     is_active: bool
-    messages: List[MessageResponse] = []  # Liste des messages de la conversation
+    message_count: int = 0
+    last_message_at: Optional[datetime] = None
+    messages: List[MessageResponse] = []  # Toujours vide (conservé pour compatibilité)
     class Config:
         from_attributes = True
 
@@ -258,43 +419,43 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 # ENDPOINTS D'AUTHENTIFICATION
 # ========================================
 @app.post("/register", status_code=status.HTTP_201_CREATED)
-def register(user: UserRegister, db: Session = Depends(get_db)):
+async def register(user: UserRegister, db: AsyncSession = Depends(get_db)):
     """
     Endpoint d'inscription d'un nouvel utilisateur.
     """
     # Vérifie si un utilisateur avec cet email existe déjà
-    existing_user = db.query(User).filter(User.email == user.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user.email).limit(1))
     if existing_user:
         raise HTTPException(status_code=400, detail="Email déjà utilisé")
     # Crée un nouvel utilisateur avec le mot de passe hashé
     new_user = User(
         username=user.username,
         email=user.email,
-        hashed_password=hash_password(user.password)
+        hashed_password=await run_bcrypt_async(hash_password, user.password)
     )
     db.add(new_user)  # Ajoute à la session
-    db.commit()  # Valide la transaction
-    db.refresh(new_user)  # Rafraîchit l'objet pour obtenir l'ID généré
+    await db.commit()  # Valide la transaction
+    await db.refresh(new_user)  # Rafraîchit l'objet pour obtenir l'ID généré
     return {
         "message": "Inscription réussie",
         "user": user_response(new_user)  # Retourne les infos de l'utilisateur sans mot de passe
     }
 
 @app.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     """
     Endpoint de connexion. Utilise le formulaire OAuth2 (username/password).
     Le champ username peut être soit l'email soit le nom d'utilisateur.
     """
     # Recherche un utilisateur par email OU par nom d'utilisateur
-    db_user = db.query(User).filter(
+    db_user = await db.scalar(select(User).where(
         (User.email == form_data.username) | (User.username == form_data.username)
-    ).first()
+    ).limit(1))
     # Vérifie l'existence et le mot de passe
-    if not db_user or not verify_password(form_data.password, db_user.hashed_password):
+    if not db_user or not await run_bcrypt_async(verify_password, form_data.password, db_user.hashed_password):
         raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
     # Crée un token JWT avec l'email et le rôle
-    access_token = create_access_token(data={"sub": db_user.email, "role": db_user.role})
+    access_token = create_access_token(data={"sub": db_user.email, "role": db_user.role, "uid": db_user.id})
 
     # -------------------------------------------------------
     # SYNCHRONISATION AVEC LA TABLE "admins"
@@ -302,7 +463,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     # Si l'utilisateur est admin, on s'assure qu'il est bien présent
     # dans la table "admins" avec tous ses attributs à jour.
     if db_user.role == "admin":
-        existing_admin = db.query(Admin).filter(Admin.user_id == db_user.id).first()
+        existing_admin = await db.scalar(select(Admin).where(Admin.user_id == db_user.id).limit(1))
         if not existing_admin:
             # L'admin n'est pas encore dans la table admins → on l'ajoute avec tous ses attributs
             new_admin = Admin(
@@ -315,18 +476,84 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
                 created_at=db_user.created_at
             )
             db.add(new_admin)
-            db.commit()
+            await db.commit()
             print(f"✅ Admin '{db_user.username}' ajouté dans la table admins")
 
+    principal_cache.set(db_user.email, Principal.from_user(db_user))
     return {
         "access_token": access_token,
         "token_type": "bearer",
         "user": user_response(db_user)
     }
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """
-    Dépendance pour obtenir l'utilisateur courant à partir du token JWT.
+# Cache des utilisateurs authentifiés : email (champ "sub" du token) → Principal.
+# Invalidé par update_profile et reset_password, et, après chaque commit, pour tout
+# utilisateur supprimé ou dont l'email, le nom, le rôle ou l'état a changé dans une
+# session de ce worker (voir track_principal_changes). Le TTL borne l'écart avec les
+# modifications faites par un autre worker ou directement en base.
+PRINCIPAL_CACHE_MAX_USERS = 10000
+PRINCIPAL_CACHE_TTL_SECONDS = 60
+principal_cache = LRUCache(maxsize=PRINCIPAL_CACHE_MAX_USERS, ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS)
+
+def invalidate_principal(*emails: str) -> None:
+    """
+    Retire des utilisateurs du cache des principaux (après modification de leur compte ou de leur rôle).
+    """
+    for email in emails:
+        if email:
+            principal_cache.pop(email)
+
+# Colonnes copiées dans Principal : leur modification invalide l'entrée du cache
+PRINCIPAL_COLUMNS = ("email", "username", "role", "is_active")
+
+@event.listens_for(Session, "after_flush")
+def track_principal_changes(session, flush_context) -> None:
+    """
+    Note les utilisateurs supprimés ou modifiés ; leurs entrées sont retirées au commit.
+    """
+    emails = session.info.setdefault("principal_emails", set())
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            # Valeur déjà chargée (pas de chargement paresseux pendant le flush)
+            email = inspect(obj).dict.get("email")
+            if email is None:
+                session.info["principal_clear_all"] = True
+            emails.add(email)
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if any(state.attrs[column].history.has_changes() for column in PRINCIPAL_COLUMNS):
+            # Ancien et nouvel email : un token peut encore porter l'un ou l'autre
+            known_emails = state.attrs["email"].history.sum()
+            if not known_emails:
+                session.info["principal_clear_all"] = True
+            emails.update(known_emails)
+
+@event.listens_for(Session, "do_orm_execute")
+def track_bulk_user_changes(orm_execute_state) -> None:
+    """
+    UPDATE / DELETE en masse sur "users" : les lignes touchées sont inconnues, tout le cache est vidé au commit.
+    """
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and any(
+        mapper.class_ is User for mapper in orm_execute_state.all_mappers
+    ):
+        orm_execute_state.session.info["principal_clear_all"] = True
+
+@event.listens_for(Session, "after_commit")
+def invalidate_committed_principals(session) -> None:
+    if session.info.pop("principal_clear_all", False):
+        principal_cache.clear()
+    invalidate_principal(*session.info.pop("principal_emails", ()))
+
+@event.listens_for(Session, "after_rollback")
+def discard_principal_changes(session) -> None:
+    session.info.pop("principal_clear_all", None)
+    session.info.pop("principal_emails", None)
+
+def decode_token(token: str) -> dict:
+    """
+    Décode et vérifie un token JWT. Lève une erreur 401 s'il est invalide.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -334,135 +561,606 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        # Décode le token JWT
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
+    if payload.get("sub") is None:
+        raise credentials_exception
+    return payload
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    """
+    Dépendance pour obtenir l'utilisateur courant (objet SQLAlchemy) à partir du token JWT.
+    À réserver aux endpoints qui modifient l'utilisateur ; les autres utilisent get_current_principal.
+    """
+    email: str = decode_token(token)["sub"]
     # Récupère l'utilisateur correspondant dans la base de données
-    user = db.query(User).filter(User.email == email).first()
+    user = await db.scalar(select(User).where(User.email == email).limit(1))
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token invalide",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
+async def get_current_principal(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
+    """
+    Dépendance pour obtenir l'utilisateur courant sous forme d'instantané immuable.
+    Servi depuis principal_cache : pas de requête SQL tant que l'entrée est valide.
+    """
+    email: str = decode_token(token)["sub"]
+    principal = principal_cache.get(email)
+    if principal is None:
+        user = await db.scalar(select(User).where(User.email == email).limit(1))
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Token invalide",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        principal = Principal.from_user(user)
+        principal_cache.set(email, principal)
+    return principal
+
+async def get_current_claims(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> TokenClaims:
+    """
+    Dépendance rapide pour les endpoints en lecture seule : l'identité est lue dans le token
+    (champs "sub", "role" et "uid"), sans cache ni base de données.
+    Les tokens émis avant l'ajout du champ "uid" passent par get_current_principal.
+    """
+    payload = decode_token(token)
+    user_id = payload.get("uid")
+    if user_id is None:
+        principal = await get_current_principal(token, db)
+        return TokenClaims(principal.id, principal.email, principal.role)
+    return TokenClaims(int(user_id), payload["sub"], payload.get("role", "user"))
+
 @app.post("/forgot-password/reset")
-def reset_password(data: ResetPassword, db: Session = Depends(get_db)):
+async def reset_password(data: ResetPassword, db: AsyncSession = Depends(get_db)):
     """
     Endpoint pour réinitialiser le mot de passe .
     """
-    user = db.query(User).filter(User.email == data.email).first()
+    user = await db.scalar(select(User).where(User.email == data.email).limit(1))
     if not user:
         raise HTTPException(status_code=404, detail="Aucun compte associé à cet email")
 
     # Hache le nouveau mot de passe
-    new_hashed = hash_password(data.new_password)
+    new_hashed = await run_bcrypt_async(hash_password, data.new_password)
 
     # 1. Met à jour le mot de passe dans la table 'users'
     user.hashed_password = new_hashed
 
     # 2. Si c'est un admin, synchronise aussi la table 'admins'
     if user.role == "admin":
-        admin_entry = db.query(Admin).filter(Admin.user_id == user.id).first()
+        admin_entry = await db.scalar(select(Admin).where(Admin.user_id == user.id).limit(1))
         if admin_entry:
             admin_entry.hashed_password = new_hashed
             print(f"✅ Mot de passe synchronisé dans admins pour '{user.username}'")
 
-    db.commit()
+    await db.commit()
+    invalidate_principal(user.email)
     return {"message": "Mot de passe réinitialisé avec succès"}
 
 # ========================================
 # ENDPOINTS POUR LES VÉHICULES
 # ========================================
+def decimal_value(value) -> Decimal:
+    """
+    Valeur décimale lue dans un curseur. Lève ValueError si ce n'est pas un nombre fini.
+    """
+    try:
+        result = Decimal(str(value))
+    except ArithmeticError:
+        raise ValueError(f"Valeur décimale invalide : {value!r}")
+    if not result.is_finite():
+        raise ValueError(f"Valeur décimale invalide : {value!r}")
+    return result
+
+def text_value(value) -> str:
+    """
+    Valeur texte lue dans un curseur. Lève TypeError si ce n'est pas une chaîne.
+    """
+    if not isinstance(value, str):
+        raise TypeError(f"Valeur texte invalide : {value!r}")
+    return value
+
+# Colonnes autorisées pour le tri du catalogue, avec la conversion de la valeur
+# du curseur. Toutes sont NOT NULL (year et rating valent 0 quand ils sont inconnus,
+# voir la migration 0007) : le tri et le curseur portent sur la colonne brute, servie
+# par son index composite (colonne, id) (migrations 0002, 0007 et 0008).
+VEHICLE_SORT_COLUMNS = {
+    "id": (vehicles.id, int),
+    "price": (vehicles.price, decimal_value),
+    "name": (vehicles.name, text_value),
+    "year": (vehicles.year, int),
+    "rating": (vehicles.rating, decimal_value),
+}
+
+# Taille maximale d'une page de véhicules
+VEHICLES_MAX_PAGE_SIZE = 200
+
+def vehicle_response(v: vehicles, is_favorite: bool):
+    """
+    Transforme un objet vehicles en dictionnaire sérialisable pour le catalogue.
+    Les cartes srcset doivent avoir été chargées avant (load_srcsets).
+    """
+    return {
+        "id": v.id,
+        "name": v.name,
+        "category": v.category,
+        "price": float(v.price) if v.price else 0.0,
+        "image": v.image,
+        "srcset": image_srcset(v.image),
+        "transmission": v.transmission,
+        "seats": v.seats,
+        "engine": v.engine,
+        "year": v.year,
+        "fuel": v.fuel,
+        "isAvailable": v.isAvailable,
+        "isFavorite": is_favorite,
+        "isNew": v.isNew,
+        "isBestChoice": v.isBestChoice,
+        "rating": float(v.rating) if v.rating else 0.0,
+        "popularity": v.popularity,
+        "luggage": v.luggage,
+        "airConditioning": v.airConditioning,
+        "bluetooth": v.bluetooth
+    }
+
+def encode_cursor(sort_value, last_id: int) -> str:
+    """
+    Encode la position (valeur de tri, id) du dernier élément d'une page en curseur opaque.
+    """
+    if isinstance(sort_value, Decimal):
+        sort_value = str(sort_value)
+    elif isinstance(sort_value, (datetime, date)):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, last_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str):
+    """
+    Décode un curseur produit par encode_cursor. Lève une erreur 400 s'il est invalide.
+    """
+    try:
+        sort_value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return sort_value, int(last_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+
+def keyset_condition(sort_column, id_column, last_value, last_id: int, descending: bool):
+    """
+    Condition SQL « strictement après (last_value, last_id) » dans l'ordre de tri donné.
+    Écrite en OR/AND plutôt qu'en comparaison de tuples pour que MySQL utilise l'index composite.
+    """
+    if descending:
+        return or_(sort_column < last_value, and_(sort_column == last_value, id_column < last_id))
+    return or_(sort_column > last_value, and_(sort_column == last_value, id_column > last_id))
+
+async def build_catalog(db: AsyncSession):
+    """
+    Construit la liste complète des véhicules (sans l'information de favori) pour l'instantané du catalogue.
+    """
+    cars = (await db.scalars(select(vehicles).order_by(vehicles.id.asc()))).all()
+    await load_srcsets((v.image for v in cars), UPLOAD_FOLDER)
+    return [vehicle_response(v, False) for v in cars]
+
+# Durée de vie maximale de l'instantané du catalogue (en secondes).
+# Borne la durée pendant laquelle un worker peut ignorer une écriture faite par un autre worker.
+CATALOG_SNAPSHOT_TTL_SECONDS = 30
+
+# Instantané du catalogue partagé par toutes les requêtes du processus.
+# Toute écriture sur "cars" (ajout, modification, suppression, changement de disponibilité)
+# doit appeler catalog_snapshot.bump() après son commit.
+catalog_snapshot = VersionedSnapshot(build_catalog, ttl_seconds=CATALOG_SNAPSHOT_TTL_SECONDS)
+
+# Cache des favoris par utilisateur : user_id → frozenset des car_id.
+# Mis à jour à l'écriture par add_favorite, remove_favorite et delete_vehicle ;
+# le TTL borne l'écart avec les écritures faites par un autre worker.
+FAVORITES_CACHE_MAX_USERS = 10000
+FAVORITES_CACHE_TTL_SECONDS = 300
+favorites_cache = LRUCache(maxsize=FAVORITES_CACHE_MAX_USERS, ttl_seconds=FAVORITES_CACHE_TTL_SECONDS)
+
+# Version des données personnelles de chaque utilisateur (favoris, réservations, profil),
+# changée à chaque écriture : elle fait partie de la clé des réponses personnelles de
+# l'assistant en cache. Les versions sont tirées d'un compteur commun au processus et
+# jamais réutilisées : un utilisateur évincé du cache reçoit une version neuve, qui ne
+# peut pas retomber sur une ancienne réponse encore en cache.
+USER_DATA_VERSIONS_MAX_USERS = 10000
+user_data_versions = LRUCache(maxsize=USER_DATA_VERSIONS_MAX_USERS)
+user_data_version_counter = itertools.count(1)
+
+def user_data_version(user_id: int) -> int:
+    """
+    Version actuelle des données personnelles d'un utilisateur.
+    """
+    version = user_data_versions.get(user_id)
+    if version is None:
+        version = next(user_data_version_counter)
+        user_data_versions.set(user_id, version)
+    return version
+
+def bump_user_data(*user_ids: int) -> None:
+    """
+    Signale que les données personnelles de ces utilisateurs ont changé (après commit).
+    """
+    for user_id in user_ids:
+        user_data_versions.set(user_id, next(user_data_version_counter))
+
+async def get_favorite_ids(db: AsyncSession, user_id: int) -> frozenset:
+    """
+    Renvoie l'ensemble des IDs de véhicules favoris d'un utilisateur, depuis le cache si possible.
+    """
+    favorite_ids = favorites_cache.get(user_id)
+    if favorite_ids is None:
+        result = await db.scalars(select(Favorite.car_id).where(Favorite.user_id == user_id))
+        favorite_ids = frozenset(result.all())
+        favorites_cache.set(user_id, favorite_ids)
+    return favorite_ids
+
+def catalog_etag(catalog_digest: str, query_params, favorite_ids) -> str:
+    """
+    Calcule l'ETag fort d'une réponse de /vehicles : il dépend du contenu du catalogue,
+    des paramètres de la requête et des favoris de l'utilisateur.
+    """
+    h = hashlib.sha256()
+    h.update(catalog_digest.encode("ascii"))
+    h.update(json.dumps(sorted(query_params.multi_items())).encode("utf-8"))
+    h.update(json.dumps(sorted(favorite_ids)).encode("ascii"))
+    return f'"{h.hexdigest()[:32]}"'
+
+# Index des périodes réservées par voiture, reconstruit depuis "bookings" au premier
+# accès puis toutes les AVAILABILITY_INDEX_TTL_SECONDS secondes (écritures des autres workers),
+# et mis à jour à chaque création, changement de statut ou suppression de réservation.
+AVAILABILITY_INDEX_TTL_SECONDS = 60
+availability_index = AvailabilityIndex(ttl_seconds=AVAILABILITY_INDEX_TTL_SECONDS)
+
+async def get_availability_index(db: AsyncSession) -> AvailabilityIndex:
+    """
+    Renvoie l'index de disponibilité, en le reconstruisant depuis la base si nécessaire.
+    """
+    if availability_index.needs_rebuild():
+        rows = (await db.execute(
+            select(Booking.id, Booking.car_id, Booking.pickup_date, Booking.return_date)
+            .where(Booking.status.in_(ACTIVE_BOOKING_STATUSES))
+        )).all()
+        availability_index.rebuild((r.id, r.car_id, r.pickup_date, r.return_date) for r in rows)
+    return availability_index
+
+async def lock_car(db: AsyncSession, car_id: int) -> Optional[vehicles]:
+    """
+    Lit et verrouille la ligne d'une voiture (SELECT ... FOR UPDATE) jusqu'à la fin de la transaction.
+    SQLite ignore FOR UPDATE : un UPDATE sans effet y prend d'abord le verrou d'écriture de la
+    base, ce qui sérialise de la même façon les admissions concurrentes.
+    """
+    if IS_SQLITE:
+        await db.execute(
+            update(vehicles).where(vehicles.id == car_id).values(id=vehicles.id)
+            .execution_options(synchronize_session=False)
+        )
+    return await db.scalar(select(vehicles).where(vehicles.id == car_id).with_for_update().limit(1))
+
+async def find_overlapping_booking(db: AsyncSession, car_id: int, start: date, end: date, exclude_booking_id: Optional[int] = None):
+    """
+    Renvoie une réservation active de la voiture qui chevauche [start, end], ou None.
+    À appeler après avoir verrouillé la ligne de la voiture pour que la vérification soit atomique.
+    Lecture verrouillante (FOR UPDATE) : en REPEATABLE READ, MySQL lit alors la dernière version
+    validée des réservations et non l'instantané pris à la première lecture de la transaction
+    (sinon une requête qui attendait le verrou de la voiture ne verrait pas la réservation
+    validée juste avant elle).
+    """
+    stmt = select(Booking.id, Booking.pickup_date, Booking.return_date).where(
+        Booking.car_id == car_id,
+        Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+        Booking.pickup_date <= end,
+        Booking.return_date >= start
+    )
+    if exclude_booking_id is not None:
+        stmt = stmt.where(Booking.id != exclude_booking_id)
+    return (await db.execute(stmt.limit(1).with_for_update())).first()
+
+def sync_booking_availability(booking: Booking) -> None:
+    """
+    Répercute l'état d'une réservation (après commit) dans l'index de disponibilité.
+    """
+    if booking.status in ACTIVE_BOOKING_STATUSES:
+        availability_index.add(booking.id, booking.car_id, booking.pickup_date, booking.return_date)
+    else:
+        availability_index.remove(booking.id)
+
+# -------------------------------------------------------
+# RÉCONCILIATION DE LA DISPONIBILITÉ ("isAvailable")
+# -------------------------------------------------------
+# Le drapeau isAvailable d'une voiture signifie « aucune réservation active aujourd'hui ».
+# Il est recalculé par deux UPDATE ensemblistes plutôt que voiture par voiture.
+
+# Mesures de la dernière exécution du réconciliateur
+reconciler_stats = {
+    "runs": 0,
+    "last_run_at": None,
+    "last_duration_ms": None,
+    "last_rows_changed": None,
+    "last_error": None
+}
+reconciler_lock = asyncio.Lock()
+
+async def reconcile_availability(db: AsyncSession, car_id: Optional[int] = None) -> int:
+    """
+    Recalcule isAvailable pour toutes les voitures (ou une seule si car_id est fourni)
+    à partir des réservations actives du jour. Ne fait pas de commit.
+    Renvoie le nombre de voitures modifiées.
+    """
+    today = date.today()
+    busy_today = exists().where(
+        Booking.car_id == vehicles.id,
+        Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+        Booking.pickup_date <= today,
+        Booking.return_date >= today
+    )
+    scope = [vehicles.id == car_id] if car_id is not None else []
+    # Voitures marquées disponibles alors qu'elles sont louées aujourd'hui
+    took = await db.execute(
+        update(vehicles)
+        .where(vehicles.isAvailable == True, busy_today, *scope)
+        .values(isAvailable=False)
+        .execution_options(synchronize_session=False)
+    )
+    # Voitures marquées indisponibles alors qu'aucune réservation active ne les occupe aujourd'hui
+    freed = await db.execute(
+        update(vehicles)
+        .where(vehicles.isAvailable == False, ~busy_today, *scope)
+        .values(isAvailable=True)
+        .execution_options(synchronize_session=False)
+    )
+    return (took.rowcount or 0) + (freed.rowcount or 0)
+
+async def run_availability_reconciler() -> dict:
+    """
+    Exécute une réconciliation complète dans sa propre transaction et met à jour les mesures.
+    Utilisé par la tâche de fond, l'endpoint admin et la commande reconcile_availability.py.
+    """
+    async with reconciler_lock:
+        started = time.perf_counter()
+        try:
+            async with AsyncSessionLocal() as db:
+                try:
+                    rows_changed = await reconcile_availability(db)
+                    await db.commit()
+                except Exception:
+                    await db.rollback()
+                    raise
+            reconciler_stats["last_error"] = None
+        except Exception as e:
+            reconciler_stats["last_error"] = str(e)
+            raise
+        finally:
+            reconciler_stats["runs"] += 1
+            reconciler_stats["last_run_at"] = datetime.now().isoformat()
+            reconciler_stats["last_duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        reconciler_stats["last_rows_changed"] = rows_changed
+        if rows_changed:
+            catalog_snapshot.bump()
+            catalog_rollup.invalidate()
+        print(f"✅ Disponibilité réconciliée : {rows_changed} voiture(s) modifiée(s)")
+        return dict(reconciler_stats)
+
+def rollup_vehicle(v: vehicles) -> None:
+    """
+    Reporte les valeurs d'une voiture (ajoutée ou modifiée) dans les agrégats du catalogue.
+    """
+    catalog_rollup.upsert(v.id, v.category, v.price, v.isAvailable, v.name)
+
+async def read_car_availability(db: AsyncSession, car_id: int) -> Optional[bool]:
+    """
+    Relit isAvailable d'une voiture après un UPDATE ensembliste (avant le commit),
+    pour reporter la nouvelle valeur dans les agrégats du catalogue.
+    """
+    return await db.scalar(select(vehicles.isAvailable).where(vehicles.id == car_id))
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Vérifie si l'en-tête If-None-Match du client contient l'ETag courant.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
 @app.get("/vehicles")
-def get_vehicles(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_vehicles(
+    request: Request,
+    response: Response,
+    category: Optional[str] = None,
+    fuel: Optional[str] = None,
+    transmission: Optional[str] = None,
+    seats: Optional[int] = None,
+    min_seats: Optional[int] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_year: Optional[int] = None,
+    max_year: Optional[int] = None,
+    isAvailable: Optional[bool] = None,
+    isNew: Optional[bool] = None,
+    isBestChoice: Optional[bool] = None,
+    sort_by: str = "id",
+    order: str = "asc",
+    limit: Optional[int] = Query(None, ge=1, le=VEHICLES_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    if_none_match: Optional[str] = Header(None),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
     """
-    Récupère la liste de tous les véhicules avec l'information si chacun est en favori de l'utilisateur courant.
+    Récupère la liste des véhicules avec l'information si chacun est en favori de l'utilisateur courant.
+    Les filtres et le tri sont exécutés par la base de données. Si "limit" est fourni,
+    la réponse est paginée par curseur : le curseur de la page suivante est renvoyé
+    dans l'en-tête X-Next-Cursor (absent sur la dernière page).
+    Avec "from" et "to" (YYYY-MM-DD, inclus), seules les voitures sans réservation active
+    sur cette période sont renvoyées.
+    La réponse porte un ETag fort ; si le client renvoie le même dans If-None-Match,
+    l'API répond 304 Not Modified sans corps.
     """
-    # Récupère tous les véhicules
-    vehicles_list = db.query(vehicles).all()
-    # Récupère les IDs des favoris de l'utilisateur courant
-    user_favorites = db.query(Favorite.car_id).filter(Favorite.user_id == current_user.id).all()
-    favorite_ids = [fav.car_id for fav in user_favorites]
+    if sort_by not in VEHICLE_SORT_COLUMNS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tri invalide. Valeurs acceptées: {', '.join(VEHICLE_SORT_COLUMNS)}"
+        )
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Ordre invalide. Valeurs acceptées: asc, desc")
+    if (date_from is None) != (date_to is None):
+        raise HTTPException(status_code=400, detail="Les paramètres 'from' et 'to' doivent être fournis ensemble")
+    if date_from is not None and date_to < date_from:
+        raise HTTPException(status_code=400, detail="La date 'to' doit être postérieure ou égale à 'from'")
+
+    # Récupère les IDs des favoris de l'utilisateur courant (ensemble : test d'appartenance en O(1))
+    favorite_ids = await get_favorite_ids(db, current_user.id)
+
+    # Catalogue complet, ou sa première page, dans l'ordre par défaut : servi depuis l'instantané
+    # en mémoire. Les autres requêtes (filtres, tri, curseur) passent par les index de la base
+    # et leur ETag repose sur la version du catalogue, sans reconstruire l'instantané.
+    filters = (category, fuel, transmission, seats, min_seats, min_price, max_price,
+               min_year, max_year, isAvailable, isNew, isBestChoice, cursor, date_from)
+    from_snapshot = all(value is None for value in filters) and sort_by == "id" and order == "asc"
+
+    # Validation conditionnelle : le client possède déjà la version courante
+    if from_snapshot:
+        snapshot = await catalog_snapshot.get(db)
+        catalog_digest = snapshot.digest
+    else:
+        catalog_digest = catalog_snapshot.token()
+    if date_from is not None:
+        # Le résultat dépend aussi des réservations : l'ETag inclut l'empreinte de l'index
+        catalog_digest += (await get_availability_index(db)).fingerprint()
+    etag = catalog_etag(catalog_digest, request.query_params, favorite_ids)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    # "private" : la réponse dépend de l'utilisateur (favoris), "no-cache" : revalidation systématique
+    response.headers["Cache-Control"] = "private, no-cache"
+
+    if from_snapshot:
+        items = snapshot.items
+        if limit is not None and len(items) > limit:
+            items = items[:limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(items[-1]["id"], items[-1]["id"])
+        return [{**item, "isFavorite": item["id"] in favorite_ids} for item in items]
+
+    query = select(vehicles)
+    # Filtres d'égalité et de plage, tous couverts par les index composites de "cars"
+    if category is not None:
+        query = query.where(vehicles.category == category)
+    if fuel is not None:
+        query = query.where(vehicles.fuel == fuel)
+    if transmission is not None:
+        query = query.where(vehicles.transmission == transmission)
+    if seats is not None:
+        query = query.where(vehicles.seats == seats)
+    if min_seats is not None:
+        query = query.where(vehicles.seats >= min_seats)
+    if min_price is not None:
+        query = query.where(vehicles.price >= min_price)
+    if max_price is not None:
+        query = query.where(vehicles.price <= max_price)
+    if min_year is not None:
+        query = query.where(vehicles.year >= min_year)
+    if max_year is not None:
+        query = query.where(vehicles.year <= max_year)
+    if isAvailable is not None:
+        query = query.where(vehicles.isAvailable == isAvailable)
+    if isNew is not None:
+        query = query.where(vehicles.isNew == isNew)
+    if isBestChoice is not None:
+        query = query.where(vehicles.isBestChoice == isBestChoice)
+    if date_from is not None:
+        # Voitures libres sur la période : exclut celles que l'index déclare occupées
+        busy_ids = (await get_availability_index(db)).busy_car_ids(date_from, date_to)
+        if busy_ids:
+            query = query.where(vehicles.id.notin_(busy_ids))
+
+    # Pagination par curseur (keyset) : on reprend strictement après (valeur, id)
+    sort_column, parse_value = VEHICLE_SORT_COLUMNS[sort_by]
+    descending = order == "desc"
+    if cursor:
+        last_value, last_id = decode_cursor(cursor)
+        try:
+            last_value = parse_value(last_value)
+        except (TypeError, ValueError):
+            # Curseur forgé ou obtenu avec un autre tri
+            raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+        query = query.where(keyset_condition(sort_column, vehicles.id, last_value, last_id, descending))
+    if descending:
+        query = query.order_by(sort_column.desc(), vehicles.id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), vehicles.id.asc())
+
+    if limit is not None:
+        # On lit un élément de plus pour savoir s'il existe une page suivante
+        vehicles_list = (await db.scalars(query.limit(limit + 1))).all()
+        if len(vehicles_list) > limit:
+            vehicles_list = vehicles_list[:limit]
+            last = vehicles_list[-1]
+            last_value = getattr(last, sort_by)
+            response.headers["X-Next-Cursor"] = encode_cursor(last_value, last.id)
+    else:
+        vehicles_list = (await db.scalars(query)).all()
+
     # Construit la liste de réponse avec les champs nécessaires
-    return [
-        {
-            "id": v.id,
-            "name": v.name,
-            "category": v.category,
-            "price": float(v.price) if v.price else 0.0,
-            "image": v.image,
-            "transmission": v.transmission,
-            "seats": v.seats,
-            "engine": v.engine,
-            "year": v.year,
-            "fuel": v.fuel,
-            "isAvailable": v.isAvailable,
-            "isFavorite": v.id in favorite_ids,
-            "isNew": v.isNew,
-            "isBestChoice": v.isBestChoice,
-            "rating": float(v.rating) if v.rating else 0.0,
-            "popularity": v.popularity,
-            "luggage": v.luggage,
-            "airConditioning": v.airConditioning,
-            "bluetooth": v.bluetooth
-        }
-        for v in vehicles_list
-    ]
+    await load_srcsets((v.image for v in vehicles_list), UPLOAD_FOLDER)
+    return [vehicle_response(v, v.id in favorite_ids) for v in vehicles_list]
+
+# -------------------------------------------------------
+# ENDPOINT : STATISTIQUES DU CATALOGUE (public)
+# -------------------------------------------------------
+@app.get("/vehicles/stats")
+async def get_vehicles_stats(db: AsyncSession = Depends(get_db)):
+    """
+    Renvoie, par catégorie, le nombre de véhicules, le nombre de disponibles,
+    les prix minimum / moyen / maximum et un modèle d'exemple.
+    """
+    try:
+        return (await get_catalog_rollup(db)).stats()
+    except Exception as e:
+        print(f"Erreur lors du calcul des statistiques du catalogue: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 # ========================================
 # ENDPOINTS POUR LES FAVORIS
 # ========================================
 @app.get("/favorites")
-def get_favorites(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_favorites(current_user: TokenClaims = Depends(get_current_claims), db: AsyncSession = Depends(get_db)):
     """
     Récupère la liste des véhicules favoris de l'utilisateur courant.
     """
-    # Récupère toutes les entrées de favoris de l'utilisateur
-    favorites = db.query(Favorite).filter(Favorite.user_id == current_user.id).all()
-    favorite_cars = []
-    for fav in favorites:
-        # Pour chaque favori, récupère les détails du véhicule
-        car = db.query(vehicles).filter(vehicles.id == fav.car_id).first()
-        if car:
-            favorite_cars.append({
-                "id": car.id,
-                "name": car.name,
-                "category": car.category,
-                "price": float(car.price) if car.price else 0.0,
-                "image": car.image,
-                "transmission": car.transmission,
-                "seats": car.seats,
-                "engine": car.engine,
-                "year": car.year,
-                "fuel": car.fuel,
-                "isAvailable": car.isAvailable,
-                "isFavorite": True,
-                "isNew": car.isNew,
-                "isBestChoice": car.isBestChoice,
-                "rating": float(car.rating) if car.rating else 0.0,
-                "popularity": car.popularity,
-                "luggage": car.luggage,
-                "airConditioning": car.airConditioning,
-                "bluetooth": car.bluetooth
-            })
-    return favorite_cars
+    # Une seule requête : jointure favoris → véhicules, dans l'ordre d'ajout des favoris
+    favorite_cars = await db.scalars(
+        select(vehicles)
+        .join(Favorite, Favorite.car_id == vehicles.id)
+        .where(Favorite.user_id == current_user.id)
+        .order_by(Favorite.id.asc())
+    )
+    cars = favorite_cars.all()
+    await load_srcsets((car.image for car in cars), UPLOAD_FOLDER)
+    return [vehicle_response(car, True) for car in cars]
 
 @app.post("/favorites/add")
-def add_favorite(favorite: FavoriteRequest, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def add_favorite(favorite: FavoriteRequest, current_user: Principal = Depends(get_current_principal), db: AsyncSession = Depends(get_db)):
     """
     Ajoute un véhicule aux favoris de l'utilisateur.
     """
     # Vérifie que le véhicule existe
-    car = db.query(vehicles).filter(vehicles.id == favorite.car_id).first()
+    car = await db.scalar(select(vehicles).where(vehicles.id == favorite.car_id).limit(1))
     if not car:
         raise HTTPException(status_code=404, detail="Véhicule non trouvé")
     # Vérifie que ce favori n'existe pas déjà
-    existing_favorite = db.query(Favorite).filter(
+    existing_favorite = await db.scalar(select(Favorite).where(
         Favorite.user_id == current_user.id,
         Favorite.car_id == favorite.car_id
-    ).first()
+    ).limit(1))
     if existing_favorite:
         raise HTTPException(status_code=400, detail="Déjà dans les favoris")
     # Crée un nouveau favori
@@ -471,34 +1169,38 @@ def add_favorite(favorite: FavoriteRequest, current_user: User = Depends(get_cur
         car_id=favorite.car_id
     )
     db.add(new_favorite)
-    db.commit()
+    await db.commit()
+    favorites_cache.update(current_user.id, lambda ids: ids | {favorite.car_id})
+    bump_user_data(current_user.id)
     return {"message": "Ajouté aux favoris avec succès"}
 
 @app.delete("/favorites/remove/{car_id}")
-def remove_favorite(car_id: int, current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def remove_favorite(car_id: int, current_user: Principal = Depends(get_current_principal), db: AsyncSession = Depends(get_db)):
     """
     Supprime un véhicule des favoris de l'utilisateur.
     """
     # Recherche le favori correspondant
-    favorite = db.query(Favorite).filter(
+    favorite = await db.scalar(select(Favorite).where(
         Favorite.user_id == current_user.id,
         Favorite.car_id == car_id
-    ).first()
+    ).limit(1))
     if not favorite:
         raise HTTPException(status_code=404, detail="Favori non trouvé")
     # Supprime le favori
-    db.delete(favorite)
-    db.commit()
+    await db.delete(favorite)
+    await db.commit()
+    favorites_cache.update(current_user.id, lambda ids: ids - {car_id})
+    bump_user_data(current_user.id)
     return {"message": "Retiré des favoris avec succès"}
 
 # ========================================
 # ENDPOINTS POUR LES RÉSERVATIONS
 # ========================================
 @app.post("/bookings", response_model=dict)
-def create_booking(
+async def create_booking(
     booking_data: BookingCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Crée une nouvelle réservation pour l'utilisateur courant.
@@ -510,19 +1212,30 @@ def create_booking(
             return_date = datetime.strptime(booking_data.return_date, "%Y-%m-%d").date()
         except ValueError:
             raise HTTPException(status_code=400, detail="Format de date invalide. Utilisez YYYY-MM-DD")
-        # Vérifie que la voiture existe
-        car = db.query(vehicles).filter(vehicles.id == booking_data.car_id).first()
-        if not car:
-            raise HTTPException(status_code=404, detail="Voiture non trouvée")
-        # Vérifie la disponibilité
-        if not car.isAvailable:
-            raise HTTPException(status_code=400, detail="Cette voiture n'est pas disponible")
         # Vérifie que la date de retour est postérieure à la date de prise en charge
         if return_date <= pickup_date:
             raise HTTPException(
                 status_code=400,
                 detail=f"La date de retour ({return_date}) doit être après la date de prise en charge ({pickup_date})"
             )
+        starts_now = pickup_date <= date.today()
+        # Vérifie que la voiture existe et verrouille sa ligne (SELECT ... FOR UPDATE) :
+        # les admissions concurrentes sur la même voiture sont sérialisées jusqu'au commit
+        car = await lock_car(db, booking_data.car_id)
+        if not car:
+            raise HTTPException(status_code=404, detail="Voiture non trouvée")
+        # Le drapeau isAvailable décrit l'état du jour : il ne concerne que les locations qui commencent maintenant
+        if starts_now and not car.isAvailable:
+            await db.rollback()
+            raise HTTPException(status_code=400, detail="Cette voiture n'est pas disponible")
+        # Vérifie, sous le verrou, qu'aucune réservation active ne chevauche la période
+        conflict = await find_overlapping_booking(db, car.id, pickup_date, return_date)
+        if conflict:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Cette voiture est déjà réservée du {conflict.pickup_date} au {conflict.return_date}"
+            )
         # Crée la réservation avec le statut "En attente"
         new_booking = Booking(
             user_id=current_user.id,
@@ -534,13 +1247,17 @@ def create_booking(
             status="En attente"
         )
         db.add(new_booking)
-        db.commit()
-        db.refresh(new_booking)
         # Si la réservation commence aujourd'hui ou avant, marque la voiture comme non disponible
-        from datetime import date as date_class
-        if pickup_date <= date_class.today():
+        # (dans la même transaction que l'insertion : un seul commit, le verrou est relâché aussitôt)
+        if starts_now:
             car.isAvailable = False
-            db.commit()
+        await db.commit()
+        await db.refresh(new_booking)
+        sync_booking_availability(new_booking)
+        bump_user_data(current_user.id)
+        if starts_now:
+            catalog_snapshot.bump()
+            catalog_rollup.set_available(car.id, False)
         return {
             "success": True,
             "message": "Réservation créée avec succès",
@@ -550,30 +1267,45 @@ def create_booking(
     except HTTPException as he:
         raise he
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Erreur lors de la création de la réservation: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 @app.get("/my-bookings")
-def get_user_bookings(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_user_bookings(
+    current_user: TokenClaims = Depends(get_current_claims),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Récupère toutes les réservations de l'utilisateur courant, triées par date de création descendante.
     """
     try:
-        bookings = db.query(Booking).filter(
-            Booking.user_id == current_user.id
-        ).order_by(Booking.created_at.desc()).all()
+        # Une seule requête : jointure externe vers "cars", limitée aux colonnes affichées
+        bookings = (await db.execute(
+            select(
+                Booking.id,
+                Booking.car_id,
+                Booking.full_name,
+                Booking.pickup_date,
+                Booking.return_date,
+                Booking.total_price,
+                Booking.status,
+                Booking.created_at,
+                vehicles.name.label("car_name"),
+                vehicles.image.label("car_image")
+            ).outerjoin(
+                vehicles, vehicles.id == Booking.car_id
+            ).where(
+                Booking.user_id == current_user.id
+            ).order_by(Booking.created_at.desc())
+        )).all()
         result = []
         for booking in bookings:
-            car = db.query(vehicles).filter(vehicles.id == booking.car_id).first()
             result.append({
                 "id": booking.id,
                 "car_id": booking.car_id,
-                "car_name": car.name if car else "Voiture inconnue",
-                "car_image": car.image if car else "",
+                "car_name": booking.car_name if booking.car_name is not None else "Voiture inconnue",
+                "car_image": booking.car_image if booking.car_image is not None else "",
                 "full_name": booking.full_name,
                 "pickup_date": booking.pickup_date.strftime("%Y-%m-%d") if booking.pickup_date else None,
                 "return_date": booking.return_date.strftime("%Y-%m-%d") if booking.return_date else None,
@@ -589,7 +1321,7 @@ def get_user_bookings(
 # ========================================
 # FONCTIONS ADMINISTRATEUR
 # ========================================
-def get_current_admin(current_user: User = Depends(get_current_user)):
+def get_current_admin(current_user: Principal = Depends(get_current_principal)):
     """
     Dépendance pour vérifier que l'utilisateur courant est un administrateur.
     """
@@ -600,84 +1332,427 @@ def get_current_admin(current_user: User = Depends(get_current_user)):
         )
     return current_user
 
+# -------------------------------------------------------
+# ENDPOINT : STATISTIQUES DES CACHES (admin seulement)
+# -------------------------------------------------------
+@app.get("/admin/cache-stats")
+async def get_cache_stats(current_admin: Principal = Depends(get_current_admin)):
+    """
+    Renvoie les compteurs des caches en mémoire du worker (pour leur dimensionnement).
+    """
+    return {
+        "catalog": {"version": catalog_snapshot.version},
+        "favorites": favorites_cache.stats(),
+        "principals": principal_cache.stats(),
+        "bcrypt_pool": bcrypt_pool.stats(),
+        "availability": availability_index.stats(),
+        "assistant_static": assistant_static_replies.stats(),
+        "assistant_catalog": assistant_catalog_replies.stats(),
+        "assistant_message": assistant_message_replies.stats(),
+        "assistant_user": assistant_user_replies.stats(),
+        "user_data_versions": user_data_versions.stats(),
+        "image_srcset": srcset_cache.stats(),
+        "image_pool": image_pool.stats()
+    }
+
+# -------------------------------------------------------
+# ENDPOINT : ÉTAT DU POOL DE CONNEXIONS (admin seulement)
+# -------------------------------------------------------
+@app.get("/admin/db-stats")
+async def get_db_stats(current_admin: Principal = Depends(get_current_admin)):
+    """
+    Renvoie l'état du pool de connexions du worker et le temps d'attente des connexions.
+    """
+    return pool_stats()
+
+@app.get("/admin/chat-writer")
+async def get_chat_writer_stats(current_admin: Principal = Depends(get_current_admin)):
+    """
+    Renvoie les mesures de l'écriture différée des messages (lots écrits, file en attente).
+    """
+    if message_writer is None:
+        return {"enabled": False}
+    return {"enabled": True, **message_writer.stats()}
+
+# -------------------------------------------------------
+# ENDPOINTS : RÉCONCILIATION DE LA DISPONIBILITÉ (admin seulement)
+# -------------------------------------------------------
+@app.get("/admin/availability/reconciler")
+async def get_reconciler_stats(current_admin: Principal = Depends(get_current_admin)):
+    """
+    Renvoie les mesures de la dernière réconciliation (durée, voitures modifiées, erreur éventuelle).
+    """
+    return reconciler_stats
+
+@app.post("/admin/availability/reconcile")
+async def trigger_reconciler(current_admin: Principal = Depends(get_current_admin)):
+    """
+    Lance immédiatement une réconciliation de la disponibilité de toutes les voitures.
+    """
+    try:
+        return await run_availability_reconciler()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
+
+# -------------------------------------------------------
+# ENDPOINTS : ARCHIVAGE DES MESSAGES (admin seulement)
+# -------------------------------------------------------
+# Rapport de la dernière passe d'archivage de ce worker
+archiver_stats = {"runs": 0, "last_report": None, "last_error": None}
+archiver_lock = asyncio.Lock()
+
+async def run_message_archiver() -> dict:
+    """
+    Exécute une passe d'archivage avec la politique configurée et met à jour le rapport.
+    Utilisé par la tâche de fond, l'endpoint admin et la commande archive_messages.py.
+    """
+    async with archiver_lock:
+        try:
+            report = await run_archiver(AsyncSessionLocal, ArchivePolicy.from_env())
+        except Exception as e:
+            archiver_stats["last_error"] = str(e)
+            raise
+        finally:
+            archiver_stats["runs"] += 1
+        archiver_stats["last_report"] = report
+        archiver_stats["last_error"] = None
+        print(f"✅ Archivage : {report['messages']} message(s) de {report['conversations']} conversation(s), "
+              f"{report['reclaimed_bytes']} octets récupérés")
+        return report
+
+@app.get("/admin/archive")
+async def get_archive_report(
+    current_admin: Principal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Renvoie la politique de rétention, le rapport de la dernière passe et le volume total archivé.
+    """
+    try:
+        return {
+            "policy": ArchivePolicy.from_env()._asdict(),
+            "last_run": archiver_stats,
+            "totals": await archive_totals(db)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
+
+@app.post("/admin/archive/run")
+async def trigger_archiver(current_admin: Principal = Depends(get_current_admin)):
+    """
+    Lance immédiatement une passe d'archivage des messages.
+    """
+    try:
+        return await run_message_archiver()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
+
 # -------------------------------------------------------
 # ENDPOINT : LISTE DE tous les réservations (admin seulement)
 # -------------------------------------------------------
+# Colonnes autorisées pour le tri de la liste admin des réservations,
+# avec la fonction qui reconvertit la valeur stockée dans le curseur.
+BOOKING_SORT_COLUMNS = {
+    "created_at": (Booking.created_at, datetime.fromisoformat),
+    "pickup_date": (Booking.pickup_date, date.fromisoformat),
+    "return_date": (Booking.return_date, date.fromisoformat),
+    "total_price": (Booking.total_price, float),
+    "id": (Booking.id, int),
+}
+
+# Taille par défaut et taille maximale d'une page de réservations
+BOOKINGS_DEFAULT_PAGE_SIZE = 50
+BOOKINGS_MAX_PAGE_SIZE = 500
+
+def admin_bookings_query(
+    status_filter: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    car_id: Optional[int] = None,
+    user_email: Optional[str] = None,
+    q: Optional[str] = None
+):
+    """
+    Construit la requête unique (réservations + voiture + utilisateur) de la vue admin, avec ses filtres.
+    Seules les colonnes affichées sont sélectionnées.
+    """
+    query = select(
+        Booking.id,
+        Booking.car_id,
+        Booking.user_id,
+        Booking.full_name,
+        Booking.pickup_date,
+        Booking.return_date,
+        Booking.total_price,
+        Booking.status,
+        Booking.created_at,
+        vehicles.name.label("car_name"),
+        vehicles.image.label("car_image"),
+        User.username.label("user_name"),
+        User.email.label("user_email")
+    ).outerjoin(
+        vehicles, vehicles.id == Booking.car_id
+    ).outerjoin(
+        User, User.id == Booking.user_id
+    )
+    if status_filter is not None:
+        query = query.where(Booking.status == status_filter)
+    # Période : réservations qui chevauchent [date_from, date_to]
+    if date_from is not None:
+        query = query.where(Booking.return_date >= date_from)
+    if date_to is not None:
+        query = query.where(Booking.pickup_date <= date_to)
+    if car_id is not None:
+        query = query.where(Booking.car_id == car_id)
+    if user_email is not None:
+        query = query.where(User.email == user_email)
+    if q:
+        # Recherche libre sur le nom du locataire et le nom d'utilisateur
+        escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = f"%{escaped}%"
+        query = query.where(or_(
+            Booking.full_name.ilike(pattern, escape="\\"),
+            User.username.ilike(pattern, escape="\\")
+        ))
+    return query
+
+def admin_booking_response(row):
+    """
+    Transforme une ligne de admin_bookings_query en dictionnaire sérialisable.
+    """
+    return {
+        "id": row.id,
+        "car_id": row.car_id,
+        "car_name": row.car_name if row.car_name is not None else "Voiture inconnue",
+        "car_image": row.car_image if row.car_image is not None else "",
+        "user_id": row.user_id,
+        "user_name": row.user_name if row.user_name is not None else "Utilisateur inconnu",
+        "user_email": row.user_email if row.user_email is not None else "",
+        "full_name": row.full_name,
+        "pickup_date": row.pickup_date.strftime("%Y-%m-%d") if row.pickup_date else None,
+        "return_date": row.return_date.strftime("%Y-%m-%d") if row.return_date else None,
+        "total_price": float(row.total_price),
+        "status": row.status,
+        "created_at": row.created_at.strftime("%Y-%m-%d %H:%M:%S") if row.created_at else None
+    }
+
 @app.get("/admin/bookings")
-def get_all_bookings(
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+async def get_all_bookings(
+    response: Response,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    car_id: Optional[int] = None,
+    user_email: Optional[str] = None,
+    q: Optional[str] = None,
+    sort_by: str = "created_at",
+    order: str = "desc",
+    limit: int = Query(BOOKINGS_DEFAULT_PAGE_SIZE, ge=1, le=BOOKINGS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_admin: Principal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """
-    Récupère toutes les réservations (admin seulement).
+    Récupère les réservations (admin seulement), avec filtres, tri et pagination par curseur.
+    La réponse est toujours paginée (BOOKINGS_DEFAULT_PAGE_SIZE réservations par défaut) :
+    s'il reste des réservations, le curseur de la page suivante est renvoyé dans l'en-tête
+    X-Next-Cursor. L'export complet passe par /admin/bookings/export.
     """
+    if status_filter is not None and status_filter not in BOOKING_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Statut invalide. Valeurs acceptées: {', '.join(BOOKING_STATUSES)}"
+        )
+    if sort_by not in BOOKING_SORT_COLUMNS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tri invalide. Valeurs acceptées: {', '.join(BOOKING_SORT_COLUMNS)}"
+        )
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Ordre invalide. Valeurs acceptées: asc, desc")
     try:
-        bookings = db.query(Booking).order_by(Booking.created_at.desc()).all()
-        result = []
-        for booking in bookings:
-            car = db.query(vehicles).filter(vehicles.id == booking.car_id).first()
-            user = db.query(User).filter(User.id == booking.user_id).first()
-            result.append({
-                "id": booking.id,
-                "car_id": booking.car_id,
-                "car_name": car.name if car else "Voiture inconnue",
-                "car_image": car.image if car else "",
-                "user_id": booking.user_id,
-                "user_name": user.username if user else "Utilisateur inconnu",
-                "user_email": user.email if user else "",
-                "full_name": booking.full_name,
-                "pickup_date": booking.pickup_date.strftime("%Y-%m-%d") if booking.pickup_date else None,
-                "return_date": booking.return_date.strftime("%Y-%m-%d") if booking.return_date else None,
-                "total_price": float(booking.total_price),
-                "status": booking.status,
-                "created_at": booking.created_at.strftime("%Y-%m-%d %H:%M:%S") if booking.created_at else None
-            })
-        return result
+        query = admin_bookings_query(status_filter, date_from, date_to, car_id, user_email, q)
+        sort_column, parse_value = BOOKING_SORT_COLUMNS[sort_by]
+        descending = order == "desc"
+        if cursor:
+            last_value, last_id = decode_cursor(cursor)
+            try:
+                last_value = parse_value(last_value)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+            query = query.where(keyset_condition(sort_column, Booking.id, last_value, last_id, descending))
+        if descending:
+            query = query.order_by(sort_column.desc(), Booking.id.desc())
+        else:
+            query = query.order_by(sort_column.asc(), Booking.id.asc())
+        # On lit un élément de plus pour savoir s'il existe une page suivante
+        rows = (await db.execute(query.limit(limit + 1))).all()
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            response.headers["X-Next-Cursor"] = encode_cursor(getattr(last, sort_by), last.id)
+        return [admin_booking_response(row) for row in rows]
+    except HTTPException as he:
+        raise he
     except Exception as e:
         print(f"Erreur lors de la récupération des réservations: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
+# -------------------------------------------------------
+# ENDPOINT : EXPORT DES RÉSERVATIONS EN FLUX (admin seulement)
+# -------------------------------------------------------
+# Nombre de lignes lues par aller-retour avec le curseur serveur, et envoyées par morceau
+EXPORT_BATCH_SIZE = 1000
+
+# Colonnes de l'export, dans l'ordre du fichier CSV
+EXPORT_COLUMNS = [
+    "id", "car_id", "car_name", "car_image", "user_id", "user_name", "user_email",
+    "full_name", "pickup_date", "return_date", "total_price", "status", "created_at"
+]
+
+async def iter_bookings_export(export_format: str, gzip_enabled: bool, filters: dict):
+    """
+    Générateur asynchrone des morceaux de l'export. Il ouvre sa propre session : la session
+    de la requête peut être fermée avant la fin de l'envoi de la réponse en flux.
+    Les lignes sont lues par lots via un curseur côté serveur (db.stream + yield_per), la
+    mémoire utilisée reste donc constante quel que soit le nombre de réservations.
+    """
+    compressor = zlib.compressobj(wbits=31) if gzip_enabled else None  # wbits=31 : format gzip
+
+    def encode(text: str) -> bytes:
+        data = text.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+
+    async with AsyncSessionLocal() as db:
+        query = admin_bookings_query(**filters).order_by(Booking.id.asc())
+        result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if export_format == "csv":
+            writer.writerow(EXPORT_COLUMNS)
+        rows_in_buffer = 0
+        async for row in result:
+            item = admin_booking_response(row)
+            if export_format == "csv":
+                writer.writerow([item[column] for column in EXPORT_COLUMNS])
+            else:
+                buffer.write(json.dumps(item, ensure_ascii=False))
+                buffer.write("\n")
+            rows_in_buffer += 1
+            if rows_in_buffer >= EXPORT_BATCH_SIZE:
+                chunk = encode(buffer.getvalue())
+                buffer.seek(0)
+                buffer.truncate(0)
+                rows_in_buffer = 0
+                if chunk:
+                    yield chunk
+        tail = encode(buffer.getvalue())
+        if compressor:
+            tail += compressor.flush()
+        if tail:
+            yield tail
+
+@app.get("/admin/bookings/export")
+async def export_bookings(
+    request: Request,
+    export_format: str = Query("csv", alias="format"),
+    status_filter: Optional[str] = Query(None, alias="status"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    car_id: Optional[int] = None,
+    user_email: Optional[str] = None,
+    q: Optional[str] = None,
+    current_admin: Principal = Depends(get_current_admin)
+):
+    """
+    Exporte toutes les réservations (avec voiture et utilisateur) en CSV ou NDJSON, en flux (admin seulement).
+    Accepte les mêmes filtres que GET /admin/bookings. La réponse est compressée en gzip
+    si le client l'accepte (en-tête Accept-Encoding).
+    """
+    if export_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Format invalide. Valeurs acceptées: csv, ndjson")
+    if status_filter is not None and status_filter not in BOOKING_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Statut invalide. Valeurs acceptées: {', '.join(BOOKING_STATUSES)}"
+        )
+    filters = {
+        "status_filter": status_filter,
+        "date_from": date_from,
+        "date_to": date_to,
+        "car_id": car_id,
+        "user_email": user_email,
+        "q": q
+    }
+    gzip_enabled = "gzip" in request.headers.get("accept-encoding", "").lower()
+    media_type = "text/csv; charset=utf-8" if export_format == "csv" else "application/x-ndjson"
+    filename = f"reservations_{date.today().isoformat()}.{export_format}"
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Vary": "Accept-Encoding"
+    }
+    if gzip_enabled:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        iter_bookings_export(export_format, gzip_enabled, filters),
+        media_type=media_type,
+        headers=headers
+    )
+
 @app.patch("/admin/bookings/{booking_id}/status")
-def update_booking_status(
+async def update_booking_status(
     booking_id: int,
     status: str,
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_admin: Principal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Met à jour le statut d'une réservation (admin seulement).
     """
     try:
-        from datetime import date as date_class
-        valid_statuses = ["En attente", "Confirmée", "Annulée", "Terminée"]
-        if status not in valid_statuses:
+        if status not in BOOKING_STATUSES:
             raise HTTPException(
                 status_code=400,
-                detail=f"Statut invalide. Valeurs acceptées: {', '.join(valid_statuses)}"
+                detail=f"Statut invalide. Valeurs acceptées: {', '.join(BOOKING_STATUSES)}"
             )
-        booking = db.query(Booking).filter(Booking.id == booking_id).first()
+        car_id = await db.scalar(select(Booking.car_id).where(Booking.id == booking_id).limit(1))
+        if car_id is None:
+            raise HTTPException(status_code=404, detail="Réservation non trouvée")
+        # Verrouille la voiture : la vérification de chevauchement et le changement de statut sont atomiques.
+        # Même ordre de verrouillage que create_booking (voiture, puis réservations) : pas d'interblocage.
+        car = await lock_car(db, car_id)
+        # Relecture verrouillante de la réservation : son statut est celui validé en dernier,
+        # pas celui de l'instantané de la première lecture
+        booking = await db.scalar(
+            select(Booking).where(Booking.id == booking_id).with_for_update()
+            .execution_options(populate_existing=True)
+        )
         if not booking:
+            await db.rollback()
             raise HTTPException(status_code=404, detail="Réservation non trouvée")
         old_status = booking.status
+        if status in ACTIVE_BOOKING_STATUSES and old_status not in ACTIVE_BOOKING_STATUSES:
+            # Réactivation d'une réservation : elle ne doit pas chevaucher une autre réservation active
+            conflict = await find_overlapping_booking(db, booking.car_id, booking.pickup_date, booking.return_date, booking_id)
+            if conflict:
+                await db.rollback()
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"La voiture est déjà réservée du {conflict.pickup_date} au {conflict.return_date}"
+                )
         booking.status = status
-        car = db.query(vehicles).filter(vehicles.id == booking.car_id).first()
-        # Gestion de la disponibilité de la voiture en fonction du statut
-        if car:
-            if status in ["Annulée", "Terminée"]:
-                # Vérifie s'il y a d'autres réservations actives sur cette voiture
-                other_active_bookings = db.query(Booking).filter(
-                    Booking.car_id == booking.car_id,
-                    Booking.id != booking_id,
-                    Booking.status.in_(["Confirmée", "En attente"]),
-                    Booking.pickup_date <= date_class.today(),
-                    Booking.return_date >= date_class.today()
-                ).first()
-                if not other_active_bookings:
-                    car.isAvailable = True
-            elif status == "Confirmée":
-                if booking.pickup_date <= date_class.today():
-                    car.isAvailable = False
-        db.commit()
+        await db.flush()
+        # Recalcule la disponibilité de la voiture dans la même transaction (UPDATE ensembliste)
+        is_available = None
+        if car and await reconcile_availability(db, car_id=booking.car_id):
+            is_available = await read_car_availability(db, booking.car_id)
+        await db.commit()
+        sync_booking_availability(booking)
+        bump_user_data(booking.user_id)
+        if is_available is not None:
+            # Le catalogue ne change que si la disponibilité de la voiture a changé
+            catalog_snapshot.bump()
+            catalog_rollup.set_available(booking.car_id, is_available)
         return {
             "success": True,
             "message": f"Statut mis à jour de '{old_status}' à '{status}'",
@@ -687,28 +1762,38 @@ def update_booking_status(
     except HTTPException as he:
         raise he
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Erreur lors de la mise à jour du statut: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 @app.delete("/admin/bookings/{booking_id}")
-def delete_booking(
+async def delete_booking(
     booking_id: int,
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_admin: Principal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Supprime une réservation (admin seulement) et rend la voiture disponible si nécessaire.
     """
     try:
-        booking = db.query(Booking).filter(Booking.id == booking_id).first()
+        booking = await db.scalar(select(Booking).where(Booking.id == booking_id).limit(1))
         if not booking:
             raise HTTPException(status_code=404, detail="Réservation non trouvé")
-        car = db.query(vehicles).filter(vehicles.id == booking.car_id).first()
-        if car:
-            car.isAvailable = True
-        db.delete(booking)
-        db.commit()
+        car_id = booking.car_id
+        user_id = booking.user_id
+        await db.delete(booking)
+        await db.flush()
+        # La voiture redevient disponible si aucune autre réservation active ne l'occupe aujourd'hui
+        is_available = None
+        if await reconcile_availability(db, car_id=car_id):
+            is_available = await read_car_availability(db, car_id)
+        await db.commit()
+        availability_index.remove(booking_id)
+        bump_user_data(user_id)
+        if is_available is not None:
+            # Le catalogue ne change que si la disponibilité de la voiture a changé
+            catalog_snapshot.bump()
+            catalog_rollup.set_available(car_id, is_available)
         return {
             "success": True,
             "message": "Réservation supprimée avec succès"
@@ -716,7 +1801,7 @@ def delete_booking(
     except HTTPException as he:
         raise he
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Erreur lors de la suppression: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
@@ -727,7 +1812,7 @@ def delete_booking(
 async def update_profile(
     profile_data: UpdateProfileRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Met à jour le profil de l'utilisateur (nom, email, mot de passe).
@@ -735,9 +1820,10 @@ async def update_profile(
     try:
         print(f"📥 Données reçues: {profile_data}")
         print(f"👤 Utilisateur actuel: {current_user.username} ({current_user.email})")
+        previous_email = current_user.email
         # Si un mot de passe actuel est fourni, on vérifie qu'il correspond
         if profile_data.current_password:
-            if not verify_password(profile_data.current_password, current_user.hashed_password):
+            if not await run_bcrypt_async(verify_password, profile_data.current_password, current_user.hashed_password):
                 return JSONResponse(
                     status_code=400,
                     content={"success": False, "message": "Mot de passe actuel incorrect"}
@@ -746,10 +1832,10 @@ async def update_profile(
         updates_made = False
         # Mise à jour du nom d'utilisateur
         if profile_data.username and profile_data.username != current_user.username:
-            existing_user = db.query(User).filter(
+            existing_user = await db.scalar(select(User).where(
                 User.username == profile_data.username,
                 User.id != current_user.id
-            ).first()
+            ).limit(1))
             if existing_user:
                 return JSONResponse(
                     status_code=400,
@@ -760,10 +1846,10 @@ async def update_profile(
             print(f"✅ Username mis à jour: {profile_data.username}")
         # Mise à jour de l'email
         if profile_data.email and profile_data.email != current_user.email:
-            existing_user = db.query(User).filter(
+            existing_user = await db.scalar(select(User).where(
                 User.email == profile_data.email,
                 User.id != current_user.id
-            ).first()
+            ).limit(1))
             if existing_user:
                 return JSONResponse(
                     status_code=400,
@@ -779,7 +1865,7 @@ async def update_profile(
                     status_code=400,
                     content={"success": False, "message": "Le mot de passe actuel est requis pour changer le mot de passe"}
                 )
-            current_user.hashed_password = hash_password(profile_data.new_password)
+            current_user.hashed_password = await run_bcrypt_async(hash_password, profile_data.new_password)
             updates_made = True
             print("✅ Mot de passe mis à jour")
         if not updates_made:
@@ -787,8 +1873,11 @@ async def update_profile(
                 status_code=400,
                 content={"success": False, "message": "Aucune modification détectée"}
             )
-        db.commit()
-        db.refresh(current_user)
+        await db.commit()
+        await db.refresh(current_user)
+        # L'instantané en cache (ancien et nouvel email) ne reflète plus le compte
+        invalidate_principal(previous_email, current_user.email)
+        bump_user_data(current_user.id)
         print("✅ Profil mis à jour avec succès")
 
         # -------------------------------------------------------
@@ -797,17 +1886,17 @@ async def update_profile(
         # Si l'utilisateur est admin, on met à jour aussi ses données
         # dans la table "admins" pour garder les deux tables cohérentes.
         if current_user.role == "admin":
-            admin_entry = db.query(Admin).filter(Admin.user_id == current_user.id).first()
+            admin_entry = await db.scalar(select(Admin).where(Admin.user_id == current_user.id).limit(1))
             if admin_entry:
                 # Met à jour chaque champ modifié dans admins
                 admin_entry.username = current_user.username
                 admin_entry.email = current_user.email
                 admin_entry.hashed_password = current_user.hashed_password
                 admin_entry.is_active = current_user.is_active
-                db.commit()
+                await db.commit()
                 print(f"✅ Table admins synchronisée pour '{current_user.username}'")
 
-        new_token = create_access_token(data={"sub": current_user.email, "role": current_user.role})
+        new_token = create_access_token(data={"sub": current_user.email, "role": current_user.role, "uid": current_user.id})
         return JSONResponse(
             status_code=200,
             content={
@@ -817,48 +1906,112 @@ async def update_profile(
                 "new_token": new_token
             }
         )
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ Erreur serveur: {e}")
         return JSONResponse(
             status_code=500,
             content={"success": False, "message": f"Erreur serveur: {str(e)}"}
         )
 
+# ========================================
+# PIPELINE DES DÉRIVÉS D'IMAGES
+# ========================================
+# Après un upload (ou l'ajout / la modification d'un véhicule), les miniatures et variantes
+# WebP / AVIF de l'image sont produites dans un pool de processus, hors du chemin de la
+# requête (voir image_variants.py). Si le pool est saturé, l'image est ignorée : la
+# commande generate_image_variants.py la rattrape.
+# Processus démarrés en "spawn" : un fork du serveur (threads, boucle d'événements) n'est pas sûr.
+IMAGE_POOL_SIZE = max(1, (os.cpu_count() or 2) // 2)
+IMAGE_QUEUE_LIMIT = 64
+image_pool = BoundedExecutor(
+    ProcessPoolExecutor(max_workers=IMAGE_POOL_SIZE, mp_context=multiprocessing.get_context("spawn")),
+    max_pending=IMAGE_POOL_SIZE + IMAGE_QUEUE_LIMIT
+)
+
+# Tâches de génération en cours (références gardées jusqu'à leur fin)
+image_variant_tasks = set()
+
+async def build_image_variants(image_url: str, source_path: str) -> None:
+    """
+    Produit les variantes d'une image (si elle n'en a pas déjà) puis rafraîchit le catalogue.
+    """
+    try:
+        if await asyncio.to_thread(os.path.exists, manifest_path(source_path)):
+            return
+        manifest = await image_pool.run_async(generate_variants, source_path)
+        srcset_cache.pop(image_url)
+        catalog_snapshot.bump()
+        print(f"✅ Variantes produites : {manifest['source']} ({len(manifest['variants'])} format(s))")
+    except ExecutorSaturated:
+        print(f"❌ Pool d'images saturé, variantes reportées : {source_path}")
+    except Exception as e:
+        print(f"❌ Erreur lors de la production des variantes ({source_path}): {e}")
+
+def schedule_image_variants(image_url: Optional[str]) -> None:
+    """
+    Lance la production des variantes d'une image servie sous /static/images/ (URL externe : rien).
+    """
+    source_path = local_image_path(image_url, UPLOAD_FOLDER)
+    if source_path is None or not variants_supported():
+        return
+    task = asyncio.create_task(build_image_variants(image_url, source_path))
+    image_variant_tasks.add(task)
+    task.add_done_callback(image_variant_tasks.discard)
+
 # ========================================
 # ENDPOINT UPLOAD D'IMAGE
 # ========================================
 @app.post("/upload-image/")
 async def upload_image(
+    request: Request,
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Endpoint pour uploader une image.
+    Le fichier est copié par morceaux (sans bloquer le serveur), limité à IMAGE_MAX_BYTES
+    octets et rangé sous son empreinte SHA-256 : une image déjà uploadée n'est pas dupliquée.
     """
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"Image trop volumineuse (maximum {IMAGE_MAX_BYTES // (1024 * 1024)} Mo)"
+    )
     try:
         # Vérification du type 
-        allowed_types = ["image/jpeg", "image/png", "image/jpg", "image/webp"]
-        if file.content_type not in allowed_types:
+        if file.content_type not in IMAGE_EXTENSIONS:
             raise HTTPException(
                 status_code=400,
                 detail="Type de fichier non autorisé. Utilisez JPG, PNG ou WEBP."
             )
-        # Génération d'un nom de fichier unique
-        extension = file.filename.split(".")[-1]
-        unique_filename = f"{uuid.uuid4()}.{extension}"
-        file_path = f"{UPLOAD_FOLDER}/{unique_filename}"
-        # Sauvegarde du fichier sur le disque
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Rejet immédiat si la requête annonce déjà une taille trop grande
+        # (marge de 64 Ko pour l'enveloppe multipart)
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > IMAGE_MAX_BYTES + 64 * 1024:
+            raise too_large
+        stored = await store_upload(file, file.content_type, UPLOAD_FOLDER)
         # Construction de l'URL publique
-        image_url = f"http://localhost:8000/static/images/{unique_filename}"
-        print(f"✅ Image uploadée : {file_path} → {image_url}")
+        image_url = f"http://localhost:8000/static/images/{stored.filename}"
+        if stored.deduplicated:
+            print(f"✅ Image déjà présente : {stored.filename} → {image_url}")
+        else:
+            print(f"✅ Image uploadée : {UPLOAD_FOLDER}/{stored.filename} → {image_url}")
+        schedule_image_variants(image_url)
         return {
             "success": True,
             "url": image_url,
-            "filename": unique_filename
+            "filename": stored.filename,
+            "size": stored.size,
+            "sha256": stored.sha256,
+            "deduplicated": stored.deduplicated
         }
+    except ImageTooLarge:
+        raise too_large
+    except EmptyImage:
+        raise HTTPException(status_code=400, detail="Fichier vide")
     except HTTPException:
         raise
     except Exception as e:
@@ -869,10 +2022,10 @@ async def upload_image(
 # ENDPOINTS ADMIN POUR LA GESTION DES VÉHICULES
 # ========================================
 @app.post("/admin/vehicles")
-def add_vehicle(
+async def add_vehicle(
     vehicle_data: dict,
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_admin: Principal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Ajoute un nouveau véhicule (admin seulement).
@@ -886,57 +2039,63 @@ def add_vehicle(
             transmission=vehicle_data['transmission'],
             seats=vehicle_data['seats'],
             engine=vehicle_data['engine'],
-            year=vehicle_data['year'],
+            year=vehicle_data['year'] or 0,
             fuel=vehicle_data['fuel'],
             isAvailable=vehicle_data.get('isAvailable', True),
             isNew=vehicle_data.get('isNew', False),
             isBestChoice=vehicle_data.get('isBestChoice', False),
-            rating=vehicle_data.get('rating', 0.0),
+            rating=vehicle_data.get('rating') or 0.0,
             popularity=vehicle_data.get('popularity', 0),
             luggage=vehicle_data.get('luggage', 0),
             airConditioning=vehicle_data.get('airConditioning', True),
             bluetooth=vehicle_data.get('bluetooth', True),
         )
         db.add(new_vehicle)
-        db.commit()
-        db.refresh(new_vehicle)
+        await db.commit()
+        await db.refresh(new_vehicle)
+        catalog_snapshot.bump()
+        rollup_vehicle(new_vehicle)
+        schedule_image_variants(new_vehicle.image)
         return {
             "success": True,
             "message": "Véhicule ajouté avec succès",
             "vehicle_id": new_vehicle.id
         }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Erreur lors de l'ajout: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 @app.delete("/admin/vehicles/{vehicle_id}")
-def delete_vehicle(
+async def delete_vehicle(
     vehicle_id: int,
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_admin: Principal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Supprime un véhicule (admin seulement) .
     """
     try:
-        vehicle = db.query(vehicles).filter(vehicles.id == vehicle_id).first()
+        vehicle = await db.scalar(select(vehicles).where(vehicles.id == vehicle_id).limit(1))
         if not vehicle:
             raise HTTPException(status_code=404, detail="Véhicule non trouvé")
         # Vérifie s'il y a des réservations actives sur ce véhicule
-        active_bookings = db.query(Booking).filter(
+        active_bookings = await db.scalar(select(func.count()).select_from(Booking).where(
             Booking.car_id == vehicle_id,
-            Booking.status.in_(["En attente", "Confirmée"])
-        ).count()
+            Booking.status.in_(ACTIVE_BOOKING_STATUSES)
+        ))
         if active_bookings > 0:
             raise HTTPException(
                 status_code=400,
                 detail=f"Impossible de supprimer : {active_bookings} réservation(s) active(s)"
             )
         # Supprime les favoris liés à ce véhicule
-        db.query(Favorite).filter(Favorite.car_id == vehicle_id).delete()
-        db.delete(vehicle)
-        db.commit()
+        await db.execute(delete(Favorite).where(Favorite.car_id == vehicle_id))
+        await db.delete(vehicle)
+        await db.commit()
+        catalog_snapshot.bump()
+        catalog_rollup.remove(vehicle_id)
+        favorites_cache.update_all(lambda ids: ids - {vehicle_id})
         return {
             "success": True,
             "message": "Véhicule supprimé avec succès",
@@ -945,22 +2104,22 @@ def delete_vehicle(
     except HTTPException as he:
         raise he
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Erreur lors de la suppression: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 @app.put("/admin/vehicles/{vehicle_id}")
-def update_vehicle(
+async def update_vehicle(
     vehicle_id: int,
     vehicle_data: dict,
-    current_admin: User = Depends(get_current_admin),
-    db: Session = Depends(get_db)
+    current_admin: Principal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Met à jour les informations d'un véhicule (admin seulement).
     """
     try:
-        vehicle = db.query(vehicles).filter(vehicles.id == vehicle_id).first()
+        vehicle = await db.scalar(select(vehicles).where(vehicles.id == vehicle_id).limit(1))
         if not vehicle:
             raise HTTPException(status_code=404, detail="Véhicule non trouvé")
         # Mise à jour conditionnelle de chaque champ si présent dans vehicle_data
@@ -979,7 +2138,7 @@ def update_vehicle(
         if 'engine' in vehicle_data:
             vehicle.engine = vehicle_data['engine']
         if 'year' in vehicle_data:
-            vehicle.year = vehicle_data['year']
+            vehicle.year = vehicle_data['year'] or 0
         if 'fuel' in vehicle_data:
             vehicle.fuel = vehicle_data['fuel']
         if 'isAvailable' in vehicle_data:
@@ -989,7 +2148,7 @@ def update_vehicle(
         if 'isBestChoice' in vehicle_data:
             vehicle.isBestChoice = vehicle_data['isBestChoice']
         if 'rating' in vehicle_data:
-            vehicle.rating = vehicle_data['rating']
+            vehicle.rating = vehicle_data['rating'] or 0.0
         if 'popularity' in vehicle_data:
             vehicle.popularity = vehicle_data['popularity']
         if 'luggage' in vehicle_data:
@@ -998,8 +2157,12 @@ def update_vehicle(
             vehicle.airConditioning = vehicle_data['airConditioning']
         if 'bluetooth' in vehicle_data:
             vehicle.bluetooth = vehicle_data['bluetooth']
-        db.commit()
-        db.refresh(vehicle)
+        await db.commit()
+        await db.refresh(vehicle)
+        catalog_snapshot.bump()
+        rollup_vehicle(vehicle)
+        if 'image' in vehicle_data:
+            schedule_image_variants(vehicle.image)
         return {
             "success": True,
             "message": "Véhicule mis à jour avec succès",
@@ -1027,7 +2190,7 @@ def update_vehicle(
     except HTTPException as he:
         raise he
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"Erreur lors de la mise à jour: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
@@ -1035,10 +2198,10 @@ def update_vehicle(
 # ENDPOINTS POUR LES CONVERSATIONS (CHAT)
 # ========================================
 @app.post("/conversations/", response_model=ConversationResponse, status_code=status.HTTP_201_CREATED)
-def create_conversation(
+async def create_conversation(
     conversation_data: ConversationCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Crée une nouvelle conversation pour l'utilisateur courant.
@@ -1049,376 +2212,285 @@ def create_conversation(
             title=conversation_data.title
         )
         db.add(new_conversation)
-        db.commit()
-        db.refresh(new_conversation)
-        return new_conversation
+        await db.commit()
+        await db.refresh(new_conversation)
+        # Réponse construite explicitement : une nouvelle conversation n'a aucun message,
+        # inutile de charger la relation (chargement paresseux impossible en asynchrone)
+        return {
+            "id": new_conversation.id,
+            "user_id": new_conversation.user_id,
+            "title": new_conversation.title,
+            "created_at": new_conversation.created_at,
+            "updated_at": new_conversation.updated_at,
+            "is_active": new_conversation.is_active,
+            "message_count": 0,
+            "last_message_at": None,
+            "messages": []
+        }
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ Erreur lors de la création de la conversation: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
+# Longueur maximale de l'aperçu du dernier message (colonne last_message_preview)
+MESSAGE_PREVIEW_LENGTH = 200
+
+# Taille maximale d'une page de conversations
+CONVERSATIONS_MAX_PAGE_SIZE = 100
+
+def conversation_activity(conversation_id: int, added: int, last_content: str, at: datetime):
+    """
+    UPDATE du résumé d'une conversation après l'ajout de `added` messages (le dernier étant
+    last_content). L'incrément est fait par la base : pas de perte en cas d'ajouts simultanés.
+    """
+    return (
+        update(Conversation)
+        .where(Conversation.id == conversation_id)
+        .values(
+            message_count=Conversation.message_count + added,
+            last_message_preview=last_content[:MESSAGE_PREVIEW_LENGTH],
+            last_message_at=at,
+            updated_at=at
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+# Écriture différée des messages (CHAT_WRITE_BEHIND, voir message_writer.py) : None si désactivée
+message_writer = MessageWriteBehind(AsyncSessionLocal, conversation_activity) if CHAT_WRITE_BEHIND else None
+
 @app.get("/conversations/", response_model=List[ConversationListResponse])
-def get_user_conversations(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    include_inactive: bool = False
+async def get_user_conversations(
+    response: Response,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db),
+    include_inactive: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=CONVERSATIONS_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
 ):
     """
-    Récupère la liste des conversations de l'utilisateur courant.
+    Récupère la liste des conversations de l'utilisateur courant, de la plus récente à la plus ancienne.
+    Une seule requête sur "conversations" (résumé dénormalisé, aucun message chargé).
+    Si "limit" est fourni, le curseur de la page suivante est renvoyé dans l'en-tête X-Next-Cursor.
     """
     try:
-        query = db.query(Conversation).filter(Conversation.user_id == current_user.id)
+        query = select(
+            Conversation.id,
+            Conversation.title,
+            Conversation.created_at,
+            Conversation.updated_at,
+            Conversation.message_count,
+            Conversation.last_message_preview
+        ).where(Conversation.user_id == current_user.id)
         if not include_inactive:
-            query = query.filter(Conversation.is_active == True)
-        conversations = query.order_by(Conversation.updated_at.desc()).all()
-        result = []
-        for conv in conversations:
-            message_count = len(conv.messages)
-            last_message = conv.messages[-1].content if conv.messages else None
-            result.append({
-                "id": conv.id,
-                "title": conv.title,
-                "created_at": conv.created_at,
-                "updated_at": conv.updated_at,
-                "message_count": message_count,
-                "last_message": last_message
-            })
-        return result
+            query = query.where(Conversation.is_active == True)
+        if cursor:
+            last_value, last_id = decode_cursor(cursor)
+            try:
+                last_value = datetime.fromisoformat(last_value)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+            query = query.where(keyset_condition(Conversation.updated_at, Conversation.id, last_value, last_id, True))
+        query = query.order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+        if limit is not None:
+            rows = (await db.execute(query.limit(limit + 1))).all()
+            if len(rows) > limit:
+                rows = rows[:limit]
+                response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].updated_at, rows[-1].id)
+        else:
+            rows = (await db.execute(query)).all()
+        return [
+            {
+                "id": row.id,
+                "title": row.title,
+                "created_at": row.created_at,
+                "updated_at": row.updated_at,
+                "message_count": row.message_count or 0,
+                "last_message": row.last_message_preview
+            }
+            for row in rows
+        ]
+    except HTTPException as he:
+        raise he
     except Exception as e:
         print(f"❌ Erreur lors de la récupération des conversations: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
+@app.get("/conversations/{conversation_id}", response_model=ConversationResponse)
+async def get_conversation(
+    conversation_id: int,
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Récupère une conversation (résumé seulement, même coût quel que soit le nombre de messages).
+    """
+    conversation = await db.scalar(select(Conversation).where(
+        Conversation.id == conversation_id,
+        Conversation.user_id == current_user.id
+    ).limit(1))
+    if not conversation:
+        raise HTTPException(
+            status_code=404,
+            detail="Conversation non trouvée ou vous n'avez pas accès à cette conversation"
+        )
+    return {
+        "id": conversation.id,
+        "user_id": conversation.user_id,
+        "title": conversation.title,
+        "created_at": conversation.created_at,
+        "updated_at": conversation.updated_at,
+        "is_active": conversation.is_active,
+        "message_count": conversation.message_count or 0,
+        "last_message_at": conversation.last_message_at,
+        "messages": []
+    }
+
+# Taille par défaut et maximale d'une page de messages
+MESSAGES_DEFAULT_PAGE_SIZE = 50
+MESSAGES_MAX_PAGE_SIZE = 200
+
+@app.get("/conversations/{conversation_id}/messages", response_model=List[MessageResponse])
+async def get_conversation_messages(
+    conversation_id: int,
+    response: Response,
+    before: Optional[str] = None,
+    limit: int = Query(MESSAGES_DEFAULT_PAGE_SIZE, ge=1, le=MESSAGES_MAX_PAGE_SIZE),
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Récupère l'historique d'une conversation page par page, du plus récent au plus ancien.
+    Chaque page est renvoyée dans l'ordre chronologique ; s'il reste des messages plus
+    anciens, le curseur à passer dans "before" est renvoyé dans l'en-tête X-Next-Cursor.
+    """
+    try:
+        owned = await db.scalar(select(exists().where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == current_user.id
+        )))
+        if not owned:
+            raise HTTPException(
+                status_code=404,
+                detail="Conversation non trouvée ou vous n'avez pas accès à cette conversation"
+            )
+        # Conversation archivée : ses messages sont d'abord remis dans la table chaude
+        if await has_archives(db, conversation_id):
+            restored = await rehydrate_conversation(
+                db, conversation_id, message_writer.reserve_ids if message_writer is not None else None
+            )
+            await db.commit()
+            print(f"✅ Conversation {conversation_id} réhydratée : {restored} message(s)")
+        # Messages encore en file d'écriture : écrits avant la lecture
+        if message_writer is not None and message_writer.has_pending(conversation_id):
+            await message_writer.flush()
+        # Parcours de l'index (conversation_id, created_at, id) en ordre décroissant
+        query = select(Message).where(Message.conversation_id == conversation_id)
+        if before:
+            last_value, last_id = decode_cursor(before)
+            try:
+                last_value = datetime.fromisoformat(last_value)
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail="Curseur de pagination invalide")
+            query = query.where(keyset_condition(Message.created_at, Message.id, last_value, last_id, True))
+        query = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1)
+        messages = (await db.scalars(query)).all()
+        if len(messages) > limit:
+            messages = messages[:limit]
+            oldest = messages[-1]
+            response.headers["X-Next-Cursor"] = encode_cursor(oldest.created_at, oldest.id)
+        return list(reversed(messages))
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        print(f"❌ Erreur lors de la récupération des messages: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
+
 @app.post("/conversations/{conversation_id}/messages", response_model=MessageResponse, status_code=status.HTTP_201_CREATED)
-def add_message(
+async def add_message(
     conversation_id: int,
     message_data: MessageCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: Principal = Depends(get_current_principal),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Ajoute un message dans une conversation (côté utilisateur).
     """
     try:
-        conversation = db.query(Conversation).filter(
+        conversation = await db.scalar(select(Conversation).where(
             Conversation.id == conversation_id,
             Conversation.user_id == current_user.id
-        ).first()
+        ).limit(1))
         if not conversation:
             raise HTTPException(
                 status_code=404,
                 detail="Conversation non trouvée ou vous n'avez pas accès à cette conversation"
             )
+        if message_writer is not None:
+            # Connexion rendue au pool avant la mise en file : enqueue() peut en demander une
+            # (réservation d'IDs, file pleine), ce qui épuiserait le pool sous forte charge
+            await db.close()
+            pending = await message_writer.enqueue(conversation_id, message_data.content, message_data.is_user)
+            return pending._asdict()
         new_message = Message(
             conversation_id=conversation_id,
             content=message_data.content,
             is_user=message_data.is_user
         )
         db.add(new_message)
-        conversation.updated_at = datetime.now()
-        db.commit()
-        db.refresh(new_message)
+        await db.execute(conversation_activity(conversation_id, 1, message_data.content, datetime.now()))
+        await db.commit()
+        await db.refresh(new_message)
         return new_message
     except HTTPException as he:
         raise he
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ Erreur lors de l'ajout du message: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
 
 # ========================================
-# FONCTION DE GÉNÉRATION DE RÉPONSE POUR L'ASSISTANT 
+# CACHE DES RÉPONSES DE L'ASSISTANT
 # ========================================
-def generate_assistant_response(user_message: str, current_user: User, db: Session) -> str:
-    """
-    Génère une réponse intelligente de l'assistant en fonction du message utilisateur.
-    Utilise des règles et des données contextuelles.
-    """
-    # Convertit le message en minuscules pour une comparaison insensible à la casse
-    user_message_lower = user_message.lower()
-    
-    # Récupère les données contextuelles de l'utilisateur
-    user_bookings = db.query(Booking).filter(Booking.user_id == current_user.id).all()
-    user_favorites = db.query(Favorite).filter(Favorite.user_id == current_user.id).all()
-    available_cars = db.query(vehicles).filter(vehicles.isAvailable == True).count()
-    all_cars = db.query(vehicles).all()
-    
-    # ========================================
-    # RÉPONSES PRÉDÉFINIES POUR LES QUESTIONS COURANTES
-    # ========================================
-    
-    # --- 1. COMMENT RÉSERVER ? ---
-    if user_message_lower == "comment réserver ?" or ("réserver" in user_message_lower and "comment" in user_message_lower):
-        return """📋 **Comment réserver un véhicule :**
-        
-1. **Parcourez** notre catalogue de véhicules dans l'onglet "Nos voitures"
-2. **Sélectionnez** le véhicule qui vous convient
-3. **Cliquez** sur le bouton "Réserver" (vert si disponible)
-4. **Remplissez** le formulaire avec :
-   - Vos informations personnelles
-   - Les dates de location
-   - L'heure et le lieu de prise
-   - Les options supplémentaires
-5. **Confirmez** la réservation
-
-💰 **Paiement :** Le paiement se fait à la prise du véhicule, ou en ligne selon l'option choisie.
-📞 **Besoin d'aide ?** Contactez-nous au 71 234 567"""
-    
-    # --- 2. TARIFS / PRIX (suggestion "Quels sont les tarifs ?") ---
-    # Détecte les mots "tarifs", "prix", "combien", "coût", "tarif"
-    elif (user_message_lower == "quels sont les tarifs ?" or 
-          any(word in user_message_lower for word in ['tarifs', 'tarif', 'prix', 'combien', 'coût'])):
-        # Calcule les prix moyens par catégorie
-        categories = {}
-        for car in all_cars:
-            cat = car.category
-            if cat not in categories:
-                categories[cat] = []
-            categories[cat].append(float(car.price))
-        
-        price_info = "💵 **Tarifs par catégorie (par jour) :**\n\n"
-        for cat, prices in categories.items():
-            if prices:
-                avg = sum(prices) / len(prices)
-                price_info += f"• **{cat}** : {avg:.0f} - {max(prices):.0f} TND\n"
-        
-        price_info += "\n💡 **Informations supplémentaires :**\n"
-        price_info += "• Location de plusieurs jours : réduction de 10% à partir de 3 jours\n"
-        price_info += "• Options supplémentaires :\n"
-        price_info += "  - Chauffeur : +50 TND/jour\n"
-        price_info += "  - GPS : +5 TND/jour\n"
-        price_info += "  - Siège enfant : +3 TND/jour\n"
-        price_info += "\n🔍 Pour connaître le prix exact d'un véhicule, consultez sa fiche détaillée."
-        
-        return price_info
-    
-    # --- 3. FAVORIS (suggestion "Ajouter aux favoris") ---
-    # Détecte "favoris", "favori", "ajouter aux favoris", "mes favoris"
-    elif any(word in user_message_lower for word in ['favoris', 'favori']):
-        favorite_count = len(user_favorites)
-        if favorite_count > 0:
-            # Récupère les noms des derniers véhicules favoris
-            car_names = []
-            for fav in user_favorites[:3]:  # Limite à 3 noms pour la lisibilité
-                car = db.query(vehicles).filter(vehicles.id == fav.car_id).first()
-                if car:
-                    car_names.append(car.name)
-            
-            # Formate la liste des noms
-            cars_list = ", ".join(car_names)
-            if favorite_count > 3:
-                cars_list += f" et {favorite_count - 3} autres"
-            
-            return f"""❤️ **Vos favoris :**
-            
-Vous avez actuellement **{favorite_count} véhicule(s)** dans vos favoris.
-Derniers ajouts : {cars_list}
-
-**Pour ajouter un véhicule aux favoris :**
-1. Allez dans "Nos voitures"
-2. Trouvez un véhicule qui vous plaît
-3. Cliquez sur l'icône ❤️ en haut à droite de l'image
-4. Le véhicule sera ajouté à votre liste
-
-📱 **Accès rapide :** Retrouvez tous vos favoris dans l'onglet "Mes Favoris" du menu principal."""
-        else:
-            return """❤️ **Ajouter aux favoris :**
-            
-**Pour ajouter un véhicule aux favoris :**
-1. Naviguez dans notre catalogue de véhicules
-2. Lorsque vous trouvez un véhicule qui vous intéresse
-3. Cliquez sur l'icône ❤️ (cœur) en haut à droite de la photo du véhicule
-4. Le véhicule sera sauvegardé dans votre liste personnelle
-
-💡 **Utilité des favoris :**
-• Gardez une trace des véhicules qui vous plaisent
-• Comparez facilement plusieurs modèles
-• Accédez rapidement à vos préférés
-• Recevez des notifications si le prix baisse
-
-🎯 **Conseil :** Ajoutez plusieurs véhicules pour comparer et choisir plus facilement !"""
-    
-    # --- 4. TYPES DE VÉHICULES (suggestion "Types de véhicules") ---
-    elif user_message_lower == "types de véhicules" or "catégories" in user_message_lower:
-        # Compte les véhicules par catégorie
-        category_counts = {}
-        category_examples = {}
-        for car in all_cars:
-            cat = car.category
-            if cat not in category_counts:
-                category_counts[cat] = 0
-                category_examples[cat] = car.name
-            category_counts[cat] += 1
-        
-        response = "🚗 **Nos catégories de véhicules :**\n\n"
-        for cat, count in category_counts.items():
-            example = category_examples.get(cat, "")
-            response += f"• **{cat}** ({count} modèles)\n"
-            response += f"  *Exemple : {example}*\n"
-            response += f"  *Idéal pour : "
-            if cat == "Économique":
-                response += "petits budgets, ville*\n"
-            elif cat == "Citadine":
-                response += "ville, petits trajets*\n"
-            elif cat == "Familiale":
-                response += "familles, grands espaces*\n"
-            elif cat == "Compacte":
-                response += "confort urbain*\n"
-            elif cat == "SUV":
-                response += "aventure, tout-terrain*\n"
-            else:
-                response += "usage général*\n"
-        
-        response += "\n🔍 **Comment choisir ?**\n"
-        response += "• Pour la ville : Économique ou Citadine\n"
-        response += "• Pour la famille : Familiale ou SUV\n"
-        response += "• Pour le confort : Compacte\n"
-        response += "• Pour les voyages : SUV\n"
-        return response
-    
-    # --- 5. CONTACTER LE SUPPORT (suggestion "Contacter le support") ---
-    elif user_message_lower == "contacter le support" or "support" in user_message_lower:
-        return """📞 **Contact et support :**
-        
-**Service client disponible :**
-• 📞 Téléphone : (+216) 71 234 567
-• 📧 Email : support@carrental-tn.com
-• 🌐 Site web : www.carrental-tn.com
-
-**Horaires d'ouverture :**
-• Lundi - Vendredi : 8h00 - 18h00
-• Samedi : 9h00 - 16h00
-• Dimanche : Fermé
-
-**Points de contact :**
-• **Réservations :** reservation@carrental-tn.com
-• **Support technique :** tech@carrental-tn.com
-• **Réclamations :** reclamation@carrental-tn.com
-
-**Agences physiques :**
-1. **Tunis Centre** : Avenue Habib Bourguiba
-2. **Aéroport Tunis-Carthage** : Hall des arrivées
-3. **Sousse** : Rue Habib Thameur
-4. **Sfax** : Avenue de la République
-
-💡 **Conseil :** Pour une réponse rapide, appelez-nous pendant les heures d'ouverture."""
-    
-    # --- 6. VÉHICULES DISPONIBLES (suggestion "Véhicules disponibles") ---
-    elif user_message_lower == "véhicules disponibles" or "disponibles" in user_message_lower:
-        # Récupère quelques véhicules disponibles
-        available_cars_list = db.query(vehicles).filter(
-            vehicles.isAvailable == True
-        ).limit(5).all()
-        
-        response = f"✅ **Véhicules disponibles :**\n\n"
-        response += f"Nous avons actuellement **{available_cars} véhicules** disponibles à la location.\n\n"
-        if available_cars_list:
-            response += "**Quelques modèles disponibles :**\n"
-            for car in available_cars_list:
-                response += f"• **{car.name}** ({car.category}) - {float(car.price):.0f} TND/jour\n"
-            response += f"\n💡 **Conseil :** {available_cars} choix disponibles. Réservez vite pour garantir votre véhicule préféré !\n"
-        else:
-            response += "Aucun véhicule disponible pour le moment.\n"
-        
-        response += "\n**Filtres disponibles :**\n"
-        response += "• Par prix (0 - 500 TND)\n"
-        response += "• Par catégorie (Économique, SUV...)\n"
-        response += "• Par disponibilité\n"
-        response += "• Par nombre de places\n"
-        response += "\n🔍 **Comment voir tous les véhicules ?**\n"
-        response += "Allez dans 'Nos voitures' et utilisez les filtres pour trouver le véhicule parfait !"
-        return response
-    
-    # --- 7. MODIFIER LE PROFIL (suggestion "Modifier mon profil") ---
-    # Détecte "profil", "mon profil", ou des phrases avec "modifier" + "profil/compte"
-    elif (user_message_lower == "modifier mon profil" or
-          user_message_lower == "profil" or
-          user_message_lower == "mon profil" or
-          (any(word in user_message_lower for word in ['profil', 'mon compte']) and
-           any(word in user_message_lower for word in ['modifier', 'changer']))):
-        return """👤 **Modifier votre profil :**
-        
-**Pour modifier vos informations personnelles :**
-1. Allez dans l'onglet "Mon Profil" (icône 👤)
-2. Cliquez sur la section "Modifier mon compte"
-3. Vous pouvez modifier :
-   • Votre nom d'utilisateur
-   • Votre adresse email
-   • Votre mot de passe
-
-**Informations modifiables :**
-• **Nom d'utilisateur** : Votre identifiant d'affichage
-• **Email** : Adresse de connexion et de contact
-• **Mot de passe** : Sécurité de votre compte
-
-⚠️ **Important :**
-• Pour changer le mot de passe, vous devez connaître l'actuel
-• Après modification d'email, vous devrez utiliser le nouvel email pour vous reconnecter
-• Les modifications sont immédiates
-
-🔒 **Sécurité :**
-Vos données sont cryptées et protégées selon les normes RGPD.
-
-💡 **Besoin d'aide ?** Contactez le support si vous rencontrez des difficultés."""
-    
-    # --- 8. RÉPONSE GÉNÉRIQUE SUR LES VÉHICULES (si "véhicule(s)" ou "voiture(s)" sans être pris par les cas spécifiques) ---
-    elif any(word in user_message_lower for word in ['véhicule', 'véhicules', 'voiture', 'voitures']):
-        return """🚗 **Notre gamme de véhicules :**
-
-Nous proposons une large sélection de véhicules adaptés à tous vos besoins :
-
-• **Économique** – Idéal pour petits budgets et déplacements urbains.
-• **Citadine** – Confortable et maniable en ville.
-• **Familiale** – Espace et confort pour les voyages en famille.
-• **SUV** – Polyvalent, parfait pour l'aventure et le tout-terrain.
-• **Compacte** – Un bon compromis entre taille et confort.
-
-🔍 **Comment explorer notre catalogue ?**
-Rendez-vous dans l'onglet **"Nos voitures"** pour voir tous les modèles disponibles. Vous pouvez filtrer par catégorie, prix, nombre de places, etc.
-
-💬 Souhaitez-vous plus d'informations sur une catégorie en particulier ou voir les véhicules actuellement disponibles ?"""
-    
-    # ========================================
-    # RÉPONSES GÉNÉRALES BASÉES SUR LES MOTS-CLÉS (salutations, réservations, annulations, remerciements)
-    # ========================================
-    
-    # Salutations
-    elif any(word in user_message_lower for word in ['bonjour', 'salut', 'hello', 'hi', 'coucou']):
-        return f"Bonjour {current_user.username} ! 👋 Je suis votre assistant CarRental. Comment puis-je vous aider aujourd'hui ?"
-    
-    # Réservations
-    elif any(word in user_message_lower for word in ['réservation', 'réserver', 'louer']):
-        if user_bookings:
-            active_bookings = [b for b in user_bookings if b.status in ["Confirmée", "En attente"]]
-            if active_bookings:
-                return f"Vous avez {len(active_bookings)} réservation(s) active(s). Allez dans 'Mes Réservations' pour les gérer."
-        return "Pour réserver, allez dans 'Nos voitures', choisissez un véhicule et cliquez sur 'Réserver'."
-    
-    # Annulations
-    elif any(word in user_message_lower for word in ['annuler', 'annulation', 'supprimer']):
-        if user_bookings:
-            return "Pour annuler une réservation, allez dans 'Mes Réservations', trouvez la réservation et contactez le support."
-        return "Vous n'avez aucune réservation à annuler."
-    
-    # Remerciements
-    elif any(word in user_message_lower for word in ['merci', 'thanks', 'thank you']):
-        return "Je vous en prie ! N'hésitez pas si vous avez d'autres questions. 😊"
-    
-    # ========================================
-    # RÉPONSE PAR DÉFAUT (QUESTION NON RECONNUE)
-    # ========================================
+# La clé dépend de la portée de l'intention (voir assistant.py) :
+#   "static"  → (intention)                                 : gardée jusqu'à éviction
+#   "message" → (intention, message)                        : petit cache séparé (messages libres,
+#                                                             rarement répétés : ils ne doivent pas
+#                                                             évincer les réponses fixes)
+#   "catalog" → (intention, version du catalogue)           : TTL court (écritures des autres workers)
+#   "user"    → (intention, utilisateur, version de ses données, version du catalogue)
+# Une écriture change la version, les anciennes entrées ne sont plus lues et sortent par éviction LRU.
+ASSISTANT_STATIC_CACHE_SIZE = 1000
+ASSISTANT_MESSAGE_CACHE_SIZE = 200
+ASSISTANT_CATALOG_CACHE_SIZE = 100
+ASSISTANT_CATALOG_CACHE_TTL_SECONDS = 30
+ASSISTANT_USER_CACHE_SIZE = 10000
+ASSISTANT_USER_CACHE_TTL_SECONDS = 60
+assistant_static_replies = LRUCache(maxsize=ASSISTANT_STATIC_CACHE_SIZE)
+assistant_message_replies = LRUCache(maxsize=ASSISTANT_MESSAGE_CACHE_SIZE)
+assistant_catalog_replies = LRUCache(maxsize=ASSISTANT_CATALOG_CACHE_SIZE, ttl_seconds=ASSISTANT_CATALOG_CACHE_TTL_SECONDS)
+assistant_user_replies = LRUCache(maxsize=ASSISTANT_USER_CACHE_SIZE, ttl_seconds=ASSISTANT_USER_CACHE_TTL_SECONDS)
+
+async def cached_assistant_reply(user_message: str, current_user: Principal, db: AsyncSession) -> str:
+    """
+    Renvoie la réponse de l'assistant depuis le cache si possible, sinon la génère et la met en cache.
+    """
+    intent = assistant_router.route(user_message)
+    if intent.scope == "static":
+        cache, key = assistant_static_replies, (intent.name,)
+    elif intent.scope == "message":
+        cache, key = assistant_message_replies, (intent.name, user_message)
+    elif intent.scope == "catalog":
+        cache, key = assistant_catalog_replies, (intent.name, catalog_snapshot.version)
+    elif intent.scope == "user":
+        key = (intent.name, current_user.id, user_data_version(current_user.id), catalog_snapshot.version)
+        cache = assistant_user_replies
     else:
-        default_responses = [
-            "Je comprends que vous dites : '{}'\n\nVoici ce que je peux vous aider :".format(user_message),
-            "• Réserver un véhicule 📅",
-            "• Consulter mes favoris ❤️",
-            "• Vérifier mes réservations 📋",
-            "• Connaître les tarifs 💰",
-            "• Contacter le support 📞",
-            "• Voir les véhicules disponibles 🚗",
-            "• Modifier mon profil 👤",
-            "\nPosez-moi une question plus précise ou utilisez les suggestions ci-dessous !"
-        ]
-        return "\n".join(default_responses)
+        return await intent.handler(user_message, current_user, db)
+    reply = cache.get(key)
+    if reply is None:
+        reply = await intent.handler(user_message, current_user, db)
+        cache.set(key, reply)
+    return reply
 
 # ========================================
 # ENDPOINT PRINCIPAL POUR L'ASSISTANT DE CHAT
@@ -1426,23 +2498,36 @@ Rendez-vous dans l'onglet **"Nos voitures"** pour voir tous les modèles disponi
 @app.post("/assistant/chat")
 async def chat_with_assistant(
     data: ChatInput,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
 ):
     """
     Endpoint pour envoyer un message à l'assistant et recevoir une réponse automatique.
     """
     try:
         # Vérifie que la conversation appartient bien à l'utilisateur
-        conversation = db.query(Conversation).filter(
+        conversation = await db.scalar(select(Conversation).where(
             Conversation.id == data.conversation_id,
             Conversation.user_id == current_user.id
-        ).first()
+        ).limit(1))
         if not conversation:
             raise HTTPException(
                 status_code=404,
                 detail="Conversation non trouvée ou vous n'avez pas accès à cette conversation"
             )
+        if message_writer is not None:
+            bot_reply = await cached_assistant_reply(data.content, current_user, db)
+            # Connexion rendue au pool avant la mise en file (voir add_message)
+            await db.close()
+            user_msg = await message_writer.enqueue(data.conversation_id, data.content, True)
+            assistant_msg = await message_writer.enqueue(data.conversation_id, bot_reply, False)
+            return {
+                "success": True,
+                "reply": bot_reply,
+                "user_message_id": user_msg.id,
+                "assistant_message_id": assistant_msg.id,
+                "conversation_id": data.conversation_id
+            }
         # 1. Sauvegarde le message de l'utilisateur
         user_msg = Message(
             conversation_id=data.conversation_id,
@@ -1451,7 +2536,7 @@ async def chat_with_assistant(
         )
         db.add(user_msg)
         # 2. Génère une réponse intelligente via la fonction d'assistance
-        bot_reply = generate_assistant_response(data.content, current_user, db)
+        bot_reply = await cached_assistant_reply(data.content, current_user, db)
         # 3. Sauvegarde la réponse de l'assistant
         assistant_msg = Message(
             conversation_id=data.conversation_id,
@@ -1459,10 +2544,10 @@ async def chat_with_assistant(
             is_user=False
         )
         db.add(assistant_msg)
-        conversation.updated_at = datetime.now()
-        db.commit()
-        db.refresh(user_msg)
-        db.refresh(assistant_msg)
+        await db.execute(conversation_activity(data.conversation_id, 2, bot_reply, datetime.now()))
+        await db.commit()
+        await db.refresh(user_msg)
+        await db.refresh(assistant_msg)
         return {
             "success": True,
             "reply": bot_reply,
@@ -1473,6 +2558,101 @@ async def chat_with_assistant(
     except HTTPException as he:
         raise he
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         print(f"❌ Erreur lors de l'interaction avec l'assistant: {e}")
-        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Erreur serveur: {str(e)}")
+
+# ========================================
+# ENDPOINT DE L'ASSISTANT EN FLUX (SERVER-SENT EVENTS)
+# ========================================
+# L'événement "start" part avant la génération de la réponse ; la réponse est ensuite
+# envoyée morceau par morceau (une ligne par événement "chunk"). Les deux messages sont
+# enregistrés en tâche de fond après le flux, dans leur propre session. Chaque flux est
+# une coroutine : un worker en sert des centaines simultanément sans occuper de thread.
+#
+# Limite : les gestionnaires d'intention (assistant.py) renvoient leur réponse entière
+# (au plus deux requêtes courtes, ou le cache) ; les morceaux sont découpés dans la
+# réponse terminée, et non produits au fil de la génération.
+
+# Tâches d'enregistrement en cours (références gardées jusqu'à leur fin, attendues à l'arrêt)
+chat_persist_tasks = set()
+
+async def persist_chat_exchange(conversation_id: int, user_content: str, reply: str) -> None:
+    """
+    Enregistre le message de l'utilisateur et la réponse de l'assistant, puis met à jour la conversation.
+    """
+    try:
+        if message_writer is not None:
+            await message_writer.enqueue(conversation_id, user_content, True)
+            await message_writer.enqueue(conversation_id, reply, False)
+            return
+        async with AsyncSessionLocal() as db:
+            db.add(Message(conversation_id=conversation_id, content=user_content, is_user=True))
+            db.add(Message(conversation_id=conversation_id, content=reply, is_user=False))
+            await db.execute(conversation_activity(conversation_id, 2, reply, datetime.now()))
+            await db.commit()
+    except Exception as e:
+        print(f"❌ Erreur lors de l'enregistrement des messages (conversation {conversation_id}): {e}")
+
+def schedule_chat_persist(conversation_id: int, user_content: str, reply: str) -> None:
+    task = asyncio.create_task(persist_chat_exchange(conversation_id, user_content, reply))
+    chat_persist_tasks.add(task)
+    task.add_done_callback(chat_persist_tasks.discard)
+
+async def drain_chat_persist_tasks() -> None:
+    """
+    Attend la fin des enregistrements en cours (arrêt du serveur).
+    """
+    if chat_persist_tasks:
+        await asyncio.gather(*chat_persist_tasks, return_exceptions=True)
+
+def sse_event(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+async def iter_assistant_stream(data: ChatInput, current_user: Principal):
+    """
+    Générateur des événements SSE : "start", un "chunk" par ligne de la réponse, puis "done".
+    La réponse est générée en entier avant le premier "chunk" (voir la limite ci-dessus).
+    Il ouvre sa propre session : celle de la requête peut être fermée avant la fin du flux.
+    """
+    yield sse_event("start", {"conversation_id": data.conversation_id})
+    try:
+        async with AsyncSessionLocal() as db:
+            bot_reply = await cached_assistant_reply(data.content, current_user, db)
+    except Exception as e:
+        print(f"❌ Erreur lors de la génération de la réponse en flux: {e}")
+        yield sse_event("error", {"detail": "Erreur lors de la génération de la réponse"})
+        return
+    # L'enregistrement est planifié avant l'envoi : il a lieu même si le client se déconnecte
+    schedule_chat_persist(data.conversation_id, data.content, bot_reply)
+    for chunk in bot_reply.splitlines(keepends=True):
+        yield sse_event("chunk", {"delta": chunk})
+    yield sse_event("done", {"conversation_id": data.conversation_id, "reply": bot_reply})
+
+@app.post("/assistant/stream")
+async def stream_with_assistant(
+    data: ChatInput,
+    db: AsyncSession = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """
+    Variante en flux de /assistant/chat : la réponse est envoyée en Server-Sent Events.
+    """
+    # Vérifie que la conversation appartient bien à l'utilisateur (avant d'ouvrir le flux)
+    owned = await db.scalar(select(exists().where(
+        Conversation.id == data.conversation_id,
+        Conversation.user_id == current_user.id
+    )))
+    if not owned:
+        raise HTTPException(
+            status_code=404,
+            detail="Conversation non trouvée ou vous n'avez pas accès à cette conversation"
+        )
+    return StreamingResponse(
+        iter_assistant_stream(data, current_user),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # désactive la mise en tampon des proxys (nginx)
+        }
+    )
@@ -0,0 +1,256 @@
+# ============================================================
+# RÉTENTION ET ARCHIVAGE DES MESSAGES
+# ============================================================
+# Les messages des conversations éligibles sont retirés de la table "messages" et
+# stockés dans "message_archives" : lots de ARCHIVE_CHUNK_MESSAGES messages, sérialisés
+# en JSON puis compressés (zstd si le module "zstandard" est installé, sinon zlib).
+# À la relecture d'une conversation archivée, ses messages sont remis dans "messages"
+# sous de nouveaux identifiants (réhydratation), puis les archives sont supprimées.
+# Les identifiants d'origine ne sont pas réutilisés : sans AUTOINCREMENT (SQLite), ils
+# ont pu être repris par des messages écrits depuis l'archivage. L'ordre est conservé :
+# l'historique est trié par (created_at, id) et les messages d'une archive sont insérés
+# dans leur ordre d'origine.
+#
+# Politique (variables d'environnement) :
+#   ARCHIVE_INACTIVE_AFTER_DAYS  conversation fermée (is_active = False) sans activité depuis N jours (défaut : 30)
+#   ARCHIVE_IDLE_AFTER_DAYS      toute conversation sans activité depuis N jours (défaut : 180)
+#   ARCHIVE_BATCH_CONVERSATIONS  conversations traitées par exécution (défaut : 500)
+
+import json
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, NamedTuple, Optional
+
+from sqlalchemy import select, delete, insert, func, or_, and_, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Conversation, Message, MessageArchive
+
+try:
+    import zstandard
+except ImportError:  # dépendance optionnelle : zlib est utilisé à la place
+    zstandard = None
+
+# Nombre maximal de messages par blob d'archive
+ARCHIVE_CHUNK_MESSAGES = 1000
+
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 10
+
+class ArchivePolicy(NamedTuple):
+    """
+    Règles de sélection des conversations à archiver.
+    """
+    inactive_after_days: int
+    idle_after_days: int
+    batch_conversations: int
+
+    @classmethod
+    def from_env(cls) -> "ArchivePolicy":
+        return cls(
+            inactive_after_days=int(os.getenv("ARCHIVE_INACTIVE_AFTER_DAYS", "30")),
+            idle_after_days=int(os.getenv("ARCHIVE_IDLE_AFTER_DAYS", "180")),
+            batch_conversations=int(os.getenv("ARCHIVE_BATCH_CONVERSATIONS", "500")),
+        )
+
+# ========================================
+# SÉRIALISATION ET COMPRESSION
+# ========================================
+def compress(raw: bytes):
+    """
+    Compresse un lot sérialisé ; renvoie (codec, données compressées).
+    """
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, ZLIB_LEVEL)
+
+def decompress(codec: str, payload: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Archive compressée en zstd : le module 'zstandard' est requis pour la relire")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if codec == "zlib":
+        return zlib.decompress(payload)
+    raise ValueError(f"Codec d'archive inconnu : {codec}")
+
+def encode_messages(messages) -> bytes:
+    """
+    Sérialise des messages en JSON compact : [id, is_user, created_at, content] par message.
+    """
+    rows = [
+        [m.id, bool(m.is_user), m.created_at.isoformat() if m.created_at else None, m.content]
+        for m in messages
+    ]
+    return json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def decode_messages(raw: bytes, conversation_id: int) -> List[dict]:
+    return [
+        {
+            "id": message_id,
+            "conversation_id": conversation_id,
+            "is_user": is_user,
+            "created_at": datetime.fromisoformat(created_at) if created_at else None,
+            "content": content,
+        }
+        for message_id, is_user, created_at, content in json.loads(raw)
+    ]
+
+# ========================================
+# ARCHIVAGE
+# ========================================
+def eligible_conversations(policy: ArchivePolicy, now: datetime):
+    """
+    Requête des IDs de conversations à archiver (ayant encore des messages dans la table chaude).
+    """
+    inactive_before = now - timedelta(days=policy.inactive_after_days)
+    idle_before = now - timedelta(days=policy.idle_after_days)
+    return (
+        select(Conversation.id)
+        .where(
+            or_(
+                and_(Conversation.is_active == False, Conversation.updated_at < inactive_before),
+                Conversation.updated_at < idle_before
+            ),
+            exists().where(Message.conversation_id == Conversation.id)
+        )
+        .order_by(Conversation.updated_at)
+        .limit(policy.batch_conversations)
+    )
+
+async def archive_conversation(db: AsyncSession, conversation_id: int) -> dict:
+    """
+    Archive tous les messages chauds d'une conversation, dans la transaction courante.
+    La conversation est verrouillée : deux workers ne l'archivent pas en même temps.
+    """
+    totals = {"messages": 0, "raw_bytes": 0, "compressed_bytes": 0}
+    await db.scalar(select(Conversation.id).where(Conversation.id == conversation_id).with_for_update())
+    messages = (await db.scalars(
+        select(Message).where(Message.conversation_id == conversation_id).order_by(Message.id)
+    )).all()
+    for start in range(0, len(messages), ARCHIVE_CHUNK_MESSAGES):
+        chunk = messages[start:start + ARCHIVE_CHUNK_MESSAGES]
+        raw = encode_messages(chunk)
+        codec, payload = compress(raw)
+        db.add(MessageArchive(
+            conversation_id=conversation_id,
+            first_message_id=chunk[0].id,
+            last_message_id=chunk[-1].id,
+            message_count=len(chunk),
+            codec=codec,
+            raw_bytes=len(raw),
+            compressed_bytes=len(payload),
+            payload=payload
+        ))
+        totals["messages"] += len(chunk)
+        totals["raw_bytes"] += len(raw)
+        totals["compressed_bytes"] += len(payload)
+    if messages:
+        await db.execute(
+            delete(Message)
+            .where(Message.conversation_id == conversation_id, Message.id <= messages[-1].id)
+            .execution_options(synchronize_session=False)
+        )
+    return totals
+
+async def run_archiver(session_factory, policy: ArchivePolicy) -> dict:
+    """
+    Exécute une passe d'archivage (une transaction par conversation) et renvoie son rapport.
+    """
+    started = time.perf_counter()
+    report = {"conversations": 0, "messages": 0, "raw_bytes": 0, "compressed_bytes": 0, "errors": 0}
+    async with session_factory() as db:
+        conversation_ids = (await db.scalars(eligible_conversations(policy, datetime.now()))).all()
+    for conversation_id in conversation_ids:
+        async with session_factory() as db:
+            try:
+                totals = await archive_conversation(db, conversation_id)
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                report["errors"] += 1
+                print(f"❌ Erreur d'archivage (conversation {conversation_id}): {e}")
+                continue
+        if totals["messages"]:
+            report["conversations"] += 1
+            for key in ("messages", "raw_bytes", "compressed_bytes"):
+                report[key] += totals[key]
+    report["reclaimed_bytes"] = report["raw_bytes"] - report["compressed_bytes"]
+    report["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    report["finished_at"] = datetime.now().isoformat()
+    return report
+
+async def archive_totals(db: AsyncSession) -> dict:
+    """
+    Volume total des archives : messages, taille avant / après compression, espace récupéré.
+    """
+    row = (await db.execute(select(
+        func.count(func.distinct(MessageArchive.conversation_id)),
+        func.coalesce(func.sum(MessageArchive.message_count), 0),
+        func.coalesce(func.sum(MessageArchive.raw_bytes), 0),
+        func.coalesce(func.sum(MessageArchive.compressed_bytes), 0)
+    ))).one()
+    conversations, messages, raw_bytes, compressed_bytes = (int(value) for value in row)
+    return {
+        "conversations": conversations,
+        "messages": messages,
+        "raw_bytes": raw_bytes,
+        "compressed_bytes": compressed_bytes,
+        "reclaimed_bytes": raw_bytes - compressed_bytes,
+        "compression_ratio": round(raw_bytes / compressed_bytes, 2) if compressed_bytes else None,
+    }
+
+# ========================================
+# RÉHYDRATATION
+# ========================================
+async def has_archives(db: AsyncSession, conversation_id: int) -> bool:
+    return bool(await db.scalar(select(exists().where(MessageArchive.conversation_id == conversation_id))))
+
+async def rehydrate_conversation(
+    db: AsyncSession,
+    conversation_id: int,
+    reserve_ids: Optional[Callable[[int], Awaitable[range]]] = None
+) -> int:
+    """
+    Remet les messages archivés d'une conversation dans "messages" et supprime ses
+    archives, dans la transaction courante. Renvoie le nombre de messages remis.
+
+    Les IDs sont attribués par la base, ou pris dans un bloc obtenu par reserve_ids(n)
+    quand les IDs sont réservés à l'avance (écriture différée, voir message_writer.py).
+    Deux lectures simultanées ne réhydratent qu'une fois : les archives sont lues
+    verrouillées, et seule la transaction qui les supprime effectivement insère les messages.
+    """
+    await db.scalar(select(Conversation.id).where(Conversation.id == conversation_id).with_for_update())
+    archives = (await db.scalars(
+        select(MessageArchive)
+        .where(MessageArchive.conversation_id == conversation_id)
+        .order_by(MessageArchive.first_message_id)
+        .with_for_update()
+    )).all()
+    if not archives:
+        return 0
+    # Réservé avant toute écriture : sous SQLite, la réservation (autre session) attendrait
+    # le verrou d'écriture pris par la suppression ci-dessous
+    ids = iter(await reserve_ids(sum(archive.message_count for archive in archives))) if reserve_ids else None
+    deleted = await db.execute(
+        delete(MessageArchive)
+        .where(MessageArchive.id.in_([archive.id for archive in archives]))
+        .execution_options(synchronize_session=False)
+    )
+    if deleted.rowcount != len(archives):
+        # Archives déjà réhydratées par une requête concurrente (SQLite ignore FOR UPDATE)
+        await db.rollback()
+        return 0
+    restored = 0
+    for archive in archives:
+        rows = decode_messages(decompress(archive.codec, archive.payload), conversation_id)
+        for row in rows:
+            if ids is None:
+                del row["id"]
+            else:
+                row["id"] = next(ids)
+        if rows:
+            await db.execute(insert(Message), rows)
+            restored += len(rows)
+    return restored
@@ -0,0 +1,294 @@
+# ============================================================
+# ÉCRITURE DIFFÉRÉE DES MESSAGES DE CHAT (WRITE-BEHIND)
+# ============================================================
+# Au lieu d'une transaction (et d'un fsync) par message, les messages sont mis en file
+# dans le worker et écrits par lots : un INSERT multi-lignes + un UPDATE du résumé par
+# conversation, dans une seule transaction, toutes les CHAT_FLUSH_INTERVAL_MS ms ou dès
+# que CHAT_FLUSH_MAX_ROWS messages attendent.
+#
+# Les IDs sont attribués à la mise en file, depuis des blocs réservés dans la table
+# "id_sequences" (CHAT_ID_BLOCK_SIZE IDs par réservation) : la réponse HTTP contient
+# l'ID définitif du message avant son écriture.
+#
+# Durabilité :
+#   - un message est durable une fois son lot validé (au plus CHAT_FLUSH_INTERVAL_MS après
+#     la réponse HTTP) ; un arrêt brutal du processus perd les messages encore en file ;
+#   - à l'arrêt normal du serveur, stop() laisse la tâche de fond terminer l'écriture en
+#     cours (elle n'est pas annulée), puis écrit tout ce qui reste en file ;
+#   - si la tâche est tout de même annulée pendant une écriture, le lot en cours et les
+#     suivants sont remis en file, pour être écrits par le prochain flush() ;
+#   - un lot refusé est réessayé conversation par conversation, puis abandonné après
+#     CHAT_FLUSH_MAX_ATTEMPTS échecs (conversation supprimée, par exemple).
+# Tous les workers doivent utiliser le même mode : un INSERT auto-incrémenté d'un
+# worker sans écriture différée peut prendre un ID réservé par un autre.
+#
+# Variables d'environnement :
+#   CHAT_WRITE_BEHIND        active le mode (défaut : désactivé)
+#   CHAT_FLUSH_INTERVAL_MS   fenêtre de regroupement (défaut : 5)
+#   CHAT_FLUSH_MAX_ROWS      taille maximale d'un lot (défaut : 500)
+#   CHAT_ID_BLOCK_SIZE       IDs réservés à la fois (défaut : 1000)
+#   CHAT_MAX_PENDING         messages en file au-delà desquels enqueue() attend une écriture (défaut : 10000)
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import select, insert, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import IdSequence, Message, MessageArchive, env_bool, env_int
+
+CHAT_WRITE_BEHIND = env_bool("CHAT_WRITE_BEHIND", False)
+CHAT_FLUSH_INTERVAL_MS = env_int("CHAT_FLUSH_INTERVAL_MS", 5)
+CHAT_FLUSH_MAX_ROWS = env_int("CHAT_FLUSH_MAX_ROWS", 500)
+CHAT_ID_BLOCK_SIZE = env_int("CHAT_ID_BLOCK_SIZE", 1000)
+CHAT_MAX_PENDING = env_int("CHAT_MAX_PENDING", 10000)
+CHAT_FLUSH_MAX_ATTEMPTS = 3
+
+MESSAGE_SEQUENCE = "messages"
+
+class PendingMessage(NamedTuple):
+    """
+    Message en file : mêmes champs que MessageResponse, ID déjà attribué.
+    """
+    id: int
+    conversation_id: int
+    content: str
+    is_user: bool
+    created_at: datetime
+
+# ========================================
+# RÉSERVATION DE BLOCS D'IDS
+# ========================================
+async def reserve_message_ids(db: AsyncSession, count: int) -> range:
+    """
+    Réserve `count` IDs de messages consécutifs et valide la réservation.
+    La ligne de séquence est verrouillée : deux workers n'obtiennent jamais le même bloc.
+    Le bloc commence après le plus grand ID connu (messages chauds et archivés), ce qui
+    rattrape les messages insérés sans réservation.
+    """
+    sequence = await db.scalar(
+        select(IdSequence).where(IdSequence.name == MESSAGE_SEQUENCE).with_for_update()
+    )
+    max_hot = await db.scalar(select(func.max(Message.id))) or 0
+    max_archived = await db.scalar(select(func.max(MessageArchive.last_message_id))) or 0
+    start = max(max_hot, max_archived) + 1
+    if sequence is None:
+        db.add(IdSequence(name=MESSAGE_SEQUENCE, next_value=start + count))
+    else:
+        start = max(start, sequence.next_value)
+        await db.execute(
+            update(IdSequence)
+            .where(IdSequence.name == MESSAGE_SEQUENCE)
+            .values(next_value=start + count)
+            .execution_options(synchronize_session=False)
+        )
+    await db.commit()
+    return range(start, start + count)
+
+# ========================================
+# FILE D'ÉCRITURE DIFFÉRÉE
+# ========================================
+class MessageWriteBehind:
+    """
+    File des messages à écrire, vidée par une tâche de fond.
+
+    - enqueue(...) attribue un ID et met le message en file (aucun accès base hors réservation d'IDs).
+    - reserve_ids(n) réserve n IDs pour une écriture faite hors de la file.
+    - flush() écrit immédiatement la file (lecture de l'historique, arrêt du serveur).
+    - has_pending(conversation_id) indique si une conversation a des messages non écrits.
+    - activity_statement(conversation_id, added, last_content, at) construit l'UPDATE du
+      résumé de conversation (fourni par l'appelant : voir conversation_activity dans main.py).
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        activity_statement: Callable,
+        max_batch: int = CHAT_FLUSH_MAX_ROWS,
+        flush_interval_ms: int = CHAT_FLUSH_INTERVAL_MS,
+        id_block: int = CHAT_ID_BLOCK_SIZE,
+        max_pending: int = CHAT_MAX_PENDING
+    ):
+        self._session_factory = session_factory
+        self._activity_statement = activity_statement
+        self._max_batch = max_batch
+        self._flush_interval = flush_interval_ms / 1000
+        self._id_block = id_block
+        self._max_pending = max_pending
+        self._queue: List[PendingMessage] = []
+        self._pending_by_conversation: Dict[int, int] = {}
+        self._failures: Dict[int, int] = {}
+        self._ids = iter(())
+        self._id_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._queued = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._stats = {"enqueued": 0, "written": 0, "batches": 0, "retried": 0, "dropped": 0, "flush_ms_total": 0.0}
+
+    async def _next_id(self) -> int:
+        async with self._id_lock:
+            message_id = next(self._ids, None)
+            if message_id is None:
+                async with self._session_factory() as db:
+                    self._ids = iter(await reserve_message_ids(db, self._id_block))
+                message_id = next(self._ids)
+            return message_id
+
+    async def reserve_ids(self, count: int) -> range:
+        """
+        Réserve un bloc d'IDs pour des messages écrits hors de la file (réhydratation des archives).
+        """
+        async with self._session_factory() as db:
+            return await reserve_message_ids(db, count)
+
+    async def enqueue(self, conversation_id: int, content: str, is_user: bool) -> PendingMessage:
+        while len(self._queue) >= self._max_pending:
+            # File pleine (base lente ou indisponible) : l'appelant attend une écriture
+            await self.flush()
+        message = PendingMessage(await self._next_id(), conversation_id, content, is_user, datetime.now())
+        self._queue.append(message)
+        self._pending_by_conversation[conversation_id] = self._pending_by_conversation.get(conversation_id, 0) + 1
+        self._stats["enqueued"] += 1
+        self._queued.set()
+        if len(self._queue) >= self._max_batch:
+            self._full.set()
+        return message
+
+    def has_pending(self, conversation_id: int) -> bool:
+        return conversation_id in self._pending_by_conversation
+
+    async def _write(self, messages: List[PendingMessage]) -> None:
+        """
+        Écrit des messages et met à jour le résumé de leurs conversations, en une transaction.
+        """
+        latest: Dict[int, PendingMessage] = {}
+        added: Dict[int, int] = {}
+        for message in messages:
+            latest[message.conversation_id] = message
+            added[message.conversation_id] = added.get(message.conversation_id, 0) + 1
+        async with self._session_factory() as db:
+            try:
+                await db.execute(insert(Message), [message._asdict() for message in messages])
+                for conversation_id, last in latest.items():
+                    await db.execute(self._activity_statement(conversation_id, added[conversation_id], last.content, last.created_at))
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+    def _written(self, messages: List[PendingMessage]) -> None:
+        for message in messages:
+            remaining = self._pending_by_conversation.get(message.conversation_id, 0) - 1
+            if remaining > 0:
+                self._pending_by_conversation[message.conversation_id] = remaining
+            else:
+                self._pending_by_conversation.pop(message.conversation_id, None)
+
+    async def _write_batch(self, batch: List[PendingMessage]) -> None:
+        try:
+            await self._write(batch)
+            self._written(batch)
+            self._stats["written"] += len(batch)
+            return
+        except Exception as e:
+            print(f"❌ Erreur d'écriture d'un lot de {len(batch)} message(s), nouvel essai par conversation: {e}")
+        # Lot refusé : une conversation fautive ne doit pas bloquer les autres
+        by_conversation: Dict[int, List[PendingMessage]] = {}
+        for message in batch:
+            by_conversation.setdefault(message.conversation_id, []).append(message)
+        requeue: List[PendingMessage] = []
+        for conversation_id, messages in by_conversation.items():
+            try:
+                await self._write(messages)
+                self._failures.pop(conversation_id, None)
+                self._written(messages)
+                self._stats["written"] += len(messages)
+            except Exception as e:
+                attempts = self._failures.get(conversation_id, 0) + 1
+                if attempts >= CHAT_FLUSH_MAX_ATTEMPTS:
+                    self._failures.pop(conversation_id, None)
+                    self._written(messages)
+                    self._stats["dropped"] += len(messages)
+                    print(f"❌ {len(messages)} message(s) abandonné(s) (conversation {conversation_id}): {e}")
+                else:
+                    self._failures[conversation_id] = attempts
+                    self._stats["retried"] += len(messages)
+                    requeue.extend(messages)
+        if requeue:
+            # Remis en tête de file, avec les mêmes IDs
+            self._queue[:0] = requeue
+            self._queued.set()
+
+    async def flush(self) -> int:
+        """
+        Écrit tous les messages en file ; renvoie le nombre de messages traités.
+        """
+        async with self._flush_lock:
+            pending, self._queue = self._queue, []
+            self._full.clear()
+            started = time.perf_counter()
+            for start in range(0, len(pending), self._max_batch):
+                try:
+                    await self._write_batch(pending[start:start + self._max_batch])
+                except asyncio.CancelledError:
+                    # Annulé pendant l'écriture : le lot en cours et les suivants restent en file
+                    self._queue[:0] = pending[start:]
+                    raise
+                self._stats["batches"] += 1
+            if pending:
+                self._stats["flush_ms_total"] += (time.perf_counter() - started) * 1000
+            return len(pending)
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            await self._queued.wait()
+            # Fenêtre de regroupement, écourtée si un lot complet attend (ou à l'arrêt)
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self._flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._queued.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"❌ Erreur de l'écriture différée des messages: {e}")
+                if not self._stopping:
+                    await asyncio.sleep(self._flush_interval)
+                self._queued.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Arrête la tâche de fond puis écrit les messages restants (arrêt normal du serveur).
+        La tâche n'est pas annulée : elle termine son écriture en cours, puis s'arrête.
+        """
+        if self._task is not None:
+            self._stopping = True
+            self._queued.set()
+            self._full.set()
+            await self._task
+            self._task = None
+        for _ in range(CHAT_FLUSH_MAX_ATTEMPTS + 1):
+            if not self._queue:
+                break
+            await self.flush()
+        if self._queue:
+            print(f"❌ {len(self._queue)} message(s) non écrit(s) à l'arrêt du serveur")
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["flush_ms_total"] = round(stats["flush_ms_total"], 2)
+        stats["avg_batch_rows"] = round(stats["written"] / stats["batches"], 2) if stats["batches"] else None
+        stats["pending"] = len(self._queue)
+        stats["pending_conversations"] = len(self._pending_by_conversation)
+        stats["flush_interval_ms"] = self._flush_interval * 1000
+        stats["max_batch"] = self._max_batch
+        return stats
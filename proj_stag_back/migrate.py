@@ -0,0 +1,141 @@
+# ============================================================
+# COMMANDE : MIGRATIONS DU SCHÉMA DE LA BASE DE DONNÉES
+# ============================================================
+# Applique, dans l'ordre, les migrations du dossier "migrations/" qui ne l'ont pas
+# encore été. Les révisions appliquées sont enregistrées dans la table "schema_migrations".
+# À lancer une fois avant de démarrer les workers (l'API ne crée plus les tables à l'import).
+#
+# Utilisation :
+#   python migrate.py              applique les migrations en attente (équivaut à "upgrade")
+#   python migrate.py current      affiche la révision courante de la base
+#   python migrate.py history      liste les migrations et leur état
+#
+# Chaque fichier de migration définit :
+#   revision     identifiant ordonné ("0001", "0002"...)
+#   description  résumé du changement
+#   upgrade(connection)  applique le changement (doit pouvoir être rejoué sans erreur)
+
+import importlib.util
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import Table, Column, String, DateTime, MetaData, inspect, select, text
+
+from models import engine
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+# Verrou applicatif MySQL : deux déploiements simultanés n'appliquent pas les migrations en même temps
+MIGRATION_LOCK_NAME = "gest_app_schema_migrations"
+MIGRATION_LOCK_TIMEOUT_SECONDS = 60
+
+migrations_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migrations_metadata,
+    Column("revision", String(32), primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# ========================================
+# OUTILS POUR LES FICHIERS DE MIGRATION
+# ========================================
+def table_exists(connection, table_name: str) -> bool:
+    return inspect(connection).has_table(table_name)
+
+def create_index_if_missing(connection, index) -> bool:
+    """
+    Crée un index SQLAlchemy s'il n'existe pas déjà sur sa table. Renvoie True s'il a été créé.
+    """
+    existing = {ix["name"] for ix in inspect(connection).get_indexes(index.table.name)}
+    if index.name in existing:
+        return False
+    index.create(bind=connection)
+    return True
+
+# ========================================
+# DÉCOUVERTE ET APPLICATION DES MIGRATIONS
+# ========================================
+def load_migrations():
+    """
+    Charge les fichiers de migrations/, triés par révision.
+    """
+    migrations = []
+    for path in sorted(MIGRATIONS_DIR.glob("[0-9]*.py")):
+        spec = importlib.util.spec_from_file_location(f"migrations.m{path.stem}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        migrations.append(module)
+    revisions = [m.revision for m in migrations]
+    if len(set(revisions)) != len(revisions):
+        raise RuntimeError(f"Révisions de migration en double : {revisions}")
+    return sorted(migrations, key=lambda m: m.revision)
+
+def applied_revisions(connection) -> set:
+    if not table_exists(connection, schema_migrations.name):
+        return set()
+    return set(connection.execute(select(schema_migrations.c.revision)).scalars())
+
+def upgrade() -> int:
+    """
+    Applique les migrations en attente, chacune dans sa propre transaction. Renvoie leur nombre.
+    """
+    migrations = load_migrations()
+    applied_count = 0
+    with engine.connect() as lock_connection:
+        use_lock = engine.dialect.name == "mysql"
+        if use_lock:
+            got_lock = lock_connection.execute(
+                text("SELECT GET_LOCK(:name, :timeout)"),
+                {"name": MIGRATION_LOCK_NAME, "timeout": MIGRATION_LOCK_TIMEOUT_SECONDS}
+            ).scalar()
+            if got_lock != 1:
+                raise RuntimeError("Une autre migration est en cours (verrou non obtenu)")
+        try:
+            with engine.begin() as connection:
+                migrations_metadata.create_all(bind=connection)
+                done = applied_revisions(connection)
+            for migration in migrations:
+                if migration.revision in done:
+                    continue
+                print(f"→ {migration.revision} : {migration.description}")
+                with engine.begin() as connection:
+                    migration.upgrade(connection)
+                    connection.execute(schema_migrations.insert().values(
+                        revision=migration.revision,
+                        description=migration.description,
+                        applied_at=datetime.now()
+                    ))
+                applied_count += 1
+        finally:
+            if use_lock:
+                lock_connection.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": MIGRATION_LOCK_NAME})
+    return applied_count
+
+def current_revision():
+    with engine.connect() as connection:
+        done = applied_revisions(connection)
+    return max(done) if done else None
+
+def history() -> None:
+    with engine.connect() as connection:
+        done = applied_revisions(connection)
+    for migration in load_migrations():
+        state = "appliquée" if migration.revision in done else "en attente"
+        print(f"{migration.revision}  [{state}]  {migration.description}")
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "upgrade":
+        count = upgrade()
+        print(f"✅ {count} migration(s) appliquée(s) - révision courante : {current_revision()}")
+    elif command == "current":
+        print(current_revision() or "aucune migration appliquée")
+    elif command == "history":
+        history()
+    else:
+        print(f"Commande inconnue : {command}. Valeurs acceptées : upgrade, current, history")
+        sys.exit(1)
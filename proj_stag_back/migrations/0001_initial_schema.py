@@ -0,0 +1,16 @@
+# ============================================================
+# MIGRATION 0001 : SCHÉMA INITIAL
+# ============================================================
+# Tables de l'application telles que créées auparavant par create_all au démarrage.
+# Sur une base existante, les tables déjà présentes sont laissées telles quelles.
+
+from models import User, Admin, vehicles, Favorite, Booking, Conversation, Message
+
+revision = "0001"
+description = "Schéma initial (users, admins, cars, favorites, bookings, conversations, messages)"
+
+TABLES = [User, Admin, vehicles, Favorite, Booking, Conversation, Message]
+
+def upgrade(connection):
+    for model in TABLES:
+        model.__table__.create(bind=connection, checkfirst=True)
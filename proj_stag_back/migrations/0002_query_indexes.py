@@ -0,0 +1,18 @@
+# ============================================================
+# MIGRATION 0002 : INDEX COMPOSITES DES LISTES ET DES RÉSERVATIONS
+# ============================================================
+# Index de GET /vehicles (filtres + pagination par curseur), de la liste admin des
+# réservations et de la détection de chevauchement. create_all ne les ajoute pas
+# aux tables déjà existantes : ils sont créés ici s'ils manquent.
+
+from migrate import create_index_if_missing
+from models import vehicles, Booking
+
+revision = "0002"
+description = "Index composites de cars et bookings"
+
+def upgrade(connection):
+    for model in (vehicles, Booking):
+        for index in model.__table__.indexes:
+            if index.name and index.name.startswith("ix_") and len(index.columns) > 1:
+                create_index_if_missing(connection, index)
@@ -0,0 +1,40 @@
+# ============================================================
+# MIGRATION 0003 : RÉSUMÉ DES CONVERSATIONS
+# ============================================================
+# Ajoute à "conversations" le nombre de messages, l'aperçu et la date du dernier message,
+# les calcule pour les conversations existantes, et crée l'index de la liste paginée.
+
+from sqlalchemy import inspect, select, func, update, text
+
+from migrate import create_index_if_missing
+from models import Conversation, Message
+
+revision = "0003"
+description = "Résumé dénormalisé des conversations (message_count, last_message_preview, last_message_at)"
+
+NEW_COLUMNS = [
+    ("message_count", "INTEGER NOT NULL DEFAULT 0"),
+    ("last_message_preview", "VARCHAR(200)"),
+    ("last_message_at", "DATETIME"),
+]
+
+def upgrade(connection):
+    existing = {column["name"] for column in inspect(connection).get_columns("conversations")}
+    for name, definition in NEW_COLUMNS:
+        if name not in existing:
+            connection.execute(text(f"ALTER TABLE conversations ADD COLUMN {name} {definition}"))
+    # Calcul initial à partir des messages existants
+    of_conversation = Message.conversation_id == Conversation.id
+    connection.execute(update(Conversation).values(
+        message_count=select(func.count()).where(of_conversation).scalar_subquery(),
+        last_message_at=select(func.max(Message.created_at)).where(of_conversation).scalar_subquery(),
+        last_message_preview=(
+            select(func.substr(Message.content, 1, 200))
+            .where(of_conversation)
+            .order_by(Message.id.desc())
+            .limit(1)
+            .scalar_subquery()
+        ),
+    ))
+    for index in Conversation.__table__.indexes:
+        create_index_if_missing(connection, index)
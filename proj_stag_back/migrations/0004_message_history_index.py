@@ -0,0 +1,14 @@
+# ============================================================
+# MIGRATION 0004 : INDEX DE L'HISTORIQUE DES MESSAGES
+# ============================================================
+# Index (conversation_id, created_at, id) parcouru par GET /conversations/{id}/messages.
+
+from migrate import create_index_if_missing
+from models import Message
+
+revision = "0004"
+description = "Index composite de l'historique paginé des messages"
+
+def upgrade(connection):
+    for index in Message.__table__.indexes:
+        create_index_if_missing(connection, index)
@@ -0,0 +1,12 @@
+# ============================================================
+# MIGRATION 0005 : ARCHIVES COMPRESSÉES DES MESSAGES
+# ============================================================
+# Table "message_archives" alimentée par l'archivage des conversations inactives ou anciennes.
+
+from models import MessageArchive
+
+revision = "0005"
+description = "Table message_archives (messages archivés compressés)"
+
+def upgrade(connection):
+    MessageArchive.__table__.create(bind=connection, checkfirst=True)
@@ -0,0 +1,19 @@
+# ============================================================
+# MIGRATION 0006 : SÉQUENCES D'IDENTIFIANTS RÉSERVÉS
+# ============================================================
+# Table "id_sequences" utilisée par l'écriture différée des messages pour réserver
+# des blocs d'IDs ; la séquence "messages" démarre après le plus grand ID existant.
+
+from sqlalchemy import select, func
+
+from models import IdSequence, Message
+
+revision = "0006"
+description = "Table id_sequences (réservation de blocs d'IDs de messages)"
+
+def upgrade(connection):
+    IdSequence.__table__.create(bind=connection, checkfirst=True)
+    exists = connection.execute(select(IdSequence.name).where(IdSequence.name == "messages")).first()
+    if exists is None:
+        max_id = connection.execute(select(func.max(Message.id))).scalar() or 0
+        connection.execute(IdSequence.__table__.insert().values(name="messages", next_value=max_id + 1))
@@ -0,0 +1,29 @@
+# ============================================================
+# MIGRATION 0007 : COLONNES DE TRI DU CATALOGUE NON NULLES
+# ============================================================
+# "year" et "rating" deviennent NOT NULL (0 = inconnu) : GET /vehicles trie et pagine
+# sur la colonne brute, ce qui permet à MySQL d'utiliser les index (year, id) et
+# (rating, id) au lieu de trier toute la table sur COALESCE(...).
+# SQLite ne sait pas modifier une colonne : les valeurs NULL y sont seulement remplacées,
+# l'application n'en écrit plus.
+
+from sqlalchemy import update, text
+
+from migrate import create_index_if_missing
+from models import vehicles
+
+revision = "0007"
+description = "cars.year et cars.rating NOT NULL, index (rating, id)"
+
+def upgrade(connection):
+    connection.execute(update(vehicles).where(vehicles.year.is_(None)).values(year=0))
+    connection.execute(update(vehicles).where(vehicles.rating.is_(None)).values(rating=0))
+    if connection.dialect.name == "mysql":
+        connection.execute(text(
+            "ALTER TABLE cars"
+            " MODIFY COLUMN year INT NOT NULL DEFAULT 0,"
+            " MODIFY COLUMN rating DECIMAL(3,1) NOT NULL DEFAULT 0.0"
+        ))
+    for index in vehicles.__table__.indexes:
+        if index.name in ("ix_cars_year_id", "ix_cars_rating_id"):
+            create_index_if_missing(connection, index)
@@ -0,0 +1,16 @@
+# ============================================================
+# MIGRATION 0008 : INDEX DU TRI PAR NOM DU CATALOGUE
+# ============================================================
+# Index (name, id) parcouru par GET /vehicles?sort_by=name : la pagination par curseur
+# sur le nom est servie par l'index au lieu de trier toute la table.
+
+from migrate import create_index_if_missing
+from models import vehicles
+
+revision = "0008"
+description = "Index (name, id) de cars"
+
+def upgrade(connection):
+    for index in vehicles.__table__.indexes:
+        if index.name == "ix_cars_name_id":
+            create_index_if_missing(connection, index)
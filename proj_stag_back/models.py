@@ -2,20 +2,182 @@
 # MODÈLES DE BASE DE DONNÉES - APPLICATION DE GESTION DE VÉHICULES
 # ============================================================
 
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, Float, ForeignKey, TIMESTAMP, DateTime, Text, Date, DECIMAL
+from sqlalchemy import create_engine, event, Column, Integer, String, Boolean, Float, ForeignKey, TIMESTAMP, DateTime, Text, Date, DECIMAL, Index, LargeBinary
 from sqlalchemy.orm import sessionmaker, declarative_base, relationship
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, StaticPool
 from datetime import datetime
+import os
+import threading
+import time
 
 # ============================================================
 # CONFIGURATION DE LA CONNEXION À LA BASE DE DONNÉES
 # ============================================================
+# Tous les réglages sont lus dans les variables d'environnement :
+#   DATABASE_URL             URL asynchrone (défaut : MySQL local)
+#   DB_ECHO                  journalise chaque requête SQL (défaut : 0, à réserver au débogage)
+#   DB_POOL_SIZE             connexions gardées ouvertes par worker (défaut : 10)
+#   DB_MAX_OVERFLOW          connexions supplémentaires en pic (défaut : 20)
+#   DB_POOL_TIMEOUT          attente maximale d'une connexion libre, en secondes (défaut : 30)
+#   DB_POOL_RECYCLE          durée de vie d'une connexion, en secondes (défaut : 1800,
+#                            inférieur au wait_timeout de MySQL)
+#   DB_POOL_PRE_PING         vérifie la connexion avant usage (défaut : 1)
+#   DB_STATEMENT_TIMEOUT_MS  durée maximale d'une requête de lecture (défaut : 0 = illimitée)
+#
+# Profil SQLite (une seule machine, sans MySQL, pour le développement et les tests de charge) :
+#   DATABASE_URL="sqlite+aiosqlite:///./gest_app1.db"
+# La base est alors ouverte en mode WAL : les lectures ne bloquent plus l'écriture en cours.
 
-URL_DATABASE = "mysql+pymysql://root:@localhost:3306/gest_app1"
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
 
-engine = create_engine(URL_DATABASE, echo=True)
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+# URL asynchrone utilisée par l'API :
+#   - production : "mysql+aiomysql://root:@localhost:3306/gest_app1"
+#   - local / tests : "sqlite+aiosqlite:///./gest_app1.db"
+ASYNC_URL_DATABASE = os.getenv("DATABASE_URL", "mysql+aiomysql://root:@localhost:3306/gest_app1")
+
+# URL synchrone équivalente (même base, pilote bloquant) pour la création des tables et les scripts
+URL_DATABASE = ASYNC_URL_DATABASE.replace("+aiomysql", "+pymysql").replace("+aiosqlite", "")
+
+DB_ECHO = env_bool("DB_ECHO", False)
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 10)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 20)
+DB_POOL_TIMEOUT = env_int("DB_POOL_TIMEOUT", 30)
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", True)
+DB_STATEMENT_TIMEOUT_MS = env_int("DB_STATEMENT_TIMEOUT_MS", 0)
+
+IS_SQLITE = URL_DATABASE.startswith("sqlite")
+IS_SQLITE_MEMORY = IS_SQLITE and (":memory:" in URL_DATABASE or URL_DATABASE.rstrip("/") == "sqlite:")
+
+# ============================================================
+# MESURE DE L'ATTENTE DES CONNEXIONS DU POOL
+# ============================================================
+
+class PoolMetrics:
+    """
+    Temps passé à obtenir une connexion du pool (attente d'une connexion libre,
+    ou ouverture d'une nouvelle connexion). Une attente moyenne qui grimpe indique
+    un pool trop petit pour la charge du worker.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def record(self, wait: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += wait
+            if wait > self.max_wait:
+                self.max_wait = wait
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+pool_metrics = PoolMetrics()
+
+def measured_pool(pool_class):
+    """
+    Sous-classe d'un pool SQLAlchemy qui chronomètre chaque obtention de connexion.
+    """
+    class MeasuredPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except Exception:
+                pool_metrics.record(time.perf_counter() - start, timed_out=True)
+                raise
+            pool_metrics.record(time.perf_counter() - start)
+            return connection
+
+    MeasuredPool.__name__ = f"Measured{pool_class.__name__}"
+    return MeasuredPool
+
+def engine_options(async_mode: bool) -> dict:
+    """
+    Options communes aux moteurs synchrone et asynchrone, selon le backend.
+    """
+    if IS_SQLITE_MEMORY:
+        # Base en mémoire : une seule connexion partagée, sinon chaque connexion verrait une base vide
+        return {"echo": DB_ECHO, "poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    options = {
+        "echo": DB_ECHO,
+        "poolclass": measured_pool(AsyncAdaptedQueuePool if async_mode else QueuePool),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if IS_SQLITE:
+        options["connect_args"] = {"check_same_thread": False}
+    return options
+
+def configure_connection(dbapi_connection, connection_record):
+    """
+    Réglages appliqués à chaque nouvelle connexion physique.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        if IS_SQLITE:
+            # WAL : lecteurs et écrivain concurrents ; busy_timeout : attente du verrou d'écriture
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute("PRAGMA foreign_keys=ON")
+            cursor.execute(f"PRAGMA busy_timeout={DB_POOL_TIMEOUT * 1000}")
+        elif DB_STATEMENT_TIMEOUT_MS > 0:
+            # MySQL : interrompt les SELECT qui dépassent la durée maximale
+            cursor.execute(f"SET SESSION max_execution_time = {DB_STATEMENT_TIMEOUT_MS}")
+    finally:
+        cursor.close()
+
+engine = create_engine(URL_DATABASE, **engine_options(async_mode=False))
+event.listen(engine, "connect", configure_connection)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Moteur et sessions asynchrones utilisés par toutes les routes de l'API.
+# expire_on_commit=False : les objets restent lisibles après commit sans nouvel aller-retour
+# (le chargement implicite n'est pas possible en mode asynchrone).
+async_engine = create_async_engine(ASYNC_URL_DATABASE, **engine_options(async_mode=True))
+event.listen(async_engine.sync_engine, "connect", configure_connection)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+def pool_stats() -> dict:
+    """
+    État du pool asynchrone de ce worker et mesures d'attente des connexions.
+    """
+    return {
+        "backend": async_engine.dialect.name,
+        "pool": async_engine.pool.status(),
+        "pool_size": None if IS_SQLITE_MEMORY else DB_POOL_SIZE,
+        "max_overflow": None if IS_SQLITE_MEMORY else DB_MAX_OVERFLOW,
+        **pool_metrics.stats(),
+    }
+
 Base = declarative_base()
 
 # ============================================================
@@ -102,12 +264,12 @@ class vehicles(Base):
     transmission = Column(String(50))
     seats = Column(Integer)
     engine = Column(String(50))
-    year = Column(Integer)
+    year = Column(Integer, nullable=False, default=0, server_default="0")  # 0 : année inconnue
     fuel = Column(String(50))
     isAvailable = Column(Boolean, default=True)
     isNew = Column(Boolean, default=False)
     isBestChoice = Column(Boolean, default=False)
-    rating = Column(DECIMAL(3,1), default=0.0)
+    rating = Column(DECIMAL(3,1), nullable=False, default=0.0, server_default="0")
     popularity = Column(String(50), default='')
     luggage = Column(String(20), default='')
     airConditioning = Column(Boolean, default=True)
@@ -116,6 +278,21 @@ class vehicles(Base):
     favorites = relationship("Favorite", back_populates="car")
     bookings = relationship("Booking", back_populates="car", foreign_keys="Booking.car_id")
 
+    # Index composites utilisés par les filtres et la pagination de GET /vehicles.
+    # Chaque index se termine par "id" pour que la pagination par curseur
+    # (valeur de tri, id) soit servie directement par l'index, sans tri en mémoire.
+    __table_args__ = (
+        Index("ix_cars_category_price_id", "category", "price", "id"),
+        Index("ix_cars_available_price_id", "isAvailable", "price", "id"),
+        Index("ix_cars_fuel_transmission_price", "fuel", "transmission", "price"),
+        Index("ix_cars_seats_price", "seats", "price"),
+        Index("ix_cars_year_id", "year", "id"),
+        Index("ix_cars_rating_id", "rating", "id"),
+        Index("ix_cars_price_id", "price", "id"),
+        Index("ix_cars_name_id", "name", "id"),
+        Index("ix_cars_flags_price", "isNew", "isBestChoice", "price"),
+    )
+
 # ============================================================
 # MODÈLE FAVORI (TABLE "favorites")
 # ============================================================
@@ -135,6 +312,12 @@ class Favorite(Base):
 # MODÈLE RÉSERVATION (TABLE "bookings")
 # ============================================================
 
+# Statuts possibles d'une réservation
+BOOKING_STATUSES = ["En attente", "Confirmée", "Annulée", "Terminée"]
+
+# Statuts pour lesquels une réservation occupe la voiture sur sa période
+ACTIVE_BOOKING_STATUSES = ["En attente", "Confirmée"]
+
 class Booking(Base):
     __tablename__ = 'bookings'
     
@@ -151,6 +334,16 @@ class Booking(Base):
     car = relationship("vehicles", back_populates="bookings", foreign_keys=[car_id])
     user = relationship("User", back_populates="bookings", foreign_keys=[user_id])
 
+    # Index composites pour la liste admin (filtres, tri et pagination par curseur)
+    # et pour la recherche des réservations d'une voiture par dates.
+    __table_args__ = (
+        Index("ix_bookings_created_id", "created_at", "id"),
+        Index("ix_bookings_status_created_id", "status", "created_at", "id"),
+        Index("ix_bookings_pickup_id", "pickup_date", "id"),
+        Index("ix_bookings_car_dates", "car_id", "pickup_date", "return_date"),
+        Index("ix_bookings_user_created", "user_id", "created_at"),
+    )
+
 # ============================================================
 # MODÈLES POUR LES CONVERSATIONS (SYSTÈME DE CHAT)
 # ============================================================
@@ -164,10 +357,22 @@ class Conversation(Base):
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
     is_active = Column(Boolean, default=True)
+    # Résumé dénormalisé, mis à jour à chaque ajout de messages : la liste des
+    # conversations s'affiche sans lire la table "messages"
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_message_preview = Column(String(200), nullable=True)
+    last_message_at = Column(DateTime, nullable=True)
     
     user = relationship("User", back_populates="conversations")
+    # Relation utilisée seulement pour la suppression en cascade : l'historique se lit
+    # page par page (GET /conversations/{id}/messages), jamais en entier
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan", order_by="Message.created_at")
 
+    # Index de la liste des conversations d'un utilisateur (tri et pagination par curseur)
+    __table_args__ = (
+        Index("ix_conversations_user_updated_id", "user_id", "updated_at", "id"),
+    )
+
 class Message(Base):
     __tablename__ = "messages"
     
@@ -179,8 +384,49 @@ class Message(Base):
     
     conversation = relationship("Conversation", back_populates="messages")
 
+    # Index de l'historique paginé d'une conversation (GET /conversations/{id}/messages)
+    __table_args__ = (
+        Index("ix_messages_conversation_created_id", "conversation_id", "created_at", "id"),
+    )
+
 # ============================================================
-# CRÉATION DES TABLES DANS LA BASE DE DONNÉES
+# SÉQUENCES D'IDENTIFIANTS RÉSERVÉS (TABLE "id_sequences")
+# ============================================================
+# Prochain identifiant libre par table, pour réserver des blocs d'IDs à l'avance
+# (écriture différée des messages : l'ID est connu avant l'insertion).
+
+class IdSequence(Base):
+    __tablename__ = "id_sequences"
+
+    name = Column(String(50), primary_key=True)
+    next_value = Column(Integer, nullable=False)
+
+# ============================================================
+# ARCHIVES COMPRESSÉES DES MESSAGES (TABLE "message_archives")
 # ============================================================
+# Les messages des conversations inactives ou anciennes sont déplacés ici par lots,
+# sérialisés puis compressés (un blob par lot), et remis dans "messages" à la relecture.
+
+class MessageArchive(Base):
+    __tablename__ = "message_archives"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False)
+    first_message_id = Column(Integer, nullable=False)
+    last_message_id = Column(Integer, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    codec = Column(String(10), nullable=False)           # "zlib" ou "zstd"
+    raw_bytes = Column(Integer, nullable=False)          # taille avant compression
+    compressed_bytes = Column(Integer, nullable=False)
+    payload = Column(LargeBinary(length=2**32 - 1), nullable=False)  # LONGBLOB sous MySQL
+    archived_at = Column(DateTime, default=datetime.now)
+
+    __table_args__ = (
+        Index("ix_message_archives_conversation_last", "conversation_id", "last_message_id"),
+    )
 
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+# ============================================================
+# CRÉATION DES TABLES DANS LA BASE DE DONNÉES
+# ============================================================
+# L'import de ce module n'ouvre aucune connexion : le schéma est créé et mis à jour
+# par les migrations, avant le démarrage des workers (python migrate.py).
\ No newline at end of file
@@ -0,0 +1,16 @@
+# ============================================================
+# COMMANDE : RÉCONCILIATION DE LA DISPONIBILITÉ DES VOITURES
+# ============================================================
+# Recalcule le champ "isAvailable" de toutes les voitures à partir des réservations
+# actives du jour. Prévu pour une tâche planifiée (cron) quand la tâche de fond
+# du serveur est désactivée (AVAILABILITY_RECONCILER_ENABLED = False).
+#
+# Utilisation : python reconcile_availability.py
+
+import asyncio
+
+from main import run_availability_reconciler
+
+if __name__ == "__main__":
+    stats = asyncio.run(run_availability_reconciler())
+    print(f"Durée : {stats['last_duration_ms']} ms - voitures modifiées : {stats['last_rows_changed']}")
@@ -0,0 +1,151 @@
+# ============================================================
+# CONFIGURATION DES TESTS
+# ============================================================
+# Les tests appellent l'application ASGI directement (httpx, sans serveur) sur une base
+# SQLite temporaire, recréée pour chaque test. Pour les lancer sur MySQL (verrous de
+# lignes réels), fournir une base dédiée : TEST_DATABASE_URL="mysql+aiomysql://..."
+# (toutes ses tables sont supprimées et recréées).
+#
+# Utilisation (depuis proj_stag_back/) : python -m pytest -q tests
+
+import asyncio
+import os
+import sys
+import tempfile
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEST_DB_DIR = tempfile.mkdtemp(prefix="gest_app_tests_")
+
+# Avant l'import de models : le moteur est créé à l'import
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL", f"sqlite+aiosqlite:///{TEST_DB_DIR}/test.db")
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+from sqlalchemy import event
+
+import main
+from models import Base, User, vehicles, Conversation, Message, async_engine, AsyncSessionLocal
+
+# Hash bcrypt calculé une fois (chaque hachage coûte ~250 ms de CPU)
+TEST_PASSWORD = "motdepasse123"
+TEST_PASSWORD_HASH = main.hash_password(TEST_PASSWORD)
+
+# ========================================
+# BASE ET CACHES
+# ========================================
+def reset_caches() -> None:
+    """
+    Vide les caches en mémoire du worker (ils survivraient d'un test à l'autre).
+    """
+    for cache in (main.principal_cache, main.favorites_cache, main.user_data_versions,
+                  main.assistant_static_replies, main.assistant_message_replies,
+                  main.assistant_catalog_replies, main.assistant_user_replies, main.srcset_cache):
+        cache.clear()
+    main.catalog_snapshot.bump()
+    main.catalog_rollup.invalidate()
+    main.availability_index.rebuild([])
+
+async def reset_database() -> None:
+    async with async_engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+    reset_caches()
+
+def run(scenario):
+    """
+    Exécute un scénario asynchrone sur une base neuve, puis ferme les connexions du pool
+    (chaque test a sa propre boucle d'événements).
+    """
+    async def wrapper():
+        try:
+            await reset_database()
+            return await scenario()
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(wrapper())
+
+@asynccontextmanager
+async def api_client():
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+# ========================================
+# DONNÉES DE TEST
+# ========================================
+async def create_user(email: str = "client@test.fr", role: str = "user", username: str = None) -> User:
+    async with AsyncSessionLocal() as db:
+        user = User(username=username or email.split("@")[0], email=email, hashed_password=TEST_PASSWORD_HASH, role=role)
+        db.add(user)
+        await db.commit()
+        return user
+
+def auth_headers(user: User) -> dict:
+    token = main.create_access_token({"sub": user.email, "role": user.role, "uid": user.id})
+    return {"Authorization": f"Bearer {token}"}
+
+async def create_cars(count: int, **overrides) -> list:
+    async with AsyncSessionLocal() as db:
+        cars = []
+        for i in range(count):
+            values = {
+                "name": f"Voiture {i}",
+                "category": ("SUV", "Citadine", "Berline")[i % 3],
+                "price": 40 + i,
+                "image": f"https://cdn.test/car{i}.jpg",
+                "transmission": "Automatique",
+                "seats": 5,
+                "engine": "1.5",
+                "year": 2020 + i % 5,
+                "fuel": "Essence",
+                "rating": 4.0,
+            }
+            values.update(overrides)
+            cars.append(vehicles(**values))
+        db.add_all(cars)
+        await db.commit()
+        return cars
+
+async def create_conversation(user: User, messages: int = 0, updated_at: datetime = None) -> Conversation:
+    async with AsyncSessionLocal() as db:
+        conversation = Conversation(user_id=user.id, title="Test")
+        if updated_at is not None:
+            conversation.created_at = conversation.updated_at = updated_at
+        db.add(conversation)
+        await db.flush()
+        for i in range(messages):
+            db.add(Message(conversation_id=conversation.id, content=f"message {i}", is_user=i % 2 == 0,
+                           created_at=updated_at or datetime.now()))
+        conversation.message_count = messages
+        await db.commit()
+        return conversation
+
+# ========================================
+# COMPTAGE DES REQUÊTES SQL
+# ========================================
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+@contextmanager
+def count_queries():
+    """
+    Compte les requêtes SQL envoyées à la base pendant le bloc (hors BEGIN / COMMIT).
+    """
+    counter = QueryCounter()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith("PRAGMA"):
+            counter.statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
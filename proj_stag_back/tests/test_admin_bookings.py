@@ -0,0 +1,188 @@
+# ============================================================
+# TESTS : LISTE ADMIN DES RÉSERVATIONS
+# ============================================================
+
+import csv
+import gzip
+import io
+import json
+from datetime import date, timedelta
+
+from conftest import run, api_client, create_user, create_cars, auth_headers
+from models import Booking, AsyncSessionLocal
+import main
+
+def test_admin_bookings_paginated_by_default():
+    async def scenario():
+        admin = await create_user("admin@test.fr", role="admin")
+        user = await create_user()
+        [car] = await create_cars(1)
+        start = date.today() + timedelta(days=30)
+        total = main.BOOKINGS_DEFAULT_PAGE_SIZE * 2 + 7
+        async with AsyncSessionLocal() as db:
+            db.add_all(
+                Booking(user_id=user.id, car_id=car.id, full_name=f"Client {i}", total_price=100.0,
+                        pickup_date=start + timedelta(days=3 * i), return_date=start + timedelta(days=3 * i + 1))
+                for i in range(total)
+            )
+            await db.commit()
+        seen = []
+        async with api_client() as client:
+            response = await client.get("/admin/bookings", headers=auth_headers(admin))
+            assert response.status_code == 200
+            assert len(response.json()) == main.BOOKINGS_DEFAULT_PAGE_SIZE
+            while True:
+                seen.extend(b["id"] for b in response.json())
+                cursor = response.headers.get("X-Next-Cursor")
+                if cursor is None:
+                    break
+                response = await client.get("/admin/bookings", params={"cursor": cursor}, headers=auth_headers(admin))
+                assert response.status_code == 200
+            too_large = await client.get("/admin/bookings", params={"limit": main.BOOKINGS_MAX_PAGE_SIZE + 1},
+                                         headers=auth_headers(admin))
+        assert sorted(seen) == sorted(set(seen)) and len(seen) == total
+        assert too_large.status_code == 422
+
+    run(scenario)
+
+# ========================================
+# EXPORT EN FLUX
+# ========================================
+async def seed_bookings() -> tuple:
+    """
+    Deux clients, trois voitures et 20 réservations de statuts et de périodes variés.
+    """
+    admin = await create_user("admin@test.fr", role="admin")
+    users = [await create_user("client@test.fr"), await create_user("martin@test.fr", username="martin")]
+    cars = await create_cars(3)
+    start = date.today() + timedelta(days=5)
+    async with AsyncSessionLocal() as db:
+        db.add_all(
+            Booking(user_id=users[i % 2].id, car_id=cars[i % 3].id, full_name=f"Client {i}",
+                    total_price=100.0 + i, status=main.BOOKING_STATUSES[i % 4],
+                    pickup_date=start + timedelta(days=2 * i), return_date=start + timedelta(days=2 * i + 1))
+            for i in range(20)
+        )
+        await db.commit()
+    return admin, users, cars, start
+
+async def list_view(client, admin, filters: dict) -> list:
+    """
+    Toutes les pages de GET /admin/bookings pour ces filtres, triées par id.
+    """
+    params = {**filters, "sort_by": "id", "order": "asc", "limit": main.BOOKINGS_MAX_PAGE_SIZE}
+    rows = []
+    while True:
+        response = await client.get("/admin/bookings", params=params, headers=auth_headers(admin))
+        assert response.status_code == 200, response.text
+        rows.extend(response.json())
+        params["cursor"] = response.headers.get("X-Next-Cursor")
+        if params["cursor"] is None:
+            return rows
+
+async def raw_export(client, admin, params: dict, accept_encoding: str):
+    """
+    Réponse de l'export et son corps tel qu'envoyé (sans décompression par httpx).
+    """
+    headers = {**auth_headers(admin), "Accept-Encoding": accept_encoding}
+    async with client.stream("GET", "/admin/bookings/export", params=params, headers=headers) as response:
+        body = b"".join([chunk async for chunk in response.aiter_raw()])
+    return response, body
+
+def test_export_ndjson_gzip_matches_list_view(monkeypatch):
+    # Lots de 3 lignes : plusieurs morceaux compressés dans le même flux gzip
+    monkeypatch.setattr(main, "EXPORT_BATCH_SIZE", 3)
+
+    async def scenario():
+        admin, users, cars, start = await seed_bookings()
+        filter_sets = [
+            {},
+            {"status": "Confirmée"},
+            {"car_id": cars[1].id, "user_email": users[1].email},
+            {"date_from": (start + timedelta(days=10)).isoformat(), "date_to": (start + timedelta(days=20)).isoformat()},
+            {"q": "martin"},
+        ]
+        async with api_client() as client:
+            for filters in filter_sets:
+                expected = await list_view(client, admin, filters)
+                assert expected, filters
+                response, body = await raw_export(client, admin, {**filters, "format": "ndjson"}, "gzip")
+                assert response.status_code == 200
+                assert response.headers["content-encoding"] == "gzip"
+                assert response.headers["content-type"] == "application/x-ndjson"
+                lines = gzip.decompress(body).decode("utf-8").splitlines()
+                assert [json.loads(line) for line in lines] == expected, filters
+
+    run(scenario)
+
+def test_export_csv_uncompressed_matches_list_view():
+    async def scenario():
+        admin, users, cars, start = await seed_bookings()
+        filters = {"status": "En attente"}
+        async with api_client() as client:
+            expected = await list_view(client, admin, filters)
+            response, body = await raw_export(client, admin, {**filters, "format": "csv"}, "identity")
+        assert response.status_code == 200
+        assert "content-encoding" not in response.headers
+        assert response.headers["content-type"].startswith("text/csv")
+        assert response.headers["content-disposition"].startswith('attachment; filename="reservations_')
+        rows = list(csv.DictReader(io.StringIO(body.decode("utf-8"))))
+        assert len(rows) == len(expected) == 5
+        assert rows == [{column: "" if item[column] is None else str(item[column]) for column in main.EXPORT_COLUMNS}
+                        for item in expected]
+
+    run(scenario)
+
+def test_export_rejects_invalid_parameters():
+    async def scenario():
+        admin = await create_user("admin@test.fr", role="admin")
+        user = await create_user()
+        async with api_client() as client:
+            bad_format = await client.get("/admin/bookings/export", params={"format": "xml"}, headers=auth_headers(admin))
+            bad_status = await client.get("/admin/bookings/export", params={"status": "Perdue"}, headers=auth_headers(admin))
+            not_admin = await client.get("/admin/bookings/export", headers=auth_headers(user))
+        assert (bad_format.status_code, bad_status.status_code, not_admin.status_code) == (400, 400, 403)
+
+    run(scenario)
+
+# ========================================
+# CHANGEMENT DE STATUT ET ETAG DU CATALOGUE
+# ========================================
+def test_status_change_keeps_catalog_etag_unless_availability_changes():
+    async def scenario():
+        admin = await create_user("admin@test.fr", role="admin")
+        user = await create_user()
+        [car] = await create_cars(1)
+        today = date.today()
+        async with AsyncSessionLocal() as db:
+            current = Booking(user_id=user.id, car_id=car.id, full_name="Client", total_price=100.0,
+                              pickup_date=today, return_date=today + timedelta(days=2))
+            db.add(current)
+            await db.commit()
+        async with api_client() as client:
+            # La voiture est louée aujourd'hui : le réconciliateur la marque indisponible
+            await client.post("/admin/availability/reconcile", headers=auth_headers(admin))
+            first = await client.get("/vehicles", headers=auth_headers(user))
+            etag = first.headers["ETag"]
+            assert first.json()[0]["isAvailable"] is False
+
+            # En attente → Confirmée : la voiture reste louée, la version du catalogue ne change pas
+            # (elle sert aussi à l'ETag des requêtes filtrées)
+            version = main.catalog_snapshot.version
+            confirmed = await client.patch(f"/admin/bookings/{current.id}/status", params={"status": "Confirmée"},
+                                           headers=auth_headers(admin))
+            assert confirmed.status_code == 200
+            assert main.catalog_snapshot.version == version
+            unchanged = await client.get("/vehicles", headers={**auth_headers(user), "If-None-Match": etag})
+            assert unchanged.status_code == 304
+
+            # Annulation : la voiture redevient disponible, l'ETag change
+            cancelled = await client.patch(f"/admin/bookings/{current.id}/status", params={"status": "Annulée"},
+                                           headers=auth_headers(admin))
+            assert cancelled.status_code == 200
+            changed = await client.get("/vehicles", headers={**auth_headers(user), "If-None-Match": etag})
+        assert changed.status_code == 200
+        assert changed.json()[0]["isAvailable"] is True
+        assert main.catalog_snapshot.version > version
+
+    run(scenario)
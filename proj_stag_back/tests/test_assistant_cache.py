@@ -0,0 +1,31 @@
+# ============================================================
+# TESTS : CACHE DES RÉPONSES DE L'ASSISTANT
+# ============================================================
+
+import main
+from conftest import run, create_user
+from models import AsyncSessionLocal
+
+def test_free_text_replies_do_not_fill_the_static_cache():
+    async def scenario():
+        user = await create_user()
+        async with AsyncSessionLocal() as db:
+            for i in range(main.ASSISTANT_MESSAGE_CACHE_SIZE + 20):
+                await main.cached_assistant_reply(f"message libre {i}", user, db)
+            await main.cached_assistant_reply("Contacter le support", user, db)
+        assert main.assistant_static_replies.stats()["size"] == 1
+        assert main.assistant_message_replies.stats()["size"] == main.ASSISTANT_MESSAGE_CACHE_SIZE
+
+    run(scenario)
+
+def test_evicted_user_version_is_never_reused():
+    main.user_data_versions.clear()
+    first = main.user_data_version(1)
+    main.bump_user_data(1)
+    bumped = main.user_data_version(1)
+    for user_id in range(2, main.USER_DATA_VERSIONS_MAX_USERS + 2):
+        main.user_data_version(user_id)
+    # L'utilisateur 1 a été évincé : il reçoit une version neuve, pas 0 ni une ancienne
+    assert main.user_data_version(1) not in (first, bumped)
+    assert main.user_data_versions.stats()["size"] == main.USER_DATA_VERSIONS_MAX_USERS
+    main.user_data_versions.clear()
@@ -0,0 +1,77 @@
+# ============================================================
+# TESTS : BUDGET DE REQUÊTES SQL PAR INTENTION DE L'ASSISTANT
+# ============================================================
+# Chaque intention ne charge que les données dont sa réponse a besoin (voir l'en-tête
+# d'assistant.py). Les agrégats du catalogue sont supposés construits : leur
+# reconstruction coûte une requête de plus, partagée par toutes les intentions.
+
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import run, create_user, create_cars, count_queries
+from models import Favorite, Booking, AsyncSessionLocal
+from assistant import assistant_router, generate_assistant_response
+from catalog_stats import get_catalog_rollup
+
+INTENT_QUERY_BUDGETS = {
+    "how_to_book": 0,
+    "support": 0,
+    "profile": 0,
+    "vehicles": 0,
+    "greeting": 0,
+    "thanks": 0,
+    "fallback": 0,
+    "pricing": 0,
+    "categories": 0,
+    "bookings": 1,
+    "cancel": 1,
+    "available": 1,
+    "favorites": 2,
+}
+
+MESSAGES = [
+    ("Comment réserver ?", "how_to_book"),
+    ("Contacter le support", "support"),
+    ("Modifier mon profil", "profile"),
+    ("Quelles voitures proposez-vous ?", "vehicles"),
+    ("Bonjour", "greeting"),
+    ("Merci beaucoup", "thanks"),
+    ("Il fait beau aujourd'hui", "fallback"),
+    ("Quels sont les tarifs ?", "pricing"),
+    ("Types de véhicules", "categories"),
+    ("Mes réservations", "bookings"),
+    ("Je veux annuler", "cancel"),
+    ("Véhicules disponibles", "available"),
+    ("Ajouter aux favoris", "favorites"),
+]
+
+def test_every_intent_has_a_budget():
+    names = {intent.name for intent in assistant_router.intents} | {assistant_router.route("").name}
+    assert names == set(INTENT_QUERY_BUDGETS)
+    assert {intent for _, intent in MESSAGES} == set(INTENT_QUERY_BUDGETS)
+
+@pytest.mark.parametrize("message,intent", MESSAGES)
+def test_intent_query_budget(message, intent):
+    async def scenario():
+        # Utilisateur avec favoris et réservations : chemins les plus coûteux
+        user = await create_user()
+        cars = await create_cars(6)
+        start = date.today() + timedelta(days=10)
+        async with AsyncSessionLocal() as db:
+            db.add_all(Favorite(user_id=user.id, car_id=car.id) for car in cars[:4])
+            db.add_all(
+                Booking(user_id=user.id, car_id=car.id, full_name="Client Test", pickup_date=start,
+                        return_date=start + timedelta(days=2), total_price=120.0, status="Confirmée")
+                for car in cars[:2]
+            )
+            await db.commit()
+        async with AsyncSessionLocal() as db:
+            await get_catalog_rollup(db)
+            assert assistant_router.route(message).name == intent
+            with count_queries() as queries:
+                reply = await generate_assistant_response(message, user, db)
+        assert reply
+        assert queries.count <= INTENT_QUERY_BUDGETS[intent], queries.statements
+
+    run(scenario)
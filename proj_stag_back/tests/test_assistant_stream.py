@@ -0,0 +1,81 @@
+# ============================================================
+# TESTS : ASSISTANT EN FLUX (SERVER-SENT EVENTS)
+# ============================================================
+# Plusieurs flux ouverts en même temps dans le même worker : chacun reçoit sa propre
+# séquence start / chunk... / done, et les deux messages de chaque échange sont
+# enregistrés une fois le flux terminé.
+
+import asyncio
+import json
+
+from sqlalchemy import select
+
+import main
+from conftest import run, api_client, create_user, create_conversation, auth_headers
+from models import Message, AsyncSessionLocal
+
+STREAMS = 8
+
+def parse_events(body: str) -> list:
+    """
+    Découpe un corps text/event-stream en liste de (événement, données).
+    """
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+def test_concurrent_streams(monkeypatch):
+    open_streams = []
+    all_open = asyncio.Event()
+    iter_stream = main.iter_assistant_stream
+
+    async def tracked_stream(data, current_user):
+        # Chaque flux attend, après son premier événement, que tous soient ouverts
+        open_streams.append(data.conversation_id)
+        if len(open_streams) == STREAMS:
+            all_open.set()
+        first = True
+        async for event in iter_stream(data, current_user):
+            yield event
+            if first:
+                first = False
+                await asyncio.wait_for(all_open.wait(), timeout=5)
+
+    monkeypatch.setattr(main, "iter_assistant_stream", tracked_stream)
+
+    async def scenario():
+        users = [await create_user(f"client{i}@test.fr", username=f"client{i}") for i in range(STREAMS)]
+        conversations = [await create_conversation(user) for user in users]
+
+        async def open_stream(client, user, conversation):
+            response = await client.post("/assistant/stream", headers=auth_headers(user),
+                                         json={"conversation_id": conversation.id, "content": "Bonjour"})
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            return parse_events(response.text)
+
+        async with api_client() as client:
+            streams = await asyncio.gather(*(open_stream(client, user, conversation)
+                                             for user, conversation in zip(users, conversations)))
+        assert sorted(open_streams) == sorted(c.id for c in conversations)
+
+        await main.drain_chat_persist_tasks()
+        for user, conversation, events in zip(users, conversations, streams):
+            names = [name for name, _ in events]
+            assert names[0] == "start" and names[-1] == "done"
+            assert set(names[1:-1]) == {"chunk"}
+            assert all(payload["conversation_id"] == conversation.id for name, payload in events if name != "chunk")
+            reply = events[-1][1]["reply"]
+            assert "".join(payload["delta"] for name, payload in events if name == "chunk") == reply
+            assert f"Bonjour {user.username}" in reply
+            async with AsyncSessionLocal() as db:
+                stored = (await db.execute(
+                    select(Message.content, Message.is_user)
+                    .where(Message.conversation_id == conversation.id)
+                    .order_by(Message.id)
+                )).all()
+            assert [tuple(row) for row in stored] == [("Bonjour", True), (reply, False)]
+
+    run(scenario)
@@ -0,0 +1,77 @@
+# ============================================================
+# TESTS : AUTHENTIFICATION DES ENDPOINTS D'ÉCRITURE
+# ============================================================
+# Les endpoints qui écrivent vérifient l'utilisateur (get_current_principal) : un compte
+# supprimé ne peut plus écrire, même avec un token encore valide et une entrée déjà
+# présente dans le cache des principaux. Un changement de rôle est pris en compte
+# dès le commit.
+
+from sqlalchemy import delete, select
+
+import main
+from conftest import run, api_client, create_user, auth_headers
+from models import User, AsyncSessionLocal
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+async def warm_principal(client, user: User) -> None:
+    response = await client.get("/vehicles", headers=auth_headers(user))
+    assert response.status_code == 200
+    assert main.principal_cache.get(user.email) is not None
+
+def test_upload_rejected_for_deleted_user(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_FOLDER", str(tmp_path))
+
+    async def scenario():
+        user = await create_user()
+        headers = auth_headers(user)
+        async with api_client() as client:
+            await warm_principal(client, user)
+            async with AsyncSessionLocal() as db:
+                await db.execute(delete(User).where(User.id == user.id))
+                await db.commit()
+            response = await client.post("/upload-image/", headers=headers,
+                                         files={"file": ("photo.png", PNG_BYTES, "image/png")})
+        assert response.status_code == 401
+        assert not any(tmp_path.rglob("*.png"))
+
+    run(scenario)
+
+def test_deleted_user_object_leaves_cache():
+    async def scenario():
+        user = await create_user()
+        async with api_client() as client:
+            await warm_principal(client, user)
+            async with AsyncSessionLocal() as db:
+                await db.delete(await db.get(User, user.id))
+                await db.commit()
+            response = await client.get("/vehicles", headers=auth_headers(user))
+        assert response.status_code == 401
+
+    run(scenario)
+
+def test_role_change_invalidates_principal():
+    async def scenario():
+        admin = await create_user("admin@test.fr", role="admin")
+        async with api_client() as client:
+            assert (await client.get("/admin/cache-stats", headers=auth_headers(admin))).status_code == 200
+            async with AsyncSessionLocal() as db:
+                demoted = await db.scalar(select(User).where(User.id == admin.id))
+                demoted.role = "user"
+                await db.commit()
+            response = await client.get("/admin/cache-stats", headers=auth_headers(admin))
+        assert response.status_code == 403
+
+    run(scenario)
+
+def test_rolled_back_change_keeps_principal():
+    async def scenario():
+        user = await create_user()
+        async with api_client() as client:
+            await warm_principal(client, user)
+            async with AsyncSessionLocal() as db:
+                await db.execute(delete(User).where(User.id == user.id))
+                await db.rollback()
+        assert main.principal_cache.get(user.email) is not None
+
+    run(scenario)
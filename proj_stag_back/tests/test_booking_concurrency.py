@@ -0,0 +1,98 @@
+# ============================================================
+# TESTS : ADMISSION CONCURRENTE DES RÉSERVATIONS
+# ============================================================
+# Des demandes simultanées sur la même voiture et les mêmes dates : une seule doit être
+# acceptée, les autres reçoivent 409. Le débit d'admission est affiché (pytest -s).
+# Sur SQLite, la base entière est verrouillée ; avec TEST_DATABASE_URL (MySQL), ce sont
+# les verrous de lignes et la lecture verrouillante du chevauchement qui sont testés.
+
+import asyncio
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import select, func
+
+from conftest import run, api_client, create_user, create_cars, auth_headers
+from models import Booking, ACTIVE_BOOKING_STATUSES, AsyncSessionLocal
+
+PARALLEL_REQUESTS = 20
+
+def booking_payload(car_id: int, start: date, days: int = 3) -> dict:
+    return {
+        "car_id": car_id,
+        "full_name": "Client Test",
+        "pickup_date": start.isoformat(),
+        "return_date": (start + timedelta(days=days)).isoformat(),
+        "total_price": 150.0,
+    }
+
+def test_parallel_bookings_admit_exactly_one():
+    async def scenario():
+        users = [await create_user(f"client{i}@test.fr") for i in range(PARALLEL_REQUESTS)]
+        [car] = await create_cars(1)
+        start = date.today() + timedelta(days=20)
+        async with api_client() as client:
+            # Préchauffe : principaux en cache (comme en production), index de disponibilité construit
+            await asyncio.gather(*(client.get("/my-bookings", headers=auth_headers(u)) for u in users))
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.post("/bookings", json=booking_payload(car.id, start + timedelta(days=i % 2)), headers=auth_headers(u))
+                for i, u in enumerate(users)
+            ))
+            elapsed = time.perf_counter() - started
+        codes = [r.status_code for r in responses]
+        async with AsyncSessionLocal() as db:
+            active = await db.scalar(select(func.count()).select_from(Booking).where(
+                Booking.car_id == car.id, Booking.status.in_(ACTIVE_BOOKING_STATUSES)
+            ))
+        print(f"\n{PARALLEL_REQUESTS} demandes simultanées en {elapsed * 1000:.1f} ms "
+              f"({PARALLEL_REQUESTS / elapsed:.0f} demandes/s) - codes : {sorted(codes)}")
+        assert codes.count(200) == 1, codes
+        assert codes.count(409) == PARALLEL_REQUESTS - 1, codes
+        assert active == 1
+
+    run(scenario)
+
+def test_parallel_reactivations_admit_exactly_one():
+    async def scenario():
+        admin = await create_user("admin@test.fr", role="admin")
+        user = await create_user()
+        [car] = await create_cars(1)
+        start = date.today() + timedelta(days=20)
+        # Réservations annulées qui se chevauchent : un admin les réactive toutes en même temps
+        async with AsyncSessionLocal() as db:
+            cancelled = [
+                Booking(user_id=user.id, car_id=car.id, full_name="Client Test", total_price=100.0, status="Annulée",
+                        pickup_date=start + timedelta(days=i % 2), return_date=start + timedelta(days=3))
+                for i in range(PARALLEL_REQUESTS)
+            ]
+            db.add_all(cancelled)
+            await db.commit()
+        async with api_client() as client:
+            responses = await asyncio.gather(*(
+                client.patch(f"/admin/bookings/{b.id}/status", params={"status": "Confirmée"}, headers=auth_headers(admin))
+                for b in cancelled
+            ))
+        codes = [r.status_code for r in responses]
+        async with AsyncSessionLocal() as db:
+            active = await db.scalar(select(func.count()).select_from(Booking).where(
+                Booking.car_id == car.id, Booking.status.in_(ACTIVE_BOOKING_STATUSES)
+            ))
+        assert codes.count(200) == 1, codes
+        assert codes.count(409) == PARALLEL_REQUESTS - 1, codes
+        assert active == 1
+
+    run(scenario)
+
+def test_sequential_booking_after_conflict_window():
+    async def scenario():
+        user = await create_user()
+        [car] = await create_cars(1)
+        start = date.today() + timedelta(days=20)
+        async with api_client() as client:
+            first = await client.post("/bookings", json=booking_payload(car.id, start), headers=auth_headers(user))
+            overlapping = await client.post("/bookings", json=booking_payload(car.id, start + timedelta(days=2)), headers=auth_headers(user))
+            after = await client.post("/bookings", json=booking_payload(car.id, start + timedelta(days=4)), headers=auth_headers(user))
+        assert (first.status_code, overlapping.status_code, after.status_code) == (200, 409, 200)
+
+    run(scenario)
@@ -0,0 +1,64 @@
+# ============================================================
+# TESTS : CARTES SRCSET DES IMAGES DU CATALOGUE
+# ============================================================
+# Les manifestes de variantes sont lus hors de la boucle d'événements (thread), une fois
+# par image, puis servis depuis le cache.
+
+import json
+import os
+import threading
+
+import main
+import image_variants
+from conftest import run, api_client, create_user, create_cars, auth_headers
+
+SHA = "ab" * 32
+
+def write_manifest(folder: str) -> str:
+    """
+    Manifeste d'une image de 800 px avec deux variantes WebP ; renvoie l'URL de l'image.
+    """
+    directory = os.path.join(folder, "ab", "ab")
+    os.makedirs(directory)
+    with open(os.path.join(directory, f"{SHA}.variants.json"), "w", encoding="utf-8") as f:
+        json.dump({"source": f"{SHA}.jpg", "width": 800, "height": 600,
+                   "variants": {"webp": {"320": f"{SHA}.w320.webp", "160": f"{SHA}.w160.webp"}}}, f)
+    return f"http://localhost:8000/static/images/ab/ab/{SHA}.jpg"
+
+def test_vehicles_srcset_read_off_the_event_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_FOLDER", str(tmp_path))
+    image_url = write_manifest(str(tmp_path))
+    reads = []
+    read_srcset = image_variants._read_srcset
+
+    def recording_read(url, path):
+        reads.append(threading.current_thread() is threading.main_thread())
+        return read_srcset(url, path)
+
+    monkeypatch.setattr(image_variants, "_read_srcset", recording_read)
+
+    async def scenario():
+        headers = auth_headers(await create_user())
+        await create_cars(3, image=image_url)
+        async with api_client() as client:
+            first = await client.get("/vehicles", params={"category": "SUV"}, headers=headers)
+            second = await client.get("/vehicles", params={"category": "Citadine"}, headers=headers)
+        assert first.status_code == second.status_code == 200
+        base_url = image_url.rsplit("/", 1)[0]
+        assert first.json()[0]["srcset"] == {
+            "webp": f"{base_url}/{SHA}.w160.webp 160w, {base_url}/{SHA}.w320.webp 320w"
+        }
+        # Un seul manifeste lu, dans un thread, puis servi depuis le cache
+        assert reads == [False]
+
+    run(scenario)
+
+def test_external_image_has_no_srcset():
+    async def scenario():
+        headers = auth_headers(await create_user())
+        await create_cars(1)
+        async with api_client() as client:
+            response = await client.get("/vehicles", params={"category": "SUV"}, headers=headers)
+        assert response.json()[0]["srcset"] is None
+
+    run(scenario)
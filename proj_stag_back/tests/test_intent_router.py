@@ -0,0 +1,90 @@
+# ============================================================
+# TESTS : ROUTEUR D'INTENTIONS DE L'ASSISTANT
+# ============================================================
+# Corpus de messages étiquetés : boutons de suggestion, questions libres, variantes sans
+# accents ou en majuscules, et messages que l'ancienne chaîne de "in" classait mal
+# (sous-chaînes : "hi" dans "chien", ordre des tests : "bonjour, quels sont les tarifs").
+
+import pytest
+
+from assistant import assistant_router
+from intent_router import IntentRouter, normalize_text
+
+CORPUS = [
+    # Boutons de suggestion (phrases exactes)
+    ("Comment réserver ?", "how_to_book"),
+    ("Quels sont les tarifs ?", "pricing"),
+    ("Ajouter aux favoris", "favorites"),
+    ("Types de véhicules", "categories"),
+    ("Contacter le support", "support"),
+    ("Véhicules disponibles", "available"),
+    ("Modifier mon profil", "profile"),
+    # Questions libres
+    ("comment reserver une voiture", "how_to_book"),
+    ("Combien coûte un SUV ?", "pricing"),
+    ("Mes favoris", "favorites"),
+    ("Quelles catégories avez-vous ?", "categories"),
+    ("J'ai besoin du support", "support"),
+    ("Y a-t-il des voitures disponibles ?", "available"),
+    ("mon profil", "profile"),
+    ("Je veux changer mon compte", "profile"),
+    ("Je veux annuler ma réservation", "cancel"),
+    ("Comment annuler ?", "cancel"),
+    ("Mes réservations", "bookings"),
+    ("Je voudrais louer une voiture", "bookings"),
+    ("Quelles voitures avez-vous ?", "vehicles"),
+    ("un véhicule", "vehicles"),
+    ("Bonjour", "greeting"),
+    ("Salut !", "greeting"),
+    ("hi", "greeting"),
+    ("MERCI !!", "thanks"),
+    ("thank you", "thanks"),
+    # Une demande précise l'emporte sur la salutation qui la précède
+    ("Bonjour, quels sont les tarifs ?", "pricing"),
+    ("Hello, je veux réserver", "bookings"),
+    # Mots-clés reconnus comme mots entiers
+    ("J'ai un chien", "fallback"),
+    ("chiffre d'affaires", "fallback"),
+    ("Il fait beau", "fallback"),
+    ("où est l'agence ?", "fallback"),
+]
+
+@pytest.mark.parametrize("message,intent", CORPUS)
+def test_corpus_routing(message, intent):
+    assert assistant_router.route(message).name == intent
+
+def test_corpus_accuracy():
+    misrouted = [(m, e, assistant_router.route(m).name) for m, e in CORPUS if assistant_router.route(m).name != e]
+    assert not misrouted
+
+def test_normalize_text():
+    assert normalize_text("Comment RÉSERVER ?") == "comment reserver"
+    assert normalize_text("  Véhicules, disponibles !! ") == "vehicules disponibles"
+
+def test_keywords_match_whole_words_only():
+    router = IntentRouter()
+
+    @router.intent("greeting", keywords=["hi"])
+    async def greeting(message, current_user, db):
+        return ""
+
+    @router.fallback()
+    async def fallback(message, current_user, db):
+        return ""
+
+    assert router.route("hi !").name == "greeting"
+    assert router.route("véhicule").name == "fallback"
+
+def test_requires_every_group():
+    router = IntentRouter()
+
+    @router.intent("profile", requires=[["profil"], ["modifier", "changer"]])
+    async def profile(message, current_user, db):
+        return ""
+
+    @router.fallback()
+    async def fallback(message, current_user, db):
+        return ""
+
+    assert router.route("changer mon profil").name == "profile"
+    assert router.route("mon profil").name == "fallback"
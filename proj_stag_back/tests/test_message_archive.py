@@ -0,0 +1,76 @@
+# ============================================================
+# TESTS : RÉHYDRATATION DES CONVERSATIONS ARCHIVÉES
+# ============================================================
+# Les messages archivés reviennent sous de nouveaux IDs, dans leur ordre d'origine,
+# même si des messages ont été écrits depuis l'archivage ; deux lectures simultanées
+# ne les réhydratent qu'une fois.
+
+import asyncio
+
+from sqlalchemy import select, func
+
+import main
+from conftest import run, api_client, create_user, create_conversation, auth_headers
+from models import Message, MessageArchive, AsyncSessionLocal
+from message_archive import archive_conversation, rehydrate_conversation
+from message_writer import MessageWriteBehind
+
+async def archive(conversation_id: int) -> None:
+    async with AsyncSessionLocal() as db:
+        await archive_conversation(db, conversation_id)
+        await db.commit()
+
+async def message_ids(conversation_id: int) -> list:
+    async with AsyncSessionLocal() as db:
+        return (await db.scalars(select(Message.id).where(Message.conversation_id == conversation_id))).all()
+
+def test_rehydrate_after_new_message():
+    async def scenario():
+        user = await create_user()
+        conversation = await create_conversation(user, messages=4)
+        await archive(conversation.id)
+        async with api_client() as client:
+            # Sans AUTOINCREMENT (SQLite), ce message reprend l'ID d'un message archivé
+            posted = await client.post(f"/conversations/{conversation.id}/messages", headers=auth_headers(user),
+                                       json={"content": "nouveau", "is_user": True})
+            assert posted.status_code == 201
+            response = await client.get(f"/conversations/{conversation.id}/messages", headers=auth_headers(user))
+        assert response.status_code == 200, response.text
+        assert [m["content"] for m in response.json()] == [f"message {i}" for i in range(4)] + ["nouveau"]
+        assert len(set(await message_ids(conversation.id))) == 5
+
+    run(scenario)
+
+def test_concurrent_reads_rehydrate_once():
+    async def scenario():
+        user = await create_user()
+        conversation = await create_conversation(user, messages=6)
+        await archive(conversation.id)
+        async with api_client() as client:
+            responses = await asyncio.gather(*(
+                client.get(f"/conversations/{conversation.id}/messages", headers=auth_headers(user))
+                for _ in range(5)
+            ))
+        assert all(r.status_code == 200 for r in responses), [r.text for r in responses]
+        assert all(len(r.json()) == 6 for r in responses)
+        assert len(await message_ids(conversation.id)) == 6
+        async with AsyncSessionLocal() as db:
+            assert await db.scalar(select(func.count()).select_from(MessageArchive)) == 0
+
+    run(scenario)
+
+def test_rehydrate_with_reserved_ids():
+    async def scenario():
+        user = await create_user()
+        conversation = await create_conversation(user, messages=3)
+        await archive(conversation.id)
+        writer = MessageWriteBehind(AsyncSessionLocal, main.conversation_activity)
+        async with AsyncSessionLocal() as db:
+            assert await rehydrate_conversation(db, conversation.id, writer.reserve_ids) == 3
+            await db.commit()
+        await writer.enqueue(conversation.id, "nouveau", True)
+        await writer.flush()
+        assert writer.stats()["written"] == 1
+        assert len(set(await message_ids(conversation.id))) == 4
+
+    run(scenario)
@@ -0,0 +1,68 @@
+# ============================================================
+# TESTS : ÉCRITURE DIFFÉRÉE DES MESSAGES (ARRÊT DU SERVEUR)
+# ============================================================
+# Un lot en cours d'écriture au moment de l'arrêt n'est pas perdu : stop() attend la fin
+# de l'écriture, et une annulation remet le lot en file.
+
+import asyncio
+
+from sqlalchemy import select, func
+
+import main
+from conftest import run, create_user, create_conversation
+from models import Message, AsyncSessionLocal
+from message_writer import MessageWriteBehind
+
+MESSAGES = 10
+
+def slow_writer(started: asyncio.Event) -> MessageWriteBehind:
+    """
+    File dont chaque écriture de lot dure 50 ms et signale son début.
+    """
+    writer = MessageWriteBehind(AsyncSessionLocal, main.conversation_activity, flush_interval_ms=1)
+    write = writer._write
+
+    async def delayed_write(messages):
+        started.set()
+        await asyncio.sleep(0.05)
+        await write(messages)
+
+    writer._write = delayed_write
+    return writer
+
+async def stored_messages(conversation_id: int) -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.count()).select_from(Message).where(Message.conversation_id == conversation_id))
+
+def test_stop_during_flush_writes_everything():
+    async def scenario():
+        conversation = await create_conversation(await create_user())
+        started = asyncio.Event()
+        writer = slow_writer(started)
+        writer.start()
+        for i in range(MESSAGES):
+            await writer.enqueue(conversation.id, f"message {i}", i % 2 == 0)
+        await started.wait()
+        await writer.stop()
+        stats = writer.stats()
+        assert (stats["written"], stats["pending"], stats["dropped"]) == (MESSAGES, 0, 0)
+        assert await stored_messages(conversation.id) == MESSAGES
+
+    run(scenario)
+
+def test_cancelled_flush_requeues_batch():
+    async def scenario():
+        conversation = await create_conversation(await create_user())
+        started = asyncio.Event()
+        writer = slow_writer(started)
+        for i in range(MESSAGES):
+            await writer.enqueue(conversation.id, f"message {i}", i % 2 == 0)
+        flush = asyncio.create_task(writer.flush())
+        await started.wait()
+        flush.cancel()
+        await asyncio.gather(flush, return_exceptions=True)
+        assert writer.stats()["pending"] == MESSAGES
+        await writer.stop()
+        assert await stored_messages(conversation.id) == MESSAGES
+
+    run(scenario)
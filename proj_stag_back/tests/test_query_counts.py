@@ -0,0 +1,52 @@
+# ============================================================
+# TESTS : NOMBRE DE REQUÊTES SQL PAR ENDPOINT
+# ============================================================
+# /favorites et /my-bookings se chargent en une seule requête jointe, quel que soit
+# le nombre de lignes (pas de requête par favori ou par réservation : N+1).
+
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import run, api_client, create_user, create_cars, auth_headers, count_queries
+from models import Favorite, Booking, AsyncSessionLocal
+
+@pytest.mark.parametrize("rows", [1, 25])
+def test_favorites_single_query(rows):
+    async def scenario():
+        user = await create_user()
+        cars = await create_cars(rows)
+        async with AsyncSessionLocal() as db:
+            db.add_all(Favorite(user_id=user.id, car_id=car.id) for car in cars)
+            await db.commit()
+        async with api_client() as client:
+            with count_queries() as queries:
+                response = await client.get("/favorites", headers=auth_headers(user))
+        assert response.status_code == 200
+        assert len(response.json()) == rows
+        assert queries.count == 1, queries.statements
+
+    run(scenario)
+
+@pytest.mark.parametrize("rows", [1, 25])
+def test_my_bookings_single_query(rows):
+    async def scenario():
+        user = await create_user()
+        cars = await create_cars(rows)
+        start = date.today() + timedelta(days=10)
+        async with AsyncSessionLocal() as db:
+            db.add_all(
+                Booking(user_id=user.id, car_id=car.id, full_name="Client Test",
+                        pickup_date=start, return_date=start + timedelta(days=2), total_price=120.0)
+                for car in cars
+            )
+            await db.commit()
+        async with api_client() as client:
+            with count_queries() as queries:
+                response = await client.get("/my-bookings", headers=auth_headers(user))
+        assert response.status_code == 200
+        assert len(response.json()) == rows
+        assert all(b["car_name"].startswith("Voiture") for b in response.json())
+        assert queries.count == 1, queries.statements
+
+    run(scenario)
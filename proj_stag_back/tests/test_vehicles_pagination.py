@@ -0,0 +1,54 @@
+# ============================================================
+# TESTS : PAGINATION PAR CURSEUR DU CATALOGUE
+# ============================================================
+# Un curseur n'est valable que pour le tri qui l'a produit : rejoué avec un autre tri,
+# ou forgé, il est refusé en 400 (et non en erreur 500).
+
+import base64
+import json
+
+from conftest import run, api_client, create_user, create_cars, auth_headers
+
+def forged_cursor(sort_value, last_id) -> str:
+    return base64.urlsafe_b64encode(json.dumps([sort_value, last_id]).encode("utf-8")).decode("ascii")
+
+def test_paginate_by_name():
+    async def scenario():
+        headers = auth_headers(await create_user())
+        await create_cars(7)
+        seen = []
+        params = {"sort_by": "name", "order": "desc", "limit": 3}
+        async with api_client() as client:
+            while True:
+                response = await client.get("/vehicles", params=params, headers=headers)
+                assert response.status_code == 200
+                seen.extend(v["name"] for v in response.json())
+                cursor = response.headers.get("X-Next-Cursor")
+                if cursor is None:
+                    break
+                params["cursor"] = cursor
+        assert seen == sorted((f"Voiture {i}" for i in range(7)), reverse=True)
+
+    run(scenario)
+
+def test_cursor_rejected_with_another_sort():
+    async def scenario():
+        headers = auth_headers(await create_user())
+        await create_cars(5)
+        async with api_client() as client:
+            first = await client.get("/vehicles", params={"sort_by": "name", "limit": 2}, headers=headers)
+            cursor = first.headers["X-Next-Cursor"]
+            replayed = [
+                await client.get("/vehicles", params={"sort_by": sort_by, "limit": 2, "cursor": cursor}, headers=headers)
+                for sort_by in ("price", "rating", "year", "id")
+            ]
+            forged = [
+                await client.get("/vehicles", params={"sort_by": sort_by, "limit": 2, "cursor": forged_cursor(value, 1)},
+                                 headers=headers)
+                for sort_by, value in (("price", "NaN"), ("price", [1]), ("name", 42), ("year", "2020.5"))
+            ]
+        for response in replayed + forged:
+            assert response.status_code == 400, response.text
+            assert response.json()["detail"] == "Curseur de pagination invalide"
+
+    run(scenario)